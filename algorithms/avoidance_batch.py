@@ -0,0 +1,117 @@
+
+"""
+Векторные ядра для ReactiveAvoidanceAgent: TTC и клиренс для всех кандидатов
+против всех препятствий за один проход NumPy. Формулы повторяют скалярные
+_ttc_of/_clearance_along, порядок кандидатов — _candidates, поэтому выбор совпадает.
+Все функции допускают ведущие измерения (…, C) / (…, N) — например, (D, C) для флота.
+"""
+import math
+from typing import List, Optional, Tuple
+import numpy as np
+from avoidance_types import Obstacle
+
+def obstacle_arrays(obs: Optional[List[Obstacle]]) -> np.ndarray:
+    """Список Obstacle → массив (5, N): x, y, vx, vy, radius."""
+    if not obs:
+        return np.zeros((5, 0))
+    return np.array([(o.x, o.y, o.vx, o.vy, o.radius) for o in obs], dtype=float).T
+
+def candidates_batch(ref_vx, ref_vy, vmax, scan_step: float,
+                     half_width: int = 4) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Векторный аналог ReactiveAvoidanceAgent._candidates: (2*half_width+1) курсов × 2 скорости
+    плюс стоп. Вход — скаляры или массивы (…,); выход — cvx, cvy формы (…, C).
+    """
+    ref_vx, ref_vy, vmax = np.broadcast_arrays(np.asarray(ref_vx, dtype=float),
+                                               np.asarray(ref_vy, dtype=float),
+                                               np.asarray(vmax, dtype=float))
+    ang0 = np.arctan2(ref_vy, ref_vx)[..., None]
+    vref = np.hypot(ref_vx, ref_vy)
+    s1 = np.maximum(0.5, np.minimum(vref, vmax))
+    s2 = np.minimum(vmax, np.maximum(1.0, vref + 0.5))
+    speeds = np.stack([s1, s2], axis=-1)                       # (…, 2)
+    k = np.arange(-half_width, half_width + 1, dtype=float)
+    angles = ang0 + k*scan_step                                 # (…, A)
+    cvx = (speeds[..., None, :] * np.cos(angles)[..., :, None]).reshape(ref_vx.shape + (-1,))
+    cvy = (speeds[..., None, :] * np.sin(angles)[..., :, None]).reshape(ref_vx.shape + (-1,))
+    stop = np.zeros(ref_vx.shape + (1,))
+    return np.concatenate([cvx, stop], axis=-1), np.concatenate([cvy, stop], axis=-1)
+
+def ttc_matrix(cvx: np.ndarray, cvy: np.ndarray, O: np.ndarray,
+               valid: Optional[np.ndarray] = None) -> np.ndarray:
+    """TTC кандидатов (…, C) против препятствий O (5, …, N) → (…, C, N); inf — нет сближения."""
+    rx, ry = O[0][..., None, :], O[1][..., None, :]
+    rvx = O[2][..., None, :] - cvx[..., :, None]
+    rvy = O[3][..., None, :] - cvy[..., :, None]
+    v2 = rvx*rvx + rvy*rvy
+    c = rx*rvx + ry*rvy
+    d2 = rx*rx + ry*ry
+    r_safe = np.maximum(O[4], 0.1)[..., None, :]
+    disc = c*c - v2*(d2 - r_safe*r_safe)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t1 = (-c - np.sqrt(np.maximum(0.0, disc))) / v2
+    ok = (v2 >= 1e-6) & (c < 0.0) & (disc >= 0.0) & (t1 >= 0)
+    if valid is not None:
+        ok &= valid[..., None, :]
+    return np.where(ok, t1, np.inf)
+
+def clearance_matrix(cvx: np.ndarray, cvy: np.ndarray, O: np.ndarray,
+                     valid: Optional[np.ndarray] = None) -> np.ndarray:
+    """Клиренс луча скорости кандидатов (…, C) до препятствий O (5, …, N) → (…, C, N)."""
+    vnorm = np.hypot(cvx, cvy) + 1e-6
+    ux, uy = (cvx / vnorm)[..., :, None], (cvy / vnorm)[..., :, None]
+    dist = np.abs(O[0][..., None, :]*uy - O[1][..., None, :]*ux) - O[4][..., None, :]
+    if valid is not None:
+        dist = np.where(valid[..., None, :], dist, np.inf)
+    return dist
+
+def reach_mask(O: np.ndarray, vmax, horizon_s: float, pad_m: float) -> np.ndarray:
+    """
+    (…, N): препятствия, до которых можно дойти за horizon_s при относительной
+    скорости не выше vmax + |v_o|, с запасом pad_m. Остальные не влияют на TTC < horizon_s.
+    """
+    d = np.hypot(O[0], O[1])
+    vo = np.hypot(O[2], O[3])
+    return d - O[4] <= (np.asarray(vmax, dtype=float)[..., None] + vo) * horizon_s + pad_m
+
+def sector_mask(cvx: np.ndarray, cvy: np.ndarray, O: np.ndarray, pad_m: float) -> np.ndarray:
+    """
+    (…, C, N): препятствие в передней полуплоскости курса кандидата (с угловым
+    раздутием на radius + pad_m). Неподвижное препятствие вне этого сектора не даёт
+    конечного TTC; движущиеся препятствия и стоп-кандидат учитываются всегда.
+    """
+    d = np.maximum(np.hypot(O[0], O[1]), 1e-6)
+    alpha = np.arcsin(np.clip((O[4] + pad_m) / d, 0.0, 1.0))
+    dif = np.arctan2(O[1], O[0])[..., None, :] - np.arctan2(cvy, cvx)[..., :, None]
+    dif = np.abs((dif + math.pi) % (2*math.pi) - math.pi)
+    rel = dif <= math.pi/2 + alpha[..., None, :]
+    moving = np.hypot(O[2], O[3]) > 1e-3
+    still = np.hypot(cvx, cvy) < 1e-6
+    return rel | moving[..., None, :] | still[..., :, None]
+
+def select(agent, cvx: np.ndarray, cvy: np.ndarray, ttc: np.ndarray, clr: np.ndarray,
+           ref_vx, ref_vy, v_prev_x, v_prev_y) -> Tuple[np.ndarray, ...]:
+    """
+    Отбор по жёстким порогам и минимизация J(v) вдоль последней оси (кандидаты).
+    ttc/clr — уже свёрнутые по препятствиям минимумы (…, C). Возвращает vx, vy, ttc, clr (…);
+    при отсутствии допустимых кандидатов — нули, как в скалярном _pick. Стоп (0, 0) —
+    запасной кандидат: выбирается, только если ни один движущийся не допустим.
+    """
+    ang_ref = np.arctan2(ref_vy, ref_vx)
+    dang = np.arctan2(cvy, cvx) - np.asarray(ang_ref)[..., None]
+    dang = np.where(dang > math.pi, dang - 2*math.pi, dang)
+    dang = np.where(dang < -math.pi, dang + 2*math.pi, dang)
+    J = (agent.w_goal*np.abs(dang)
+         + agent.w_clr*(0.7 / (clr + 1e-3))
+         + agent.w_ttc*(0.7 / (ttc + 1e-3))
+         + agent.w_sm*np.hypot(cvx - np.asarray(v_prev_x)[..., None], cvy - np.asarray(v_prev_y)[..., None]))
+    J = np.where((ttc < agent.tau_min) | (clr < agent.clr_min), np.inf, J)
+    stop = (cvx == 0.0) & (cvy == 0.0)
+    moving_ok = np.isfinite(np.where(stop, np.inf, J)).any(axis=-1, keepdims=True)
+    J = np.where(stop & moving_ok, np.inf, J)
+    idx = np.argmin(J, axis=-1)[..., None]
+    found = np.take_along_axis(J, idx, axis=-1)[..., 0] < 1e8
+    out = []
+    for a in (cvx, cvy, ttc, clr):
+        out.append(np.where(found, np.take_along_axis(a, idx, axis=-1)[..., 0], 0.0))
+    return tuple(out)
@@ -0,0 +1,179 @@
+
+"""
+Бенчмарк ReactiveAvoidanceAgent на синтетических полях препятствий.
+
+Сценарии (воспроизводимые по seed): sparse — редкие точки; corridor — две стенки
+коридора; crowd — движущаяся толпа; deadwall — U-ловушка впереди по курсу.
+Для каждого сочетания (сценарий, конфигурация агента, число препятствий)
+гоняем step() и считаем ticks/s, p50/p99 латентности и частоту входа в recovery.
+Латентность — только по тактам с выбором скорости (_pick); такты Look-and-Turn
+почти бесплатны, поэтому прогоны, где recovery занимает больше половины тактов
+(deadwall задуман таким), выводятся отдельной таблицей.
+
+    python algorithms/avoidance_bench.py --counts 0 100 1000 10000 --configs python numpy
+"""
+import argparse
+import math
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+import numpy as np
+from avoidance_types import Obstacle, AvoidanceInput
+from avoidance_reactive import ReactiveAvoidanceAgent
+
+# конфигурации агента для сравнения (kwargs конструктора)
+CONFIGS: Dict[str, dict] = {
+    "python": {},
+    "numpy": {"engine": "numpy"},
+    "cull": {"engine": "numpy", "cull_horizon_s": 3.0},
+    "vo": {"mode": "vo"},
+    "warm": {"warm_start": True},
+}
+
+SCENARIOS = ("sparse", "corridor", "crowd", "deadwall")
+
+@dataclass
+class BenchResult:
+    scenario: str
+    config: str
+    n_obstacles: int
+    ticks: int
+    select_ticks: int         # такты с выбором скорости (_pick), по ним — латентность
+    ticks_per_sec: float
+    p50_ms: float
+    p99_ms: float
+    recovery_rate: float      # входов в recovery на такт
+    recovery_frac: float      # доля тактов в recovery
+
+def make_field(scenario: str, n: int, seed: int = 0) -> np.ndarray:
+    """Мировые препятствия сценария: массив (n, 5) — x, y, vx, vy, radius. Дрон стартует в (0, 0) курсом +X."""
+    rng = np.random.default_rng(seed)
+    F = np.zeros((n, 5))
+    F[:, 4] = rng.uniform(0.2, 0.6, n)
+    # sparse/crowd: при больших n поле расширяется, плотность не выше ~0.025 на м²
+    # (n = 1000 / 100) — иначе перекрыт любой курс и такты уходят в recovery, а не в выбор
+    if scenario == "sparse":
+        k = max(1.0, math.sqrt(n / 1000))
+        F[:, 0] = rng.uniform(-100.0*k, 100.0*k, n)
+        F[:, 1] = rng.uniform(-100.0*k, 100.0*k, n)
+    elif scenario == "corridor":
+        # две стенки y = ±3 м вдоль X, немного шума внутри коридора
+        k = n - n // 10
+        F[:k, 0] = rng.uniform(0.0, 200.0, k)
+        F[:k, 1] = np.where(np.arange(k) % 2 == 0, 3.0, -3.0) + rng.normal(0.0, 0.1, k)
+        F[k:, 0] = rng.uniform(5.0, 200.0, n - k)
+        F[k:, 1] = rng.uniform(-2.0, 2.0, n - k)
+    elif scenario == "crowd":
+        k = max(1.0, math.sqrt(n / 100))
+        F[:, 0] = rng.uniform(-10.0*k, 60.0*k, n)
+        F[:, 1] = rng.uniform(-30.0*k, 30.0*k, n)
+        ang = rng.uniform(-math.pi, math.pi, n)
+        spd = rng.uniform(0.3, 1.5, n)
+        F[:, 2], F[:, 3] = spd*np.cos(ang), spd*np.sin(ang)
+    elif scenario == "deadwall":
+        # U-ловушка вокруг старта: торцевая стенка x = 3 м и боковые стенки y = ±4 м
+        t = rng.uniform(0.0, 1.0, n)
+        side = rng.integers(0, 3, n)
+        F[:, 0] = np.where(side == 0, 3.0, -5.0 + t*8.0)
+        F[:, 1] = np.where(side == 0, -4.0 + 8.0*t, np.where(side == 1, 4.0, -4.0))
+    else:
+        raise ValueError(f"unknown scenario: {scenario}")
+    return F
+
+def _front_blocked(L: np.ndarray, heading: float, rng_m: float = 4.0, rays: int = 12) -> float:
+    # доля лучей в секторе ±30° по курсу, упирающихся в препятствие ближе rng_m
+    if len(L) == 0:
+        return 0.0
+    d = np.hypot(L[:, 0], L[:, 1])
+    near = L[d < rng_m + L[:, 4]]
+    if len(near) == 0:
+        return 0.0
+    a = heading + np.linspace(-math.pi/6, math.pi/6, rays)
+    ux, uy = np.cos(a)[:, None], np.sin(a)[:, None]
+    along = near[None, :, 0]*ux + near[None, :, 1]*uy
+    perp = np.abs(near[None, :, 0]*uy - near[None, :, 1]*ux)
+    hit = (along > 0.0) & (along < rng_m) & (perp < near[None, :, 4])
+    return float(hit.any(axis=1).mean())
+
+def run(scenario: str, n: int, config: str, ticks: int = 200, dt: float = 0.1,
+        seed: int = 0, time_budget_s: Optional[float] = None) -> BenchResult:
+    """Прогон одного сочетания; time_budget_s обрывает медленные конфигурации досрочно."""
+    F = make_field(scenario, n, seed)
+    agent = ReactiveAvoidanceAgent(**CONFIGS[config])
+    # такт с выбором скорости — тот, где вызван _pick (в recovery step() его не зовёт)
+    picks = [0]
+    pick = agent._pick
+    def counted_pick(ain):
+        picks[0] += 1
+        return pick(ain)
+    agent._pick = counted_pick
+    pos = np.zeros(2)
+    vprev = (0.0, 0.0)
+    ref = (2.0, 0.0)
+    lat: List[float] = []
+    sel: List[bool] = []
+    entries, in_rec = 0, 0
+    was_rec = False
+    t_start = time.perf_counter()
+    for k in range(ticks):
+        W = F.copy()
+        W[:, :2] += W[:, 2:4] * (k*dt)
+        L = W.copy()
+        L[:, :2] -= pos
+        obs = [Obstacle(*row) for row in L.tolist()]
+        fb = _front_blocked(L, math.atan2(ref[1], ref[0]))
+        ain = AvoidanceInput(ref_vx=ref[0], ref_vy=ref[1], dt=dt,
+                             progress_ds=0.0 if k == 0 else float(vprev[0]*dt),
+                             front_blocked_ratio=fb, v_prev_x=vprev[0], v_prev_y=vprev[1],
+                             vmax=4.0, obstacles=obs)
+        n_picks = picks[0]
+        t0 = time.perf_counter()
+        out = agent.step(ain)
+        lat.append(time.perf_counter() - t0)
+        sel.append(picks[0] > n_picks)
+        entries += out.in_recovery and not was_rec
+        in_rec += out.in_recovery
+        was_rec = out.in_recovery
+        vprev = (out.vx, out.vy)
+        pos += np.array(vprev)*dt
+        if time_budget_s is not None and time.perf_counter() - t_start > time_budget_s:
+            break
+    n_ticks = len(lat)
+    L = np.array(lat)[np.array(sel, dtype=bool)]
+    if len(L) == 0:
+        tps = p50 = p99 = float('nan')
+    else:
+        tps = len(L) / max(L.sum(), 1e-12)
+        p50, p99 = (float(np.percentile(L, q))*1e3 for q in (50, 99))
+    return BenchResult(scenario=scenario, config=config, n_obstacles=n, ticks=n_ticks,
+                       select_ticks=len(L), ticks_per_sec=tps, p50_ms=p50, p99_ms=p99,
+                       recovery_rate=entries / n_ticks, recovery_frac=in_rec / n_ticks)
+
+def _print_table(rows: List[BenchResult]):
+    print(f"{'scenario':<10}{'config':<8}{'N':>7}{'ticks':>7}{'select':>8}{'ticks/s':>11}"
+          f"{'p50,ms':>9}{'p99,ms':>9}{'rec/tick':>10}{'in_rec':>8}")
+    for r in rows:
+        print(f"{r.scenario:<10}{r.config:<8}{r.n_obstacles:>7}{r.ticks:>7}{r.select_ticks:>8}"
+              f"{r.ticks_per_sec:>11.1f}{r.p50_ms:>9.3f}{r.p99_ms:>9.3f}"
+              f"{r.recovery_rate:>10.3f}{r.recovery_frac:>8.2f}")
+
+def main():
+    ap = argparse.ArgumentParser(description="Avoidance throughput benchmark")
+    ap.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=SCENARIOS)
+    ap.add_argument("--configs", nargs="+", default=["python", "numpy"], choices=list(CONFIGS))
+    ap.add_argument("--counts", nargs="+", type=int, default=[0, 10, 100, 1000, 10000])
+    ap.add_argument("--ticks", type=int, default=200)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--budget", type=float, default=20.0, help="лимит времени на прогон, с")
+    args = ap.parse_args()
+
+    rows = [run(sc, n, cfg, ticks=args.ticks, seed=args.seed, time_budget_s=args.budget)
+            for sc in args.scenarios for n in args.counts for cfg in args.configs]
+    _print_table([r for r in rows if r.recovery_frac <= 0.5])
+    rec = [r for r in rows if r.recovery_frac > 0.5]
+    if rec:
+        print("\nrecovery > 50% тактов (латентность — по немногим тактам выбора):")
+        _print_table(rec)
+
+if __name__ == "__main__":
+    main()
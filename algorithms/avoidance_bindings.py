@@ -0,0 +1,140 @@
+
+import math
+from typing import List, Optional, Sequence
+import numpy as np
+from avoidance_types import Obstacle, AvoidanceOutput
+from avoidance_reactive import ReactiveAvoidanceAgent
+import avoidance_batch as ab
+
+class AvoidanceManager:
+    """
+    Обход препятствий для всего флота за один векторный вызов на такт.
+    Состояние ReactiveAvoidanceAgent каждого дрона (окно Dead-Wall, фаза/сторона
+    recovery, предыдущая скорость) хранится в массивах по индексу дрона; параметры
+    (пороги, веса, веер кандидатов) — общие и берутся из шаблонного агента.
+    Поведение на дрон совпадает с ReactiveAvoidanceAgent.step (engine="numpy",
+    mode="sample", без warm_start), если v_prev — прошлый выход менеджера.
+    Шаблонный агент с другими режимами не поддерживается — ValueError.
+    """
+    def __init__(self, drone_ids: List[str], agent: Optional[ReactiveAvoidanceAgent] = None):
+        self.drone_ids = list(drone_ids)
+        self.index = {d: i for i, d in enumerate(self.drone_ids)}
+        self.agent = agent or ReactiveAvoidanceAgent(engine="numpy")
+        a = self.agent
+        if a.engine != "numpy" or a.mode != "sample" or a.warm_start:
+            raise ValueError("AvoidanceManager supports only engine='numpy', mode='sample', warm_start=False "
+                             f"(got engine={a.engine!r}, mode={a.mode!r}, warm_start={a.warm_start})")
+        D = len(self.drone_ids)
+        self.recovery = np.zeros(D, dtype=bool)
+        self.recovery_phase = np.zeros(D, dtype=int)
+        self.recovery_sign = np.ones(D, dtype=int)
+        self.acc_time = np.zeros(D)
+        self.acc_progress = np.zeros(D)
+        self.v_prev = np.zeros((2, D))
+
+    # --- векторные аналоги _update_deadwall / _recovery_step ---
+
+    def _update_deadwall(self, idx: np.ndarray, dt, progress_ds, front_blocked):
+        a = self.agent
+        self.acc_time[idx] += dt
+        self.acc_progress[idx] += np.maximum(0.0, progress_ds)
+        win = self.acc_time[idx] >= a.dead_T
+        dead = win & (self.acc_progress[idx] < a.dead_eps) & (front_blocked >= a.front_thr)
+        self.acc_time[idx[win]] = 0.0
+        self.acc_progress[idx[win]] = 0.0
+        rec = self.recovery[idx]
+        enter = idx[dead & ~rec]
+        leave = idx[win & ~dead & rec]
+        self._enter_recovery(enter)
+        self.recovery[leave] = False
+        self.recovery_phase[leave] = 0
+
+    def _enter_recovery(self, idx: np.ndarray):
+        self.recovery[idx] = True
+        self.recovery_phase[idx] = 1
+        self.recovery_sign[idx] *= -1
+
+    def _recovery_step(self, idx: np.ndarray, ref_vx, ref_vy, vmax):
+        vmag = np.maximum(0.6, np.minimum(vmax, 1.2))
+        amp = self.recovery_phase[idx] * self.agent.scan_step
+        ang = np.arctan2(ref_vy, ref_vx) + self.recovery_sign[idx] * amp
+        self.recovery_phase[idx] = np.minimum(self.recovery_phase[idx] + 1, 6)
+        return vmag*np.cos(ang), vmag*np.sin(ang)
+
+    def _pad_obstacles(self, obstacles: Sequence[Optional[List[Obstacle]]], vmax: np.ndarray):
+        # препятствия дронов в общий массив (5, D, Nmax) + маска валидных;
+        # при заданном cull_horizon_s — только досягаемые (см. ObstacleIndex)
+        a = self.agent
+        arrs = [ab.obstacle_arrays(o) for o in obstacles]
+        if a.cull_horizon_s is not None:
+            arrs = [A[:, ab.reach_mask(A, v, a._cull_horizon(), a.clr_min)] for A, v in zip(arrs, vmax)]
+        n = [A.shape[1] for A in arrs]
+        O = np.zeros((5, len(arrs), max(n, default=0)))
+        valid = np.zeros((len(arrs), O.shape[2]), dtype=bool)
+        for i, A in enumerate(arrs):
+            O[:, i, :n[i]] = A
+            valid[i, :n[i]] = True
+        return O, valid
+
+    # --- основной такт ---
+
+    def compute_batch(self, drone_ids: Sequence[str], ref_vx, ref_vy, dt: float,
+                      progress_ds, front_blocked_ratio,
+                      obstacles: Sequence[Optional[List[Obstacle]]], vmax=4.0) -> List[AvoidanceOutput]:
+        """
+        Один такт для набора дронов. Массивы входов выровнены с drone_ids;
+        obstacles — список препятствий (в ЛСК) для каждого дрона.
+        """
+        idx = np.array([self.index[d] for d in drone_ids], dtype=int)
+        D = len(idx)
+        ref_vx = np.broadcast_to(np.asarray(ref_vx, dtype=float), (D,))
+        ref_vy = np.broadcast_to(np.asarray(ref_vy, dtype=float), (D,))
+        vmax = np.broadcast_to(np.asarray(vmax, dtype=float), (D,))
+        fb = np.broadcast_to(np.asarray(front_blocked_ratio, dtype=float), (D,))
+        pd = np.broadcast_to(np.asarray(progress_ds, dtype=float), (D,))
+
+        self._update_deadwall(idx, dt, pd, fb)
+        vx, vy = np.zeros(D), np.zeros(D)
+        rec = self.recovery[idx].copy()
+
+        # recovery: Look-and-Turn
+        if rec.any():
+            vx[rec], vy[rec] = self._recovery_step(idx[rec], ref_vx[rec], ref_vy[rec], vmax[rec])
+
+        # штатный выбор скорости: один проход по (дроны × кандидаты × препятствия)
+        live = ~rec
+        if live.any():
+            a = self.agent
+            cvx, cvy = ab.candidates_batch(ref_vx[live], ref_vy[live], vmax[live],
+                                           a.scan_step, a.scan_half_width)
+            O, valid = self._pad_obstacles([o for o, m in zip(obstacles, live) if m], vmax[live])
+            ttc = ab.ttc_matrix(cvx, cvy, O, valid)
+            clr = ab.clearance_matrix(cvx, cvy, O, valid)
+            if a.cull_horizon_s is not None:
+                rel = ab.sector_mask(cvx, cvy, O, a.clr_min)
+                ttc = np.where(rel, ttc, np.inf)
+                clr = np.where(rel, clr, np.inf)
+            ttc = ttc.min(axis=-1, initial=math.inf)
+            clr = clr.min(axis=-1, initial=math.inf)
+            lvx, lvy, _, _ = ab.select(a, cvx, cvy, ttc, clr, ref_vx[live], ref_vy[live],
+                                       self.v_prev[0, idx[live]], self.v_prev[1, idx[live]])
+            # всё перекрыто — включаем recovery
+            blocked = (lvx == 0.0) & (lvy == 0.0) & (fb[live] >= a.front_thr)
+            if blocked.any():
+                bidx = idx[live][blocked]
+                self._enter_recovery(bidx)
+                sel = np.flatnonzero(live)[blocked]
+                lvx[blocked], lvy[blocked] = self._recovery_step(bidx, ref_vx[sel], ref_vy[sel], vmax[sel])
+                rec[sel] = True
+            vx[live], vy[live] = lvx, lvy
+
+        self.v_prev[0, idx], self.v_prev[1, idx] = vx, vy
+        return [AvoidanceOutput(vx=float(vx[i]), vy=float(vy[i]), in_recovery=bool(rec[i]))
+                for i in range(D)]
+
+    def compute(self, drone_id: str, ref_vx: float, ref_vy: float, dt: float,
+                progress_ds: float, front_blocked_ratio: float,
+                obstacles: Optional[List[Obstacle]] = None, vmax: float = 4.0) -> AvoidanceOutput:
+        """Такт для одного дрона (обёртка над compute_batch)."""
+        return self.compute_batch([drone_id], ref_vx, ref_vy, dt, progress_ds,
+                                  front_blocked_ratio, [obstacles], vmax)[0]
@@ -1,7 +1,11 @@
 
 import math
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 from avoidance_types import Obstacle, AvoidanceInput, AvoidanceOutput
+import numpy as np
+import avoidance_batch as ab
+from obstacle_index import ObstacleIndex
+import avoidance_vo as vo
 
 def _dot(ax, ay, bx, by): return ax*bx + ay*by
 def _norm(ax, ay): return math.hypot(ax, ay)
@@ -17,6 +21,20 @@ class ReactiveAvoidanceAgent:
     1) Формирование множества допустимых скоростей по TTC/клиренсу.
     2) Оптимизацию J(v) с приоритетом на следование ref_v.
     3) Детектор тупика (Dead-Wall) и режим восстановления Look-and-Turn.
+
+    engine: "python" — поштучная оценка кандидатов; "numpy" — матрицы TTC/клиренса
+    кандидаты × препятствия за один векторный проход (тот же выбор, см. avoidance_batch).
+    cull_horizon_s: если задан — перед оценкой отбрасываем препятствия вне круга досягаемости
+    за max(tau_min, cull_horizon_s) и вне передней полуплоскости курса каждого кандидата
+    (см. ObstacleIndex). Жёсткий порог TTC сохраняется; клиренс считается только по препятствиям
+    впереди по курсу в радиусе досягаемости.
+    mode: "sample" — фиксированный веер курсов (_candidates); "vo" — аналитические конусы
+    скоростей и заметание интервалов курса (см. avoidance_vo), кандидаты берутся на
+    границах/внутри допустимых интервалов в том же окне ±scan_half_width*scan_step.
+    warm_start: инкрементальный режим для mode="sample" — кэш TTC/клиренса кандидатов
+    с прошлого такта; пересчитываются только столбцы препятствий, сместившихся больше
+    warm_tol_m (или сменивших скорость больше warm_tol_v), кандидаты оцениваются по
+    возрастанию нижней оценки J (окрестность прошлой скорости первой) с ранним выходом.
     """
     def __init__(self,
                  tau_min: float = 1.8,      # минимально допустимый TTC, с
@@ -28,7 +46,18 @@ class ReactiveAvoidanceAgent:
                  dead_progress_eps: float = 0.4,  # м за окно
                  dead_window_sec: float = 2.0,
                  front_block_thr: float = 0.65,
-                 scan_step_deg: float = 15.0):
+                 scan_step_deg: float = 15.0,
+                 scan_half_width: int = 4,        # курсов по каждую сторону от ref_v
+                 engine: str = "python",
+                 cull_horizon_s: Optional[float] = None,
+                 mode: str = "sample",
+                 warm_start: bool = False,
+                 warm_tol_m: float = 0.05,
+                 warm_tol_v: float = 0.05):
+        if engine not in ("python", "numpy"):
+            raise ValueError(f"unknown avoidance engine: {engine}")
+        if mode not in ("sample", "vo"):
+            raise ValueError(f"unknown avoidance mode: {mode}")
         self.tau_min = tau_min
         self.clr_min = clr_min
         self.w_goal = w_goal
@@ -41,6 +70,14 @@ class ReactiveAvoidanceAgent:
         self.front_thr = front_block_thr
 
         self.scan_step = math.radians(scan_step_deg)
+        self.scan_half_width = scan_half_width
+        self.engine = engine
+        self.cull_horizon_s = cull_horizon_s
+        self.mode = mode
+        self.warm_start = warm_start
+        self.warm_tol_m = warm_tol_m
+        self.warm_tol_v = warm_tol_v
+        self._warm = None          # кэш прошлого такта (см. _pick_warm)
         self.recovery = False
         self.recovery_phase = 0    # 0..N
         self.recovery_sign = 1     # чередование сторон
@@ -51,8 +88,9 @@ class ReactiveAvoidanceAgent:
 
     def _ttc_of(self, vx: float, vy: float, o: Obstacle) -> float:
         # TTC при относительном движении (классическая формула для круговых объектов)
+        # положение препятствия относительно дрона: r(t) = r + (v_o - v) t
         rx, ry = o.x, o.y
-        rvx, rvy = vx - o.vx, vy - o.vy
+        rvx, rvy = o.vx - vx, o.vy - vy
         v2 = rvx*rvx + rvy*rvy
         if v2 < 1e-6: 
             return float('inf')
@@ -90,7 +128,7 @@ class ReactiveAvoidanceAgent:
         ang0 = _angle(vref_x, vref_y)
         vref = _norm(vref_x, vref_y)
         speeds = [max(0.5, min(vref, vmax)), min(vmax, max(1.0, vref+0.5))]
-        angles = [ang0 + k*self.scan_step for k in range(-4, 5)]
+        angles = [ang0 + k*self.scan_step for k in range(-self.scan_half_width, self.scan_half_width + 1)]
         cand = []
         for a in angles:
             for s in speeds:
@@ -99,14 +137,153 @@ class ReactiveAvoidanceAgent:
         cand.append((0.0, 0.0))
         return cand
 
+    def _cull_horizon(self) -> float:
+        return max(self.tau_min, self.cull_horizon_s)
+
+    def _pick_numpy(self, ain: AvoidanceInput) -> Tuple[float, float, float, float]:
+        cvx, cvy = ab.candidates_batch(ain.ref_vx, ain.ref_vy, ain.vmax,
+                                       self.scan_step, self.scan_half_width)
+        O = ab.obstacle_arrays(ain.obstacles)
+        if self.cull_horizon_s is not None:
+            O = O[:, ab.reach_mask(O, ain.vmax, self._cull_horizon(), self.clr_min)]
+        ttc = ab.ttc_matrix(cvx, cvy, O)
+        clr = ab.clearance_matrix(cvx, cvy, O)
+        if self.cull_horizon_s is not None:
+            rel = ab.sector_mask(cvx, cvy, O, self.clr_min)
+            ttc = np.where(rel, ttc, np.inf)
+            clr = np.where(rel, clr, np.inf)
+        ttc = ttc.min(axis=-1, initial=float('inf'))
+        clr = clr.min(axis=-1, initial=float('inf'))
+        vx, vy, ttc, clr = ab.select(self, cvx, cvy, ttc, clr,
+                                     ain.ref_vx, ain.ref_vy, ain.v_prev_x, ain.v_prev_y)
+        return float(vx), float(vy), float(ttc), float(clr)
+
+    def _pick_vo(self, ain: AvoidanceInput) -> Tuple[float, float, float, float]:
+        ang_ref = _angle(ain.ref_vx, ain.ref_vy)
+        vref = _norm(ain.ref_vx, ain.ref_vy)
+        speeds = [max(0.5, min(vref, ain.vmax)), min(ain.vmax, max(1.0, vref+0.5))]
+        half = min(math.pi, self.scan_half_width*self.scan_step)
+        culled = self.cull_horizon_s is not None
+        O = ab.obstacle_arrays(ain.obstacles)
+        if culled:
+            O = O[:, ab.reach_mask(O, ain.vmax, self._cull_horizon(), self.clr_min)]
+        rel_prev = None
+        if _norm(ain.v_prev_x, ain.v_prev_y) > 1e-6:
+            rel_prev = _wrap(_angle(ain.v_prev_x, ain.v_prev_y) - ang_ref)
+
+        grid = np.arange(-self.scan_half_width, self.scan_half_width + 1) * self.scan_step
+        cvx, cvy = [], []
+        for s, (starts, ends) in zip(speeds, vo.blocked_arcs(self, speeds, O, culled)):
+            a = ang_ref + vo.interval_headings(vo.free_intervals(starts, ends, ang_ref, half), rel_prev, grid)
+            cvx.append(s*np.cos(a))
+            cvy.append(s*np.sin(a))
+
+        # точная оценка немногих аналитических кандидатов (и стопа) тем же J(v)
+        cvx, cvy = np.concatenate(cvx + [[0.0]]), np.concatenate(cvy + [[0.0]])
+        ttc = ab.ttc_matrix(cvx, cvy, O)
+        clr = ab.clearance_matrix(cvx, cvy, O)
+        if culled:
+            rel = ab.sector_mask(cvx, cvy, O, self.clr_min)
+            ttc = np.where(rel, ttc, np.inf)
+            clr = np.where(rel, clr, np.inf)
+        ttc = ttc.min(axis=-1, initial=float('inf'))
+        clr = clr.min(axis=-1, initial=float('inf'))
+        vx, vy, ttc, clr = ab.select(self, cvx, cvy, ttc, clr,
+                                     ain.ref_vx, ain.ref_vy, ain.v_prev_x, ain.v_prev_y)
+        return float(vx), float(vy), float(ttc), float(clr)
+
+    def _warm_cache(self, ain: AvoidanceInput, O: np.ndarray) -> dict:
+        # кандидаты прошлого такта переиспользуются, пока ref_v/vmax почти не изменились
+        c = self._warm
+        if (c is None or c["vmax"] != ain.vmax
+                or _norm(ain.ref_vx - c["ref"][0], ain.ref_vy - c["ref"][1]) > self.warm_tol_v):
+            cvx, cvy = ab.candidates_batch(ain.ref_vx, ain.ref_vy, ain.vmax,
+                                           self.scan_step, self.scan_half_width)
+            c = {"ref": (ain.ref_vx, ain.ref_vy), "vmax": ain.vmax, "cvx": cvx, "cvy": cvy, "O": None}
+        C, N = len(c["cvx"]), O.shape[1]
+        if c["O"] is None or c["O"].shape[1] != N:
+            c["O"] = O.copy()
+            c["ttc"], c["clr"] = np.full((C, N), np.inf), np.full((C, N), np.inf)
+            c["done"] = np.zeros(C, dtype=bool)
+        else:
+            P = c["O"]
+            moved = ((np.hypot(O[0] - P[0], O[1] - P[1]) > self.warm_tol_m)
+                     | (np.hypot(O[2] - P[2], O[3] - P[3]) > self.warm_tol_v)
+                     | (np.abs(O[4] - P[4]) > self.warm_tol_m))
+            rows = np.flatnonzero(c["done"])
+            if moved.any() and len(rows):
+                P[:, moved] = O[:, moved]
+                sub = np.ix_(rows, np.flatnonzero(moved))
+                c["ttc"][sub], c["clr"][sub] = self._rows(c["cvx"][rows], c["cvy"][rows], P[:, moved])
+            elif moved.any():
+                P[:, moved] = O[:, moved]
+        self._warm = c
+        return c
+
+    def _rows(self, cvx: np.ndarray, cvy: np.ndarray, O: np.ndarray):
+        ttc = ab.ttc_matrix(cvx, cvy, O)
+        clr = ab.clearance_matrix(cvx, cvy, O)
+        if self.cull_horizon_s is not None:
+            rel = ab.sector_mask(cvx, cvy, O, self.clr_min)
+            ttc = np.where(rel, ttc, np.inf)
+            clr = np.where(rel, clr, np.inf)
+        return ttc, clr
+
+    def _pick_warm(self, ain: AvoidanceInput) -> Tuple[float, float, float, float]:
+        O = ab.obstacle_arrays(ain.obstacles)
+        if self.cull_horizon_s is not None:
+            O = O[:, ab.reach_mask(O, ain.vmax, self._cull_horizon(), self.clr_min)]
+        c = self._warm_cache(ain, O)
+        cvx, cvy = c["cvx"], c["cvy"]
+        ang_ref = _angle(ain.ref_vx, ain.ref_vy)
+        dang = np.abs((np.arctan2(cvy, cvx) - ang_ref + math.pi) % (2*math.pi) - math.pi)
+        sm = np.hypot(cvx - ain.v_prev_x, cvy - ain.v_prev_y)
+        # нижняя оценка J (слагаемые клиренса и TTC неотрицательны)
+        lb = self.w_goal*dang + self.w_sm*sm
+        bestJ, best, best_i = 1e9, (0.0, 0.0, float('inf'), float('inf')), -1
+        # стоп (последний кандидат) — запасной: после всех движущихся и только без допустимых
+        stop_i = len(cvx) - 1
+        for i in np.append(np.argsort(lb[:stop_i], kind="stable"), stop_i):
+            if lb[i] > bestJ or (i == stop_i and bestJ < 1e8):
+                break
+            if not c["done"][i]:
+                c["ttc"][i], c["clr"][i] = (m[0] for m in self._rows(cvx[i:i+1], cvy[i:i+1], c["O"]))
+                c["done"][i] = True
+            ttc = float(c["ttc"][i].min(initial=float('inf')))
+            clr = float(c["clr"][i].min(initial=float('inf')))
+            if ttc < self.tau_min or clr < self.clr_min:
+                continue
+            J = (self.w_goal*dang[i]
+                + self.w_clr*(0.7/ (clr + 1e-3))
+                + self.w_ttc*(0.7/ (ttc + 1e-3))
+                + self.w_sm*sm[i])
+            if J < bestJ or (J == bestJ and i < best_i):
+                bestJ, best, best_i = J, (float(cvx[i]), float(cvy[i]), ttc, clr), i
+        if bestJ >= 1e8:
+            return 0.0, 0.0, 0.0, 0.0
+        return best
+
     def _pick(self, ain: AvoidanceInput) -> Tuple[float, float, float, float]:
+        if self.mode == "vo":
+            return self._pick_vo(ain)
+        if self.warm_start:
+            return self._pick_warm(ain)
+        if self.engine == "numpy":
+            return self._pick_numpy(ain)
         cand = self._candidates(ain.ref_vx, ain.ref_vy, ain.vmax)
         ang_ref = _angle(ain.ref_vx, ain.ref_vy)
         bestJ, best = 1e9, (0.0, 0.0, float('inf'), float('inf'))
+        index = None
+        if self.cull_horizon_s is not None:
+            index = ObstacleIndex(ain.obstacles, ain.vmax, self._cull_horizon(), self.clr_min)
 
         for vx, vy in cand:
-            ttc = self._min_ttc(vx, vy, ain.obstacles or [])
-            clr = self._clearance_along(vx, vy, ain.obstacles or [])
+            # стоп (последний кандидат) — только если ни один движущийся не допустим
+            if vx == 0.0 and vy == 0.0 and bestJ < 1e8:
+                continue
+            obs = index.for_heading(vx, vy) if index is not None else (ain.obstacles or [])
+            ttc = self._min_ttc(vx, vy, obs)
+            clr = self._clearance_along(vx, vy, obs)
             # жёсткие пороги безопасности
             if ttc < self.tau_min or clr < self.clr_min:
                 continue
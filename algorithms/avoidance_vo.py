@@ -0,0 +1,176 @@
+
+"""
+Аналитический режим Reactive VO: вместо фиксированного веера кандидатов строим
+для каждого препятствия конус скоростей (velocity obstacle), усечённый по tau_min,
+и полосу недопустимого клиренса; на окружности скорости |v| = s находим их
+границы в замкнутом виде и заметанием интервалов получаем допустимые курсы.
+Разрешение по курсу — точное (границы интервалов), стоимость — O(N log N).
+Конусы строятся только для препятствий в досягаемости за tau_min; у остальных
+недопустимы лишь курсы вдоль полосы клиренса — их дуги в замкнутом виде (_clearance_arcs).
+"""
+import math
+from typing import List, Optional, Tuple
+import numpy as np
+import avoidance_batch as ab
+
+def _critical_angles(s, O: np.ndarray, tau: float, clr_min: float,
+                     sector_pad: Optional[float]) -> np.ndarray:
+    """
+    (N, K) углы, на которых для скорости модуля s (скаляр или (N,) — своя для каждого
+    столбца O) меняется допустимость курса относительно каждого препятствия; отсутствующие — NaN.
+    """
+    x, y, ovx, ovy, r = O
+    d = np.hypot(x, y)
+    beta = np.arctan2(y, x)
+    R = np.maximum(r, 0.1)
+    cols = []
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # (a) касательные конуса VO: s*u(θ) = v_o + λ e±, λ >= 0
+        alpha = np.where(d > R, np.arcsin(np.clip(R / d, 0.0, 1.0)), np.nan)
+        for sgn in (-1.0, 1.0):
+            ex, ey = np.cos(beta + sgn*alpha), np.sin(beta + sgn*alpha)
+            b = ovx*ex + ovy*ey
+            disc = b*b - (ovx*ovx + ovy*ovy - s*s)
+            for root in (-1.0, 1.0):
+                lam = -b + root*np.sqrt(disc)
+                ok = (disc >= 0.0) & (lam >= 0.0)
+                cols.append(np.where(ok, np.arctan2(ovy + lam*ey, ovx + lam*ex), np.nan))
+        # (b) усечение по tau: |s*u(θ)*tau - v_o*tau - o| = R  ⇔  окружность-окружность
+        qx, qy = ovx + x / tau, ovy + y / tau
+        D = np.hypot(qx, qy)
+        rho = R / tau
+        cosg = (s*s + D*D - rho*rho) / (2.0*s*np.maximum(D, 1e-12))
+        g = np.where(np.abs(cosg) <= 1.0, np.arccos(np.clip(cosg, -1.0, 1.0)), np.nan)
+        q = np.arctan2(qy, qx)
+        cols += [q - g, q + g]
+        # (c) границы клиренса: |d*sin(θ-β)| = r + clr_min (луч скорости двусторонний)
+        ac = np.where(r + clr_min < d, np.arcsin(np.clip((r + clr_min) / d, 0.0, 1.0)), np.nan)
+        cols += [beta - ac, beta + ac, beta + math.pi - ac, beta + math.pi + ac]
+        # (d) границы сектора при отсечении (см. avoidance_batch.sector_mask)
+        if sector_pad is not None:
+            a_s = np.arcsin(np.clip((r + sector_pad) / np.maximum(d, 1e-6), 0.0, 1.0))
+            cols += [beta - math.pi/2 - a_s, beta + math.pi/2 + a_s]
+    A = np.stack(cols, axis=-1)
+    return (A + math.pi) % (2*math.pi) - math.pi
+
+def _blocked(agent, s, th: np.ndarray, O: np.ndarray, culled: bool) -> np.ndarray:
+    # точная проверка: курс th[i, k] со скоростью s (скаляр или (N, 1)) недопустим из-за препятствия i
+    cvx, cvy = s*np.cos(th), s*np.sin(th)
+    Oi = O[:, :, None]
+    ttc = ab.ttc_matrix(cvx, cvy, Oi)[..., 0]
+    clr = ab.clearance_matrix(cvx, cvy, Oi)[..., 0]
+    if culled:
+        rel = ab.sector_mask(cvx, cvy, Oi, agent.clr_min)[..., 0]
+        ttc = np.where(rel, ttc, np.inf)
+        clr = np.where(rel, clr, np.inf)
+    return (ttc < agent.tau_min) | (clr < agent.clr_min)
+
+def _clearance_arcs(agent, O: np.ndarray, culled: bool) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Дуги для препятствий вне досягаемости за tau_min (TTC < tau_min недостижим ни на одном
+    курсе): клиренс < clr_min на курсах в ±ac от направления β на препятствие и от β + π.
+    При отсечении неподвижное препятствие позади (вне sector_mask) не учитывается — остаётся
+    только дуга у β (вызывающий передаёт сюда лишь препятствия с ac < π/4, у которых
+    передний сектор π/2 + ac не достаёт до дуги у β + π).
+    """
+    x, y, ovx, ovy, r = O
+    ac = np.arcsin(np.clip((r + agent.clr_min) / np.maximum(np.hypot(x, y), 1e-6), 0.0, 1.0))
+    beta = np.arctan2(y, x)
+    back = np.ones(len(beta), dtype=bool) if not culled else np.hypot(ovx, ovy) > 1e-3
+    a = np.concatenate([beta - ac, (beta + math.pi - ac)[back]])
+    w = np.concatenate([2*ac, 2*ac[back]])
+    starts = (a + math.pi) % (2*math.pi) - math.pi
+    return starts, starts + w
+
+def blocked_arcs(agent, speeds, O: np.ndarray, culled: bool = False) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Дуги недопустимых курсов по всем препятствиям для каждой скорости speeds:
+    [(starts, ends)], start ∈ [-π, π), end ∈ (start, start + 2π]. Препятствия в досягаемости
+    за tau_min обрабатываются для всех скоростей одним проходом, прочие — _clearance_arcs.
+    """
+    speeds = np.atleast_1d(np.asarray(speeds, dtype=float))
+    S = len(speeds)
+    if O.shape[1] == 0:
+        return [(np.zeros(0), np.zeros(0))]*S
+    # вне досягаемости за tau_min (и не вплотную) — только полосы клиренса, без конусов
+    d = np.hypot(O[0], O[1])
+    near = ((d - np.maximum(O[4], 0.1) <= (speeds.max() + np.hypot(O[2], O[3]))*agent.tau_min)
+            | (d <= (math.sqrt(2.0) if culled else 1.0)*(O[4] + agent.clr_min)))
+    far = _clearance_arcs(agent, O[:, ~near], culled)
+    N = int(near.sum())
+    if N == 0:
+        return [far]*S
+    # строки — пары (скорость, ближнее препятствие)
+    s = np.repeat(speeds, N)
+    O = np.tile(O[:, near], (1, S))
+    A = np.sort(_critical_angles(s, O, agent.tau_min, agent.clr_min,
+                                 agent.clr_min if culled else None), axis=1)   # NaN в конце
+    m = np.sum(~np.isnan(A), axis=1)
+    # препятствия без границ: вся окружность либо запрещена, либо свободна
+    A = np.where(np.isnan(A), np.inf, A)
+    first = A[:, :1]
+    last = np.take_along_axis(A, np.maximum(m - 1, 0)[:, None], axis=1)
+    starts = np.concatenate([A[:, :-1], last], axis=1)
+    ends = np.concatenate([A[:, 1:], first + 2*math.pi], axis=1)
+    K = A.shape[1]
+    valid = np.arange(K)[None, :] < (m - 1)[:, None]
+    valid[:, -1] = m > 0
+    starts = np.where(m[:, None] == 0, np.where(np.arange(K) == K - 1, -math.pi, np.nan), starts)
+    ends = np.where(m[:, None] == 0, np.where(np.arange(K) == K - 1, math.pi, np.nan), ends)
+    valid[:, -1] |= m == 0
+    mid = np.where(valid, 0.5*(starts + ends), 0.0)
+    blk = valid & _blocked(agent, s[:, None], mid, O, culled)
+    row = np.repeat(np.arange(S), N)
+    out = []
+    for k in range(S):
+        b = blk & (row == k)[:, None]
+        out.append((np.concatenate([far[0], starts[b]]), np.concatenate([far[1], ends[b]])))
+    return out
+
+def free_intervals(starts: np.ndarray, ends: np.ndarray, ang_ref: float,
+                   half_window: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Заметание: объединяем запрещённые дуги и возвращаем свободные интервалы курса
+    (u, v) в окне [-half_window, half_window] относительно ang_ref (углы относительные).
+    """
+    a = (starts - ang_ref + math.pi) % (2*math.pi) - math.pi
+    b = a + (ends - starts)
+    # дуги, выходящие за +π, дублируем со сдвигом на -2π
+    spill = b > math.pi
+    a = np.concatenate([a, a[spill] - 2*math.pi])
+    b = np.concatenate([b, b[spill] - 2*math.pi])
+    lo, hi = -half_window, half_window
+    keep = (b > lo) & (a < hi)
+    a, b = np.clip(a[keep], lo, hi), np.clip(b[keep], lo, hi)
+    order = np.argsort(a, kind="stable")
+    a, b = a[order], b[order]
+    if len(a) == 0:
+        return np.array([lo]), np.array([hi])
+    # свободно между концом уже покрытого (накопленный максимум концов) и началом следующей дуги
+    reach = np.maximum.accumulate(b)
+    prev = np.maximum(np.concatenate([[lo], reach[:-1]]), lo)
+    gap = a > prev
+    u = np.append(prev[gap], reach[-1])
+    v = np.append(a[gap], hi)
+    keep = v > u
+    return u[keep], v[keep]
+
+def interval_headings(free: Tuple[np.ndarray, np.ndarray], rel_prev: Optional[float],
+                      grid: Optional[np.ndarray] = None, eps: float = 1e-3) -> np.ndarray:
+    """
+    Кандидатные курсы внутри свободных интервалов: ближайший к ref_v (минимум
+    слагаемого w_goal), ближайший к предыдущей скорости (сглаживание), середина
+    и попавшие в интервал курсы базового веера grid — так решение не хуже выборки.
+    Возвращает уникальные курсы по возрастанию.
+    """
+    u, v = free
+    e = np.minimum(eps, 0.5*(v - u))
+    lo, hi = u + e, v - e
+    out = [np.minimum(np.maximum(0.0, lo), hi), 0.5*(u + v)]
+    if rel_prev is not None:
+        out.append(np.minimum(np.maximum(rel_prev, lo), hi))
+    if grid is not None:
+        inside = (grid[None, :] >= u[:, None]) & (grid[None, :] <= v[:, None])
+        out.append(np.broadcast_to(grid, inside.shape)[inside])
+    h = np.sort(np.concatenate(out))
+    return h[np.concatenate([[True], np.diff(h) > 0.0])] if len(h) else h
@@ -0,0 +1,111 @@
+
+"""
+Распределённый режим CBBA-lite: каждый агент строит свой пакет ставок в отдельном
+процессе и обменивается ставками с остальными через локальные очереди (полная
+сеть inbox-очередей), как бортовые агенты по радиоканалу.
+
+Раунд агента: ставки по текущему пулу → рассылка всем → приём ставок всех агентов
+этого раунда → одинаковое у всех слияние (_merge_bids в порядке списка дронов,
+tie-break по drone_id) и фиксация (_commit, _settle). Поскольку все агенты видят один и тот же
+набор ставок и применяют одни правила, пулы и claims у них совпадают, а итоговое
+распределение равно CBBALite.assign.
+"""
+import multiprocessing as mp
+import queue
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from schemas import Task, DroneState
+from cbba_lite import CBBALite
+
+def _agent_worker(me: int, cbba: CBBALite, tasks: List[Task], drones: List[DroneState],
+                  inboxes, results, timeout_s: float):
+    """Процесс агента me: считает только свои ставки, чужие получает из inbox."""
+    D = len(drones)
+    P, DT, TT = cbba._dist_matrices(tasks, drones)
+    prio = np.array([t.priority for t in tasks], dtype=float)
+    rank = {d.drone_id: i for i, d in enumerate(sorted(drones, key=lambda d: d.drone_id))}
+    W = cbba._work_len(tasks)
+    reach = cbba._reach_mask(drones, P, DT, W)
+    # маршруты всех агентов: фиксация детерминирована, поэтому каждый ведёт их одинаково
+    ridx: List[List[int]] = [[] for _ in range(D)]
+    claim: Dict[int, Tuple[str, float]] = {}
+    pool = np.arange(len(tasks))
+    cache: Optional[Tuple[np.ndarray, np.ndarray]] = None
+    # сообщения соседей, пришедшие раньше нашего раунда
+    pending: Dict[int, Dict[int, Optional[Tuple[np.ndarray, np.ndarray]]]] = {}
+
+    for rnd in range(cbba.rounds):
+        mine = None
+        if len(ridx[me]) < cbba.max_tasks_per_agent:
+            if cache is None:
+                g, ix = np.full(len(tasks), -np.inf), np.zeros(len(tasks), dtype=int)
+                cols = pool if reach is None else pool[reach[me, pool]]
+                g[cols], ix[cols] = cbba._bids(me, drones[me], ridx[me], cols, P, DT, TT, prio, W)
+                cache = (g, ix)
+            mine = (cache[0][pool], cache[1][pool])
+        for j in range(D):
+            if j != me:
+                inboxes[j].put((rnd, me, mine))
+
+        got = pending.pop(rnd, {})
+        got[me] = mine
+        while len(got) < D:
+            r, j, msg = inboxes[me].get(timeout=timeout_s)
+            if r == rnd:
+                got[j] = msg
+            else:
+                pending.setdefault(r, {})[j] = msg
+
+        best = cbba._empty_bids(len(pool), D)
+        for j in range(D):
+            if got[j] is not None:
+                best = cbba._merge_bids(best, got[j][0], got[j][1], j, rank[drones[j].drone_id])
+        pool, won = cbba._commit(pool, best, drones, claim, ridx)
+        pool = cbba._settle(pool, won, drones, claim, ridx, P, DT, TT, W)
+        if me in won:
+            cache = None
+        if not won:
+            break
+    results.put((me, ridx[me]))
+
+class DistributedCBBA:
+    """
+    CBBA-lite с агентами в отдельных процессах (один процесс на дрон).
+    Параметры аукциона берутся из cbba; start_method — метод запуска multiprocessing
+    (None — по умолчанию платформы); timeout_s — ожидание сообщения/результата.
+    Поддерживается только раундовый аукцион (strategy="rounds"): ленивый жадный
+    вариант держит общую кучу ставок и по агентам не раскладывается.
+    """
+    def __init__(self, cbba: Optional[CBBALite] = None, start_method: Optional[str] = None,
+                 timeout_s: float = 60.0):
+        self.cbba = cbba or CBBALite()
+        if self.cbba.strategy != "rounds":
+            raise ValueError(f"DistributedCBBA: unsupported strategy: {self.cbba.strategy}")
+        self.start_method = start_method
+        self.timeout_s = timeout_s
+
+    def assign(self, tasks: List[Task], drones: List[DroneState]) -> Dict[str, List[Task]]:
+        """То же, что CBBALite.assign, но ставки считаются и согласуются в процессах агентов."""
+        routes: Dict[str, List[Task]] = {d.drone_id: [] for d in drones}
+        if not tasks or not drones:
+            return routes
+        ctx = mp.get_context(self.start_method)
+        inboxes = [ctx.Queue() for _ in drones]
+        results = ctx.Queue()
+        procs = [ctx.Process(target=_agent_worker, daemon=True,
+                             args=(i, self.cbba, tasks, drones, inboxes, results, self.timeout_s))
+                 for i in range(len(drones))]
+        for p in procs:
+            p.start()
+        try:
+            for _ in drones:
+                i, r = results.get(timeout=self.timeout_s)
+                routes[drones[i].drone_id] = [tasks[k] for k in r]
+        except queue.Empty:
+            raise RuntimeError("DistributedCBBA: агент не ответил за timeout_s")
+        finally:
+            for p in procs:
+                p.join(timeout=1.0)
+                if p.is_alive():
+                    p.terminate()
+        return routes
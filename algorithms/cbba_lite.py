@@ -1,27 +1,71 @@
 
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple, Union
 from schemas import Task, DroneState
+from energy_rtb import EnergyRTBManager
 import math
 import random
+import heapq
+import numpy as np
 
 class CBBALite:
     """
     Упрощённый аукцион CBBA-lite: каждый агент ставит 'ставку' за задачу
     на основе маржинальной полезности от лучшей вставки в текущий маршрут.
     Консенсус достигается за 3–6 раундов обмена (в рамках одного процесса
-    моделируем синхронными раундами).
+    моделируем синхронными раундами; по процессу на агента — cbba_distributed).
     """
     def __init__(self, alpha: float=1.0, beta: float=0.02, gamma: float=0.08,
-                 rounds: int=5, max_tasks_per_agent: int=999):
+                 rounds: int=5, max_tasks_per_agent: int=999, dense_limit: int=2048,
+                 strategy: str="rounds", energy: Optional[EnergyRTBManager]=None,
+                 task_len_m: Union[float, Dict[str, float]]=0.0):
         self.alpha = alpha
         self.beta = beta
         self.gamma = gamma
         self.rounds = rounds
         self.max_tasks_per_agent = max_tasks_per_agent
+        self.dense_limit = dense_limit
+        if strategy not in ("rounds", "lazy"):
+            raise ValueError(f"unknown strategy: {strategy}")
+        self.strategy = strategy
+        # энергомодель для ставок (None — без учёта энергии) и длина работы на задаче, м:
+        # одна на все задачи или {task.id: м} (например, суммарная работа кластера ячеек)
+        self.energy = energy
+        self.task_len_m = task_len_m
 
     def _dist(self, a, b) -> float:
         return math.hypot(a.x-b.x, a.y-b.y)
 
+    def _task_len(self, t: Task) -> float:
+        if isinstance(self.task_len_m, dict):
+            return float(self.task_len_m.get(t.id, 0.0))
+        return float(self.task_len_m)
+
+    def _work_len(self, tasks: List[Task]) -> np.ndarray:
+        # длины работы на задачах (T,), м
+        return np.array([self._task_len(t) for t in tasks], dtype=float).reshape(-1)
+
+    def _energy_over(self, drone: DroneState, length_m):
+        """
+        Перерасход энергии для маршрута длиной length_m (м, скаляр или массив) по порогам
+        EnergyRTBManager.decide в точке старта: недобор до зелёной зоны (ok_margin), Вт·ч;
+        inf — красная зона, decide сразу отправил бы дрон на RTB.
+        """
+        if self.energy is None:
+            return np.zeros(np.shape(length_m))
+        e = self.energy
+        E_rtb = e.rtb_energy(drone.pos.x, drone.pos.y)
+        dE = drone.battery_rem_Wh - e.mission_energy(length_m) - E_rtb
+        over = np.maximum(0.0, e.policy.ok_margin*E_rtb - dE)
+        return np.where(dE >= e.policy.min_margin*E_rtb, over, np.inf)
+
+    def _reach_mask(self, drones: List[DroneState], P: np.ndarray, DT: np.ndarray,
+                    W: np.ndarray) -> Optional[np.ndarray]:
+        # (D, T) пары дрон–задача, достижимые с возвратом; None — отсечения нет
+        if self.energy is None:
+            return None
+        B = np.array([d.battery_rem_Wh for d in drones], dtype=float)[:, None]
+        return self.energy.reach_mask(B, DT, P, W)
+
     def _marginal_gain(self, drone: DroneState, route, t: Task) -> Tuple[float, int]:
         """
         Оценка u_{i,t} = α*p_t - β*ΔT - γ*перерасход энергии.
@@ -30,11 +74,13 @@ class CBBALite:
         if len(route) == 0:
             travel = self._dist(drone.pos, t.target)
             delta_time = travel / max(drone.speed_cruise_mps, 0.1)
-            energy_over = max(0.0, 0.0)  # без точной модели — 0, расширяется в energy-модуле
+            energy_over = float(self._energy_over(drone, travel + self._task_len(t)))
             gain = self.alpha*t.priority - self.beta*delta_time - self.gamma*energy_over
             return gain, 0
 
         best_gain, best_idx = -1e9, 0
+        length = self._dist(drone.pos, route[0].target) + sum(self._task_len(x) for x in route) + self._task_len(t)
+        length += sum(self._dist(a.target, b.target) for a, b in zip(route, route[1:]))
         for i in range(len(route)+1):
             # простая оценка вставки между соседями
             prev_p = drone.pos if i == 0 else route[i-1].target
@@ -43,51 +89,263 @@ class CBBALite:
             removed = self._dist(prev_p, next_p)
             delta = max(0.0, added - removed)
             delta_time = delta / max(drone.speed_cruise_mps, 0.1)
-            energy_over = 0.0
+            energy_over = float(self._energy_over(drone, length + delta))
             gain = self.alpha*t.priority - self.beta*delta_time - self.gamma*energy_over
             if gain > best_gain:
                 best_gain, best_idx = gain, i
         return best_gain, best_idx
 
-    def assign(self, tasks: List[Task], drones: List[DroneState]) -> Dict[str, List[Task]]:
+    def _dist_matrices(self, tasks: List[Task], drones: List[DroneState]):
         """
-        Возвращает распределение задач {drone_id: [Task,...]}.
-        Итеративно разрешает конфликты ставок; tie-break по drone_id.
+        Матрицы расстояний на один вызов assign(): дрон→задача (D, T) и задача→задача (T, T).
+        Для очень больших пулов (T > dense_limit) T×T не храним — строки считаются по запросу.
         """
-        routes: Dict[str, List[Task]] = {d.drone_id: [] for d in drones}
-        claim: Dict[str, Tuple[str, float]] = {}  # task_id -> (winner_id, bid)
+        P = np.array([(t.target.x, t.target.y) for t in tasks], dtype=float).reshape(-1, 2)
+        S = np.array([(d.pos.x, d.pos.y) for d in drones], dtype=float).reshape(-1, 2)
+        DT = np.hypot(S[:, None, 0] - P[None, :, 0], S[:, None, 1] - P[None, :, 1])
+        TT = None
+        if len(P) <= self.dense_limit:
+            TT = np.hypot(P[:, None, 0] - P[None, :, 0], P[:, None, 1] - P[None, :, 1])
+        return P, DT, TT
+
+    @staticmethod
+    def _tt(P: np.ndarray, TT: Optional[np.ndarray], rows, cols) -> np.ndarray:
+        if TT is not None:
+            return TT[np.ix_(rows, cols)]
+        return np.hypot(P[rows, None, 0] - P[None, cols, 0], P[rows, None, 1] - P[None, cols, 1])
 
-        # кандидаты задач
-        pool = list(tasks)
+    @staticmethod
+    def _legs(P: np.ndarray, TT: Optional[np.ndarray], r: np.ndarray) -> np.ndarray:
+        # длины последовательных отрезков маршрута r (m-1,)
+        if TT is not None:
+            return TT[r[:-1], r[1:]]
+        return np.hypot(P[r[1:], 0] - P[r[:-1], 0], P[r[1:], 1] - P[r[:-1], 1])
+
+    def _bids(self, di: int, drone: DroneState, ridx: List[int], cols: np.ndarray,
+              P: np.ndarray, DT: np.ndarray, TT: Optional[np.ndarray],
+              prio: np.ndarray, W: np.ndarray, lo: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Векторный _marginal_gain для дрона по набору задач cols: все позиции вставки
+        (m+1 слотов) × все задачи одним массивом. Возвращает (gain, idx) формы (len(cols),).
+        W — длины работы на задачах (_work_len); lo — первые lo задач маршрута закреплены:
+        вставка допускается только после них.
+        """
+        speed = max(drone.speed_cruise_mps, 0.1)
+        if len(ridx) == 0:
+            delta_time = DT[di, cols] / speed
+            energy_over = self._energy_over(drone, DT[di, cols] + W[cols])
+            gain = self.alpha*prio[cols] - self.beta*delta_time - self.gamma*energy_over
+            return gain, np.zeros(len(cols), dtype=int)
+        r = np.asarray(ridx)
+        d_route = self._tt(P, TT, r, cols)                        # (m, K)
+        # prev: [pos, r0..r_{m-1}], next: [r0..r_{m-1}, r_{m-1}]
+        added = np.vstack([DT[di, cols][None, :], d_route]) + np.vstack([d_route, d_route[-1:]])
+        removed = np.concatenate([[DT[di, r[0]]],
+                                  self._legs(P, TT, r),
+                                  [0.0]])
+        delta = np.maximum(0.0, added - removed[:, None])
+        # длина маршрута после вставки: текущая (removed без замыкающего нуля) + Δ + работа на задачах
+        length = removed.sum() + W[r].sum() + W[cols]
+        energy_over = self._energy_over(drone, length + delta)
+        gain = self.alpha*prio[cols] - self.beta*(delta / speed) - self.gamma*energy_over
+        if lo:
+            gain[:min(lo, len(ridx))] = -np.inf
+        idx = np.argmax(gain, axis=0)
+        return gain[idx, np.arange(len(cols))], idx
+
+    @staticmethod
+    def _empty_bids(n: int, n_drones: int):
+        # лучшие ставки по пулу: (gain, дрон, ранг drone_id, позиция вставки)
+        return (np.full(n, -np.inf), np.full(n, -1), np.full(n, n_drones), np.zeros(n, dtype=int))
+
+    @staticmethod
+    def _merge_bids(best, g: np.ndarray, ix: np.ndarray, di: int, rk: int):
+        """Учесть ставки дрона di: выигрывает большая ставка, при равенстве — меньший drone_id."""
+        best_gain, best_d, best_rank, best_idx = best
+        with np.errstate(invalid='ignore'):
+            better = (best_d < 0) | (g > best_gain) | ((np.abs(g - best_gain) < 1e-9) & (rk < best_rank))
+        better &= np.isfinite(g)   # -inf — ставки нет (недостижимо по энергии)
+        return (np.where(better, g, best_gain), np.where(better, di, best_d),
+                np.where(better, rk, best_rank), np.where(better, ix, best_idx))
+
+    @staticmethod
+    def _commit(pool: np.ndarray, best, drones: List[DroneState],
+                claim: Dict[int, Tuple[str, float]], ridx: List[List[int]]):
+        """
+        Фиксация победивших ставок раунда: вставка задач в маршруты победителей.
+        Возвращает (новый пул, {дрон: [вставленные задачи по порядку]}).
+        """
+        best_gain, best_d, _, best_idx = best
+        won: Dict[int, List[int]] = {}
+        keep = np.ones(len(pool), dtype=bool)
+        for k, ti in enumerate(pool):
+            if best_d[k] < 0:
+                continue
+            di, bid, idx = int(best_d[k]), float(best_gain[k]), int(best_idx[k])
+            winner = drones[di].drone_id
+            prev = claim.get(ti)
+            if (prev is None) or (bid > prev[1]) or (abs(bid-prev[1])<1e-9 and winner < prev[0]):
+                claim[ti] = (winner, bid)
+                # вставка в маршрут победителя
+                r = ridx[di]
+                r.insert(min(idx, len(r)), int(ti))
+                won.setdefault(di, []).append(int(ti))
+                keep[k] = False
+        return pool[keep], won
+
+    def _route_len(self, di: int, r: List[int], P: np.ndarray, DT: np.ndarray,
+                   TT: Optional[np.ndarray], W: np.ndarray) -> float:
+        # длина маршрута дрона di (в индексах задач) с работой на задачах, м
+        if not r:
+            return 0.0
+        return float(DT[di, r[0]] + self._legs(P, TT, np.asarray(r)).sum() + W[r].sum())
+
+    def _settle(self, pool: np.ndarray, won: Dict[int, List[int]], drones: List[DroneState],
+                claim: Dict[int, Tuple[str, float]], ridx: List[List[int]],
+                P: np.ndarray, DT: np.ndarray, TT: Optional[np.ndarray], W: np.ndarray) -> np.ndarray:
+        """
+        Ставки раунда считались к маршруту начала раунда, поэтому несколько выигрышей
+        одного дрона вместе могут вывести его в красную зону энергии. Снимаем последние
+        вставки раунда, пока маршрут не станет допустимым (первая всегда допустима),
+        и возвращаем задачи в пул. Без энергомодели — без изменений.
+        """
+        if self.energy is None:
+            return pool
+        back = []
+        for di, ins in won.items():
+            while len(ins) > 1 and not np.isfinite(
+                    self._energy_over(drones[di], self._route_len(di, ridx[di], P, DT, TT, W))):
+                ti = ins.pop()
+                ridx[di].remove(ti)
+                claim.pop(ti, None)
+                back.append(ti)
+        return np.sort(np.concatenate([pool, back]).astype(int)) if back else pool
+
+    def _auction(self, tasks: List[Task], drones: List[DroneState], ridx: List[List[int]],
+                 pool: np.ndarray, frozen: Optional[List[int]] = None) -> List[List[int]]:
+        """
+        Синхронные раунды аукциона по задачам pool; ridx — начальные маршруты в индексах
+        tasks (дополняются на месте), frozen — число закреплённых задач в начале маршрута.
+        """
+        if self.strategy == "lazy":
+            return self._auction_lazy(tasks, drones, ridx, pool, frozen)
+        claim: Dict[int, Tuple[str, float]] = {}  # task -> (winner_id, bid)
+        P, DT, TT = self._dist_matrices(tasks, drones)
+        prio = np.array([t.priority for t in tasks], dtype=float)
+        rank = {d.drone_id: i for i, d in enumerate(sorted(drones, key=lambda d: d.drone_id))}
+        lo = frozen or [0]*len(drones)
+        # пары, недостижимые по энергии, отсекаются до торгов
+        W = self._work_len(tasks)
+        reach = self._reach_mask(drones, P, DT, W)
+
+        # кэш ставок по дрону: (gain, idx) на весь список задач; между раундами меняются только
+        # маршруты победителей, поэтому пересчитываем лишь их ставки
+        bid_cache: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
 
         for _ in range(self.rounds):
-            bids: Dict[str, Tuple[str, float, int]] = {}  # task_id -> (drone_id, bid, idx)
+            # лучшие ставки по пулу: (gain, дрон, позиция вставки)
+            best = self._empty_bids(len(pool), len(drones))
             # локальные ставки
-            for d in drones:
-                if len(routes[d.drone_id]) >= self.max_tasks_per_agent:
+            for di, d in enumerate(drones):
+                if len(ridx[di]) >= self.max_tasks_per_agent:
                     continue
-                for t in pool:
-                    gain, idx = self._marginal_gain(d, routes[d.drone_id], t)
-                    if t.id not in bids or gain > bids[t.id][1] or \
-                       (abs(gain - bids[t.id][1]) < 1e-9 and d.drone_id < bids[t.id][0]):
-                        bids[t.id] = (d.drone_id, gain, idx)
+                if di not in bid_cache:
+                    g, ix = np.full(len(tasks), -np.inf), np.zeros(len(tasks), dtype=int)
+                    cols = pool if reach is None else pool[reach[di, pool]]
+                    g[cols], ix[cols] = self._bids(di, d, ridx[di], cols, P, DT, TT, prio, W, lo[di])
+                    bid_cache[di] = (g, ix)
+                best = self._merge_bids(best, bid_cache[di][0][pool], bid_cache[di][1][pool],
+                                        di, rank[d.drone_id])
 
             # согласование и фиксация лучших ставок
-            changed = False
-            for t in pool[:]:
-                if t.id not in bids:
-                    continue
-                winner, bid, idx = bids[t.id]
-                prev = claim.get(t.id)
-                if (prev is None) or (bid > prev[1]) or (abs(bid-prev[1])<1e-9 and winner < prev[0]):
-                    claim[t.id] = (winner, bid)
-                    # вставка в маршрут победителя
-                    r = routes[winner]
-                    r.insert(min(idx, len(r)), t)
-                    routes[winner] = r
-                    pool.remove(t)
-                    changed = True
-            if not changed:
+            pool, won = self._commit(pool, best, drones, claim, ridx)
+            pool = self._settle(pool, won, drones, claim, ridx, P, DT, TT, W)
+            for di in won:
+                bid_cache.pop(di, None)
+            if not won:
                 break
+        return ridx
+
+    def _auction_lazy(self, tasks: List[Task], drones: List[DroneState], ridx: List[List[int]],
+                      pool: np.ndarray, frozen: Optional[List[int]] = None) -> List[List[int]]:
+        """
+        Ленивый жадный аукцион (CELF): куча маржинальных полезностей (дрон, задача)
+        с меткой версии маршрута дрона. Вершина кучи с устаревшей версией
+        пересчитывается и возвращается в кучу, актуальная — фиксируется. Так за один
+        проход раздаются все задачи пула (с учётом max_tasks_per_agent), без лимита раундов.
+        Полезность вставки не строго субмодулярна (новая точка маршрута может удешевить
+        соседние вставки), поэтому результат — приближение полного жадного перебора.
+        """
+        if len(pool) == 0:
+            return ridx
+        P, DT, TT = self._dist_matrices(tasks, drones)
+        prio = np.array([t.priority for t in tasks], dtype=float)
+        rank = {d.drone_id: i for i, d in enumerate(sorted(drones, key=lambda d: d.drone_id))}
+        lo = frozen or [0]*len(drones)
+        # пары, недостижимые по энергии, отсекаются до торгов
+        W = self._work_len(tasks)
+        reach = self._reach_mask(drones, P, DT, W)
+        version = [0]*len(drones)
+        done = np.zeros(len(tasks), dtype=bool)
+
+        # начальные ставки всех дронов по всему пулу;
+        # запись кучи: (-gain, ранг drone_id, задача, дрон, версия маршрута, позиция вставки)
+        heap = []
+        for di, d in enumerate(drones):
+            if len(ridx[di]) >= self.max_tasks_per_agent:
+                continue
+            cols = pool if reach is None else pool[reach[di, pool]]
+            g, ix = self._bids(di, d, ridx[di], cols, P, DT, TT, prio, W, lo[di])
+            heap += [(-float(gk), rank[d.drone_id], int(ti), di, 0, int(k))
+                     for gk, ti, k in zip(g, cols, ix) if np.isfinite(gk)]
+        heapq.heapify(heap)
+
+        while heap:
+            _, rk, ti, di, ver, k = heapq.heappop(heap)
+            if done[ti] or len(ridx[di]) >= self.max_tasks_per_agent:
+                continue
+            if ver != version[di]:
+                # маршрут дрона изменился — пересчёт одной ставки
+                g, ix = self._bids(di, drones[di], ridx[di], np.array([ti]), P, DT, TT, prio, W, lo[di])
+                if np.isfinite(g[0]):
+                    heapq.heappush(heap, (-float(g[0]), rk, ti, di, version[di], int(ix[0])))
+                continue
+            ridx[di].insert(k, ti)
+            version[di] += 1
+            done[ti] = True
+        return ridx
 
+    def assign(self, tasks: List[Task], drones: List[DroneState]) -> Dict[str, List[Task]]:
+        """
+        Возвращает распределение задач {drone_id: [Task,...]}.
+        Итеративно разрешает конфликты ставок; tie-break по drone_id.
+        Расстояния считаются один раз (_dist_matrices), ставки — векторно (_bids).
+        """
+        routes: Dict[str, List[Task]] = {d.drone_id: [] for d in drones}
+        if not tasks or not drones:
+            return routes
+        ridx = self._auction(tasks, drones, [[] for _ in drones], np.arange(len(tasks)))
+        for di, d in enumerate(drones):
+            routes[d.drone_id] = [tasks[i] for i in ridx[di]]
+        return routes
+
+    def assign_incremental(self, tasks: List[Task], drones: List[DroneState],
+                           bundles: Dict[str, List[Task]], frozen: int = 1) -> Dict[str, List[Task]]:
+        """
+        Довставка задач tasks в текущие пакеты дронов bundles {drone_id: [Task,...]}
+        (пакеты не пересобираются). Первые frozen задач пакета — в работе: новые задачи
+        ставятся только после них. Возвращает обновлённые пакеты {drone_id: [Task,...]}.
+        """
+        routes = {d.drone_id: list(bundles.get(d.drone_id, [])) for d in drones}
+        if not tasks or not drones:
+            return routes
+        allt = list(tasks)
+        ridx = []
+        for d in drones:
+            ridx.append(list(range(len(allt), len(allt) + len(routes[d.drone_id]))))
+            allt += routes[d.drone_id]
+        lo = [min(frozen, len(r)) for r in ridx]
+        ridx = self._auction(allt, drones, ridx, np.arange(len(tasks)), lo)
+        for di, d in enumerate(drones):
+            routes[d.drone_id] = [allt[i] for i in ridx[di]]
         return routes
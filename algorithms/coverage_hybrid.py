@@ -1,7 +1,52 @@
 
-from typing import Dict, List, Tuple
-from schemas import Task, Waypoint, Point, Assignment, DroneState
+from typing import Dict, List, Optional, Tuple
+from schemas import Task, Point, Assignment, DroneState
+from plan_buffer import PlanBuffer
+from tour_sequencing import TourSequencer, block_ends, oriented
+from coverage_polygon import PolygonCoverage, decompose
+from coverage_map import CoverageMap
+from priority_map import PriorityMap
 import math
+import multiprocessing as mp
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+def stripe_arrays(cx, cy, size: float, step, along_x: bool=True) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Полосы для K ячеек (центры cx, cy; шаги step) одним выражением NumPy.
+    Возвращает xs, ys всех WP подряд (по 2 на полосу, направление чередуется)
+    и число WP каждой ячейки (K,).
+    """
+    cx, cy = np.asarray(cx, dtype=float), np.asarray(cy, dtype=float)
+    step = np.broadcast_to(np.asarray(step, dtype=float), cx.shape)
+    half = size / 2.0
+    n = np.maximum(1, np.ceil(size / step).astype(int))          # полос в ячейке
+    cell = np.repeat(np.arange(len(cx)), n)
+    i = np.arange(len(cell)) - np.repeat(np.cumsum(n) - n, n)     # номер полосы в ячейке
+    offset = -half + i * step[cell]
+    # вдоль полосы: от -half к +half на чётных, обратно на нечётных
+    a = np.where(i % 2 == 0, -half, half)
+    along = np.stack([a, -a], axis=1)                             # (S, 2)
+    across = np.repeat(offset[:, None], 2, axis=1)
+    c_al, c_ac = (cx, cy) if along_x else (cy, cx)
+    u = (c_al[cell][:, None] + along).ravel()
+    v = (c_ac[cell][:, None] + across).ravel()
+    xs, ys = (u, v) if along_x else (v, u)
+    return xs, ys, 2*n
+
+# копия генератора в процессе пула (передаётся один раз при старте процесса)
+_pool_coverage: Optional["HybridCoverage"] = None
+
+def _pool_init(coverage: "HybridCoverage"):
+    global _pool_coverage
+    _pool_coverage = coverage
+
+def _pool_plan(job) -> Tuple[str, Optional[bytes]]:
+    # план одного дрона в процессе пула; результат — компактный буфер PlanBuffer.to_bytes()
+    drone_id, tasks, start, cell_size_m, along_x = job
+    plan = _pool_coverage._drone_plan(tasks, start, cell_size_m, along_x)
+    return drone_id, None if plan is None else plan.to_bytes()
 
 class HybridCoverage:
     """
@@ -10,12 +55,27 @@ class HybridCoverage:
     работаем по ограничивающему прямоугольнику каждой задачи/ячейки.
     """
     def __init__(self, fov_m: float=20.0, overlap_perp: float=0.3, kappa: float=0.7,
-                 cruise_speed_mps: float=3.0, altitude_m: float=20.0):
+                 cruise_speed_mps: float=3.0, altitude_m: float=20.0,
+                 sequencer: Optional[TourSequencer]=None, template_cache_size: int=256,
+                 priority_map: Optional[PriorityMap]=None):
         self.fov_m = fov_m
         self.overlap_perp = overlap_perp
         self.kappa = kappa
         self.cruise = cruise_speed_mps
         self.alt = altitude_m
+        # порядок обхода ячеек дрона: NN по сетке + 2-opt/Or-opt + ориентации ячеек
+        self.sequencer = sequencer or TourSequencer()
+        # LRU шаблонов ячеек: (size, step, along_x) → смещения WP от центра
+        self.template_cache_size = template_cache_size
+        self._templates: "OrderedDict[Tuple[float, float, bool], Tuple[np.ndarray, np.ndarray]]" = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # AOI-полигоны с запретными зонами: задачи с зарегистрированным aoi_id обрезаются по ним
+        self.polygons = PolygonCoverage()
+        # карты покрытия по AOI (aoi_id → CoverageMap): после начала полёта ячейки строятся по непокрытому
+        self.maps: Dict[Optional[str], CoverageMap] = {}
+        # растр приоритета: шаг полос d(x,y) меняется внутри ячейки (без карты — по priority задачи)
+        self.priority_map = priority_map
 
     def _base_step(self) -> float:
         return max(1.0, self.fov_m * (1.0 - self.overlap_perp))
@@ -25,51 +85,222 @@ class HybridCoverage:
         d0 = self._base_step()
         return d0 / (1.0 + self.kappa * max(0.0, min(1.0, priority)))
 
-    def _stripe_route(self, center: Point, size: float, step: float, along_x: bool=True) -> List[Waypoint]:
+    def _variable_levels(self, t: Task, cu: float, cv: float, half: float, along_x: bool) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Уровни полос ячейки с переменным шагом по priority_map: плотность 1/d(v), где
+        d(v) = d0 / (1 + κ·w(v)), w(v) — максимум приоритета вдоль полосы (вне растра —
+        priority задачи). Полосы ставятся равными долями интеграла плотности, число полос
+        округляется вверх — средний по ячейке шаг не больше d(v); у скачка приоритета зазор
+        соседних полос может на несколько процентов превышать меньший шаг.
+        Возвращает (levels, шаги у уровней).
+        """
+        d_min = self._base_step() / (1.0 + self.kappa)
+        h = min(self.priority_map.res, d_min) / 4.0
+        v = cv - half + (np.arange(max(1, int(math.ceil(2.0*half / h)))) + 0.5)*h
+        w = self.priority_map.row_max(v, cu - half, cu + half, along_x)
+        w = np.clip(np.where(np.isnan(w), t.priority, w), 0.0, 1.0)
+        d = self._base_step() / (1.0 + self.kappa*w)
+        C = np.cumsum(h / d)
+        n = max(1, int(math.ceil(C[-1] - 1e-9)))
+        k = np.minimum(np.searchsorted(C, (np.arange(n) + 0.5)*C[-1] / n), len(v) - 1)
+        return v[k], d[k]
+
+    def _template(self, size: float, step: float, along_x: bool) -> Tuple[np.ndarray, np.ndarray]:
+        """Полосы ячейки с центром в (0, 0) из LRU-кэша (массивы только для чтения)."""
+        key = (float(size), float(step), bool(along_x))
+        tpl = self._templates.get(key)
+        if tpl is not None:
+            self._templates.move_to_end(key)
+            self.cache_hits += 1
+            return tpl
+        self.cache_misses += 1
+        dx, dy, _ = stripe_arrays([0.0], [0.0], size, [step], along_x)
+        dx.flags.writeable = False
+        dy.flags.writeable = False
+        self._templates[key] = (dx, dy)
+        if len(self._templates) > self.template_cache_size:
+            self._templates.popitem(last=False)
+        return dx, dy
+
+    def cache_info(self) -> Dict[str, int]:
+        return {"hits": self.cache_hits, "misses": self.cache_misses,
+                "size": len(self._templates), "maxsize": self.template_cache_size}
+
+    def register_aoi(self, aoi_id: str, boundary, holes=()):
+        """Контур AOI и запретные полигоны; задачи с этим aoi_id покрываются только по свободной области."""
+        self.polygons.register(aoi_id, boundary, holes)
+
+    def aoi_tasks(self, aoi_id: str, priority: float=0.5, along_x: bool=True) -> List[Task]:
+        """Задачи по ячейкам бустрофедонной декомпозиции зарегистрированного AOI."""
+        return self.polygons.cell_tasks(aoi_id, self._adaptive_step(priority), priority, along_x)
+
+    def track_coverage(self, tasks: List[Task], cell_size_m: float=60.0, res_m: float=2.0):
         """
-        Строим набор параллельных проходов в квадратной 'ячейке' вокруг center
-        со стороной 'size'. Это упрощённая иллюстрация без вычитания препятствий.
+        Карты покрытия для AOI задач, у которых её ещё нет (границы — ячейки задач и
+        контур AOI с запасом fov_m/2); уже заведённые карты сохраняют покрытие.
         """
+        groups: Dict[Optional[str], List[Task]] = {}
+        for t in tasks:
+            if t.aoi_id not in self.maps:
+                groups.setdefault(t.aoi_id, []).append(t)
+        pad = cell_size_m / 2.0 + self.fov_m / 2.0
+        for aoi_id, ts in groups.items():
+            P = np.array([(t.target.x, t.target.y) for t in ts], dtype=float)
+            lo, hi = P.min(axis=0) - pad, P.max(axis=0) + pad
+            if aoi_id in self.polygons.aois:
+                B = self.polygons.aois[aoi_id][0]
+                lo = np.minimum(lo, B.min(axis=0) - self.fov_m / 2.0)
+                hi = np.maximum(hi, B.max(axis=0) + self.fov_m / 2.0)
+            self.maps[aoi_id] = CoverageMap((lo[0], lo[1], hi[0], hi[1]), res_m, self.fov_m)
+
+    def mark_flown(self, x0, y0, x1, y1):
+        """Отметить полосы обзора вдоль пролетённых отрезков (массивы по дронам) на всех картах."""
+        for m in self.maps.values():
+            m.mark(x0, y0, x1, y1)
+
+    def _cell_intervals(self, t: Task, size: float, along_x: bool):
+        # полосы ячейки задачи в координатах развёртки: (уровни, интервалы, шаг, along_x)
+        if t.id in self.polygons.cell_index:
+            aoi_id, step, ax, k = self.polygons.cell_index[t.id]
+            S = self.polygons.decomposition(aoi_id, step, ax)[2][k]
+            return S[:, 0], [S[j:j+1, 1:3] for j in range(len(S))], step, ax
+        step = self._adaptive_step(t.priority)
         half = size / 2.0
-        waypoints: List[Waypoint] = []
-        # число полос
-        n = max(1, int(math.ceil(size / step)))
-        for i in range(n):
-            offset = -half + i * step
-            if along_x:
-                # линии параллельны оси X, двигаемся по Y
-                y = center.y + offset
-                x1, x2 = center.x - half, center.x + half
-                row = [Point(x1, y, self.alt), Point(x2, y, self.alt)]
-            else:
-                x = center.x + offset
-                y1, y2 = center.y - half, center.y + half
-                row = [Point(x, y1, self.alt), Point(x, y2, self.alt)]
-            # чередуем направление, чтобы уменьшить холостые пробеги
-            pts = row if i % 2 == 0 else list(reversed(row))
-            waypoints += [Waypoint(p, speed_mps=self.cruise) for p in pts]
-        return waypoints
+        cu, cv = (t.target.x, t.target.y) if along_x else (t.target.y, t.target.x)
+        if self.priority_map is None:
+            if t.aoi_id in self.polygons.aois:
+                return self.polygons.square_intervals(t.aoi_id, t.target, size, step, along_x) + (step, along_x)
+            levels = cv - half + np.arange(max(1, int(math.ceil(size / step))))*step
+            return levels, [np.array([[cu - half, cu + half]])]*len(levels), step, along_x
+        levels, steps = self._variable_levels(t, cu, cv, half, along_x)
+        if t.aoi_id in self.polygons.aois:
+            # все уровни внутри квадрата — square_intervals их не отбрасывает, шаги совпадают
+            return self.polygons.square_intervals(t.aoi_id, t.target, size, step, along_x, levels) + (steps, along_x)
+        return levels, [np.array([[cu - half, cu + half]])]*len(levels), steps, along_x
+
+    def uncovered_frac(self, t: Task, size: float=60.0, along_x: bool=True) -> float:
+        """Доля длины полос ячейки задачи, которую ещё нужно пролететь (по карте покрытия)."""
+        cmap = self.maps.get(t.aoi_id)
+        if cmap is None or not cmap.touched:
+            return 1.0
+        levels, intervals, step, along_x = self._cell_intervals(t, size, along_x)
+        total = sum(float(np.sum(iv[:, 1] - iv[:, 0])) for iv in intervals)
+        free = cmap.free_intervals(levels, intervals, along_x, band=step)
+        return sum(float(np.sum(iv[:, 1] - iv[:, 0])) for iv in free) / max(total, 1e-9)
+
+    def _cell_xy(self, t: Task, size: float, along_x: bool) -> Tuple[np.ndarray, np.ndarray]:
+        # WP ячейки задачи: по карте покрытия — только непокрытые части полос; иначе ячейка
+        # декомпозиции AOI, полосы с переменным шагом по priority_map, квадрат, обрезанный
+        # по AOI, или шаблон из кэша
+        cmap = self.maps.get(t.aoi_id)
+        if cmap is not None and cmap.touched:
+            levels, intervals, step, along_x = self._cell_intervals(t, size, along_x)
+            free = cmap.free_intervals(levels, intervals, along_x, band=step)
+            return self.polygons.route(decompose(levels, free), along_x)
+        if t.id in self.polygons.cell_index:
+            return self.polygons.cell_route(t.id)
+        if self.priority_map is not None:
+            levels, intervals, _, along_x = self._cell_intervals(t, size, along_x)
+            return self.polygons.route(decompose(levels, intervals), along_x)
+        step = self._adaptive_step(t.priority)
+        if t.aoi_id in self.polygons.aois:
+            return self.polygons.clip_square(t.aoi_id, t.target, size, step, along_x)
+        dx, dy = self._template(size, step, along_x)
+        return t.target.x + dx, t.target.y + dy
+
+    def _square(self, t: Task) -> bool:
+        # ячейка задачи — квадрат с постоянным шагом по priority (ветка шаблона в _cell_xy)
+        cmap = self.maps.get(t.aoi_id)
+        return ((cmap is None or not cmap.touched) and t.id not in self.polygons.cell_index
+                and self.priority_map is None and t.aoi_id not in self.polygons.aois)
+
+    def _cells(self, tasks: List[Task], size: float, along_x: bool) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Как stripe_arrays для ячеек задач: WP всех ячеек подряд и их число по ячейкам.
+        Квадратные ячейки (_square) строятся одним вызовом stripe_arrays — центры и шаги
+        массивами, остальные (AOI, карта покрытия, растр приоритета) — по _cell_xy.
+        """
+        sq = np.array([self._square(t) for t in tasks], dtype=bool)
+        if sq.any():
+            cx = np.array([t.target.x for t in tasks])[sq]
+            cy = np.array([t.target.y for t in tasks])[sq]
+            step = np.array([self._adaptive_step(t.priority) for t in tasks])[sq]
+            xs, ys, n = stripe_arrays(cx, cy, size, step, along_x)
+            if sq.all():
+                return xs, ys, n
+            cut = np.cumsum(n)[:-1]
+            batch = iter(zip(np.split(xs, cut), np.split(ys, cut)))
+        xy = [next(batch) if s else self._cell_xy(t, size, along_x) for t, s in zip(tasks, sq.tolist())]
+        cnt = np.array([len(x) for x, _ in xy], dtype=int)
+        return np.concatenate([x for x, _ in xy]), np.concatenate([y for _, y in xy]), cnt
+
+    def _stripe_route(self, center: Point, size: float, step: float, along_x: bool=True,
+                      task_id: Optional[str]=None) -> PlanBuffer:
+        """
+        Набор параллельных проходов в квадратной 'ячейке' вокруг center со стороной
+        'size' — PlanBuffer (WP помечены task_id). Упрощённо, без вычитания препятствий.
+        """
+        dx, dy = self._template(size, step, along_x)
+        return PlanBuffer.from_arrays(center.x + dx, center.y + dy, self.alt, 0.0, self.cruise, task_id=task_id)
+
+    def build_segment(self, task: Task, cell_size_m: float=60.0, along_x: bool=True) -> PlanBuffer:
+        """Сегмент покрытия одной задачи (WP помечены task_id) — для точечной довставки в план."""
+        xs, ys = self._cell_xy(task, cell_size_m, along_x)
+        if task.aoi_id in self.polygons.aois:
+            xs, ys, _ = self.polygons.detour(task.aoi_id, xs, ys)
+        return PlanBuffer.from_arrays(xs, ys, self.alt, 0.0, self.cruise, task_id=task.id)
+
+    def _drone_plan(self, tasks: List[Task], start: Tuple[float, float], cell_size_m: float,
+                    along_x: bool) -> Optional[PlanBuffer]:
+        """План одного дрона: полосы его ячеек в порядке TourSequencer; None — лететь нечего."""
+        # полосы всех ячеек дрона (шаблоны из кэша, сдвинутые в центры; либо по AOI)
+        xs, ys, cnt = self._cells(tasks, cell_size_m, along_x)
+        # ячейки, целиком попавшие в запретные зоны, лететь не нужно
+        live = np.flatnonzero(cnt > 0)
+        if len(live) == 0:
+            return None
+        first = np.cumsum(cnt) - cnt
+        entries, exits = block_ends(xs, ys, first[live], cnt[live])
+        centers = np.array([(t.target.x, t.target.y) for t in tasks], dtype=float)[live]
+        order, orient = self.sequencer.sequence(start, centers, entries, exits)
+        blocks = [oriented(np.arange(first[k], first[k] + cnt[k]), o)
+                  for k, o in zip(live[order].tolist(), orient.tolist())]
+        idx = np.concatenate(blocks)
+        xs, ys = xs[idx], ys[idx]
+        tags = np.repeat(np.arange(len(tasks), dtype=np.int32), cnt)[idx]
+        # переходы (между полосами, ячейками и от старта) — в обход запретных зон AOI;
+        # вставленные WP помечены задачей, к которой ведут
+        for aoi_id in sorted({t.aoi_id for t in tasks if t.aoi_id in self.polygons.aois}):
+            xs, ys, src = self.polygons.detour(aoi_id, np.concatenate([[start[0]], xs]),
+                                               np.concatenate([[start[1]], ys]))
+            xs, ys, tags = xs[1:], ys[1:], tags[src[1:] - 1]
+        plan = PlanBuffer.from_arrays(xs, ys, self.alt, 0.0, self.cruise)
+        return PlanBuffer(plan.data, tags, [t.id for t in tasks])
 
     def build_plans(self, assignment: Assignment, drones: List[DroneState],
-                    cell_size_m: float=60.0, along_x: bool=True) -> Dict[str, List[Waypoint]]:
+                    cell_size_m: float=60.0, along_x: bool=True, workers: int=1,
+                    start_method: Optional[str]=None) -> Dict[str, PlanBuffer]:
         """
         На вход: распределение задач {drone_id: [Task]}.
-        На выход: {drone_id: [Waypoint,...]} для выполнения покрытия по каждой задаче.
+        На выход: {drone_id: PlanBuffer} для выполнения покрытия по каждой задаче.
+        workers > 1 — планы дронов строятся в пуле процессов (копия генератора передаётся
+        в процесс один раз, планы возвращаются буферами to_bytes()); start_method — метод
+        запуска multiprocessing (None — по умолчанию платформы).
         """
-        plans: Dict[str, List[Waypoint]] = {d.drone_id: [] for d in drones}
-        for drone_id, tasks in assignment.items():
-            seq: List[Waypoint] = []
-            # грубая 'сшивка': сортировка задач по расстоянию (жадная эвристика)
-            cur = next(d for d in drones if d.drone_id == drone_id).pos
-            remaining = tasks[:]
-            while remaining:
-                # ближайшая следующая задача
-                nxt = min(remaining, key=lambda t: (cur.x - t.target.x)**2 + (cur.y - t.target.y)**2)
-                remaining.remove(nxt)
-                step = self._adaptive_step(nxt.priority)
-                route = self._stripe_route(center=nxt.target, size=cell_size_m, step=step, along_x=along_x)
-                seq.extend(route)
-                if route:
-                    cur = route[-1].p
-            plans[drone_id] = seq
+        plans: Dict[str, PlanBuffer] = {d.drone_id: PlanBuffer() for d in drones}
+        pos = {d.drone_id: (d.pos.x, d.pos.y) for d in drones}
+        jobs = [(drone_id, tasks, pos[drone_id], cell_size_m, along_x)
+                for drone_id, tasks in assignment.items() if tasks]
+        if workers > 1 and len(jobs) > 1:
+            ctx = mp.get_context(start_method)
+            with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), mp_context=ctx,
+                                     initializer=_pool_init, initargs=(self,)) as pool:
+                for drone_id, buf in pool.map(_pool_plan, jobs):
+                    if buf is not None:
+                        plans[drone_id] = PlanBuffer.from_bytes(buf)
+            return plans
+        for drone_id, tasks, start, _, _ in jobs:
+            plan = self._drone_plan(tasks, start, cell_size_m, along_x)
+            if plan is not None:
+                plans[drone_id] = plan
         return plans
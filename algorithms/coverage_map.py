@@ -0,0 +1,108 @@
+
+"""
+Растровая карта покрытия AOI: какие клетки уже попали в полосу обзора камеры.
+
+Карта обновляется инкрементально по пролетённым отрезкам (позиция на прошлом и
+текущем такте): отмечаются клетки, центр которых ближе fov_m/2 - res_m/2 к отрезку
+(консервативно — частично видимая клетка не считается покрытой). По карте из
+интервалов полос ячейки вычитаются покрытые участки: остаются только части полос,
+в полосе обзора которых есть непокрытые клетки, — по ним и перепланируем остаток.
+"""
+import math
+from typing import List, Sequence, Tuple
+import numpy as np
+
+def _runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Начала и концы (включительно) серий True в одномерной маске."""
+    d = np.diff(np.concatenate([[0], mask.astype(np.int8), [0]]))
+    return np.flatnonzero(d == 1), np.flatnonzero(d == -1) - 1
+
+class CoverageMap:
+    """
+    bounds — (xmin, ymin, xmax, ymax) области, res_m — размер клетки растра,
+    fov_m — ширина полосы обзора камеры на высоте полёта.
+    covered[row, col]: row — по Y, col — по X.
+    """
+    def __init__(self, bounds: Tuple[float, float, float, float], res_m: float = 2.0,
+                 fov_m: float = 20.0):
+        self.x0, self.y0, x1, y1 = (float(b) for b in bounds)
+        self.res = float(res_m)
+        self.fov_m = float(fov_m)
+        shape = (max(1, int(math.ceil((y1 - self.y0) / self.res))),
+                 max(1, int(math.ceil((x1 - self.x0) / self.res))))
+        self.covered = np.zeros(shape, dtype=bool)
+        self.touched = False     # было ли хоть одно обновление (иначе вычитать нечего)
+
+    def mark(self, x0, y0, x1, y1):
+        """Отметить полосу обзора вдоль отрезков (x0, y0) → (x1, y1) (скаляры или массивы по дронам)."""
+        r = self.fov_m / 2.0 - self.res / 2.0
+        P0 = np.stack(np.broadcast_arrays(np.asarray(x0, dtype=float), np.asarray(y0, dtype=float)), -1).reshape(-1, 2)
+        P1 = np.stack(np.broadcast_arrays(np.asarray(x1, dtype=float), np.asarray(y1, dtype=float)), -1).reshape(-1, 2)
+        if r <= 0 or len(P0) == 0:
+            return
+        # длинные отрезки дробим на куски ≤ r, чтобы окно вокруг куска было фиксированным
+        L = np.hypot(*(P1 - P0).T)
+        n = np.maximum(1, np.ceil(L / r).astype(int))
+        seg = np.repeat(np.arange(len(P0)), n)
+        k = np.arange(len(seg)) - np.repeat(np.cumsum(n) - n, n)
+        f0, f1 = (k / n[seg])[:, None], ((k + 1) / n[seg])[:, None]
+        A = P0[seg] + (P1[seg] - P0[seg])*f0
+        B = P0[seg] + (P1[seg] - P0[seg])*f1
+        w = int(math.ceil(1.5*r / self.res)) + 1
+        off = np.arange(-w, w + 1)
+        mid = np.floor(((A + B) / 2.0 - (self.x0, self.y0)) / self.res).astype(int)
+        cols = np.broadcast_to(mid[:, 0, None, None] + off[None, None, :], (len(A), len(off), len(off)))
+        rows = np.broadcast_to(mid[:, 1, None, None] + off[None, :, None], (len(A), len(off), len(off)))
+        cx = self.x0 + (cols + 0.5)*self.res
+        cy = self.y0 + (rows + 0.5)*self.res
+        # расстояние от центров клеток до отрезка A→B
+        d = B - A
+        dd = np.maximum(np.sum(d*d, axis=1), 1e-12)[:, None, None]
+        t = np.clip(((cx - A[:, 0, None, None])*d[:, 0, None, None] +
+                     (cy - A[:, 1, None, None])*d[:, 1, None, None]) / dd, 0.0, 1.0)
+        ex = cx - (A[:, 0, None, None] + t*d[:, 0, None, None])
+        ey = cy - (A[:, 1, None, None] + t*d[:, 1, None, None])
+        nr, nc = self.covered.shape
+        hit = (ex*ex + ey*ey <= r*r) & (rows >= 0) & (rows < nr) & (cols >= 0) & (cols < nc)
+        self.covered[rows[hit], cols[hit]] = True
+        self.touched = True
+
+    def covered_frac(self) -> float:
+        return float(self.covered.mean())
+
+    def free_intervals(self, levels: np.ndarray, intervals: Sequence[np.ndarray], along_x: bool = True,
+                       band=0.0) -> List[np.ndarray]:
+        """
+        Непокрытые части интервалов полос: уровень levels[i] (в координатах развёртки,
+        как в coverage_polygon), интервалы intervals[i] (m, 2). Участок полосы нужен,
+        если в полосе ±band/2 вокруг уровня есть непокрытая клетка (band — скаляр или
+        по уровням); вне растра — нужен.
+        """
+        G = self.covered if along_x else self.covered.T
+        u0, v0 = (self.x0, self.y0) if along_x else (self.y0, self.x0)
+        nv, nu = G.shape
+        out = []
+        levels = np.asarray(levels, dtype=float)
+        bands = np.broadcast_to(np.asarray(band, dtype=float), levels.shape)
+        for v, bw, iv in zip(levels.tolist(), bands.tolist(), intervals):
+            r0 = int(math.floor((v - bw / 2.0 - v0) / self.res))
+            r1 = int(math.floor((v + bw / 2.0 - v0) / self.res))
+            if r1 < 0 or r0 >= nv:
+                out.append(np.asarray(iv, dtype=float).reshape(-1, 2))
+                continue
+            free = ~G[max(r0, 0):min(r1, nv - 1) + 1].all(axis=0)
+            parts = []
+            for a, b in np.asarray(iv, dtype=float).reshape(-1, 2).tolist():
+                c0 = int(math.floor((a - u0) / self.res))
+                c1 = int(math.floor((b - u0) / self.res))
+                m = np.ones(c1 - c0 + 1, dtype=bool)
+                lo, hi = max(c0, 0), min(c1, nu - 1)
+                if lo <= hi:
+                    m[lo - c0:hi - c0 + 1] = free[lo:hi + 1]
+                s, e = _runs(m)
+                pa = np.maximum(u0 + (c0 + s)*self.res, a)
+                pb = np.minimum(u0 + (c0 + e + 1)*self.res, b)
+                parts.append(np.stack([pa, pb], axis=1))
+            iv = np.concatenate(parts) if parts else np.zeros((0, 2))
+            out.append(iv[iv[:, 1] - iv[:, 0] > 1e-6])
+        return out
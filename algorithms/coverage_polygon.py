@@ -0,0 +1,314 @@
+
+"""
+Покрытие AOI-полигонов с запретными зонами (дырами) без внешних геометрических библиотек.
+
+Сканирующие прямые (полосы) с шагом step пересекаются со всеми рёбрами контура и дыр
+одним выражением NumPy; по правилу чёт-нечёт получаем свободные интервалы на каждой
+прямой. Бустрофедонная декомпозиция: соседние прямые, чьи интервалы перекрываются
+один-к-одному, образуют одну ячейку; при смене топологии (обход дыры, развилка
+контура) ячейки закрываются и открываются новые. Внутри ячейки полосы проходятся
+змейкой, ячейки между собой — через TourSequencer. Переход между WP прямой, а если
+он задевает внутренность дыры — в обход по кратчайшему пути графа видимости вершин
+дыр (вершины отодвинуты от дыры на margin_m).
+
+Декомпозиция AOI и граф видимости кэшируются по AOI; register() их сбрасывает.
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from schemas import Point, Task
+from tour_sequencing import TourSequencer, block_ends, oriented
+
+Ring = np.ndarray            # (n, 2) вершины замкнутого контура
+Stripe = Tuple[float, float, float]   # (уровень, начало, конец) в координатах развёртки
+
+def _ring(points) -> Ring:
+    return np.array([(p.x, p.y) if isinstance(p, Point) else tuple(p) for p in points], dtype=float).reshape(-1, 2)
+
+def scan_intervals(rings: Sequence[Ring], levels: np.ndarray) -> List[np.ndarray]:
+    """
+    Свободные интервалы на горизонталях y = levels для области «контур минус дыры»
+    (чёт-нечёт по всем кольцам). Возвращает список массивов (m, 2) [x0, x1] по уровням.
+    """
+    E = np.concatenate([np.hstack([r, np.roll(r, -1, axis=0)]) for r in rings if len(r) >= 3])
+    x0, y0, x1, y1 = E.T
+    L = np.asarray(levels, dtype=float)[:, None]
+    # полуоткрытое правило: вершина на уровне считается один раз
+    cross = ((y0 <= L) & (y1 > L)) | ((y1 <= L) & (y0 > L))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x = x0 + (L - y0) * (x1 - x0) / (y1 - y0)
+    x = np.where(cross, x, np.inf)
+    x.sort(axis=1)
+    out = []
+    for row, k in zip(x, cross.sum(axis=1)):
+        iv = row[:k - k % 2].reshape(-1, 2)
+        out.append(iv[iv[:, 1] > iv[:, 0]])
+    return out
+
+def _edges(rings: Sequence[Ring]) -> np.ndarray:
+    # рёбра колец (m, 4): x0, y0, x1, y1
+    return np.concatenate([np.hstack([r, np.roll(r, -1, axis=0)]) for r in rings])
+
+def in_holes(holes: Sequence[Ring], x, y, eps: float = 1e-6) -> np.ndarray:
+    """Точки строго внутри хотя бы одной дыры (дальше eps от её границы)."""
+    px, py = np.asarray(x, dtype=float)[:, None], np.asarray(y, dtype=float)[:, None]
+    out = np.zeros(len(px), dtype=bool)
+    for h in holes:
+        x0, y0, x1, y1 = _edges([h]).T
+        with np.errstate(divide='ignore', invalid='ignore'):
+            xc = x0 + (py - y0) * (x1 - x0) / (y1 - y0)
+        odd = (((y0 > py) != (y1 > py)) & (px < xc)).sum(axis=1) % 2 == 1
+        # расстояние до рёбер: точки на границе внутренними не считаем
+        dx, dy = x1 - x0, y1 - y0
+        t = np.clip(((px - x0)*dx + (py - y0)*dy) / np.maximum(dx*dx + dy*dy, 1e-12), 0.0, 1.0)
+        d2 = (px - x0 - t*dx)**2 + (py - y0 - t*dy)**2
+        out |= odd & (d2.min(axis=1) > eps*eps)
+    return out
+
+def crosses_holes(holes: Sequence[Ring], ax, ay, bx, by) -> np.ndarray:
+    """
+    Отрезки A→B (массивы), задевающие внутренность дыр: отрезок режется точками
+    пересечения с рёбрами дыр, середины кусков проверяются in_holes. Проход по
+    границе дыры (вдоль ребра, через вершину) пересечением не считается.
+    """
+    A = np.stack([np.asarray(ax, dtype=float), np.asarray(ay, dtype=float)], -1).reshape(-1, 2)
+    B = np.stack([np.asarray(bx, dtype=float), np.asarray(by, dtype=float)], -1).reshape(-1, 2)
+    out = np.zeros(len(A), dtype=bool)
+    if not holes or len(A) == 0:
+        return out
+    E = _edges(holes)
+    lo, hi = E[:, :2].min(axis=0).copy(), E[:, :2].max(axis=0).copy()
+    # отрезки вне общего габарита дыр не проверяем
+    near = np.flatnonzero((np.maximum(A, B) >= lo).all(axis=1) & (np.minimum(A, B) <= hi).all(axis=1))
+    if len(near) == 0:
+        return out
+    a, d = A[near], B[near] - A[near]
+    e = E[:, 2:] - E[:, :2]
+    wx, wy = E[None, :, 0] - a[:, None, 0], E[None, :, 1] - a[:, None, 1]
+    den = d[:, None, 0]*e[None, :, 1] - d[:, None, 1]*e[None, :, 0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = (wx*e[None, :, 1] - wy*e[None, :, 0]) / den
+        u = (wx*d[:, None, 1] - wy*d[:, None, 0]) / den
+    ok = (np.abs(den) > 1e-12) & (u >= -1e-9) & (u <= 1.0 + 1e-9) & (t > 0.0) & (t < 1.0)
+    T = np.sort(np.hstack([np.zeros((len(a), 1)), np.where(ok, t, np.nan), np.ones((len(a), 1))]), axis=1)
+    mid = (T[:, :-1] + T[:, 1:]) / 2.0
+    live = np.isfinite(mid)
+    seg, k = np.nonzero(live)
+    hit = in_holes(holes, a[seg, 0] + mid[seg, k]*d[seg, 0], a[seg, 1] + mid[seg, k]*d[seg, 1])
+    out[near[np.unique(seg[hit])]] = True
+    return out
+
+def _offset_vertices(holes: Sequence[Ring], margin: float) -> np.ndarray:
+    # вершины дыр, сдвинутые наружу по биссектрисе внешних нормалей соседних рёбер
+    out = []
+    for h in holes:
+        e = np.roll(h, -1, axis=0) - h
+        area = np.sum(h[:, 0]*np.roll(h[:, 1], -1) - np.roll(h[:, 0], -1)*h[:, 1])
+        n = np.stack([e[:, 1], -e[:, 0]], axis=1) * (1.0 if area > 0 else -1.0)
+        n /= np.maximum(np.hypot(*n.T), 1e-12)[:, None]
+        b = n + np.roll(n, 1, axis=0)
+        b /= np.maximum(np.hypot(*b.T), 1e-12)[:, None]
+        out.append(h + margin*b)
+    return np.concatenate(out) if out else np.zeros((0, 2))
+
+def _shortest(D: np.ndarray, s: int, t: int) -> List[int]:
+    # Дейкстра по плотной матрице весов (inf — ребра нет); [] — пути нет
+    N = len(D)
+    dist, prev = np.full(N, np.inf), np.full(N, -1)
+    done = np.zeros(N, dtype=bool)
+    dist[s] = 0.0
+    while True:
+        i = int(np.argmin(np.where(done, np.inf, dist)))
+        if done[i] or not np.isfinite(dist[i]):
+            return []
+        if i == t:
+            break
+        done[i] = True
+        nd = dist[i] + D[i]
+        upd = (nd < dist) & ~done
+        dist[upd], prev[upd] = nd[upd], i
+    path = [t]
+    while path[-1] != s:
+        path.append(int(prev[path[-1]]))
+    return path[::-1]
+
+def decompose(levels: np.ndarray, intervals: List[np.ndarray]) -> List[np.ndarray]:
+    """Бустрофедонные ячейки: список массивов полос (s, 3) — уровень, x0, x1."""
+    cells: List[List[Stripe]] = []
+    prev = np.zeros((0, 2))
+    prev_cell: List[int] = []
+    for y, iv in zip(np.asarray(levels, dtype=float).tolist(), intervals):
+        # перекрытия интервалов соседних уровней (prev × cur)
+        M = (prev[:, None, 0] < iv[None, :, 1]) & (iv[None, :, 0] < prev[:, None, 1])
+        rows, cols = M.sum(axis=1), M.sum(axis=0)
+        cur_cell = []
+        for j, (a, b) in enumerate(iv.tolist()):
+            i = int(np.argmax(M[:, j])) if cols[j] == 1 else -1
+            if i >= 0 and rows[i] == 1:
+                c = prev_cell[i]
+            else:
+                c = len(cells)
+                cells.append([])
+            cells[c].append((y, a, b))
+            cur_cell.append(c)
+        prev, prev_cell = iv, cur_cell
+    return [np.array(c, dtype=float) for c in cells]
+
+def cell_path(S: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Змейка по полосам ячейки S (s, 3) → (u, v) в координатах развёртки, по 2 WP на полосу."""
+    k = np.arange(len(S))
+    a = np.where(k % 2 == 0, S[:, 1], S[:, 2])
+    b = np.where(k % 2 == 0, S[:, 2], S[:, 1])
+    return np.stack([a, b], axis=1).ravel(), np.repeat(S[:, 0], 2)
+
+class PolygonCoverage:
+    """
+    Реестр AOI (контур + дыры) и кэш их декомпозиций. Координаты развёртки:
+    along_x=True — полосы параллельны X (u = x, v = y), иначе наоборот.
+    """
+    def __init__(self, sequencer: Optional[TourSequencer] = None, margin_m: float = 1.0):
+        self.aois: Dict[str, List[Ring]] = {}
+        self.sequencer = sequencer or TourSequencer(max_passes=2)
+        # граф видимости вершин дыр AOI для обхода: (вершины (N, 2), веса (N, N))
+        self.margin_m = margin_m
+        self._vis: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._decomp: Dict[Tuple[str, float, bool], Tuple[np.ndarray, List[np.ndarray], List[np.ndarray]]] = {}
+        self.cell_index: Dict[str, Tuple[str, float, bool, int]] = {}   # task_id → ячейка декомпозиции
+
+    def register(self, aoi_id: str, boundary, holes: Sequence = ()):
+        """Контур AOI и запретные полигоны (списки Point или пар координат)."""
+        self.aois[aoi_id] = [_ring(boundary)] + [_ring(h) for h in holes]
+        for key in [k for k in self._decomp if k[0] == aoi_id]:
+            del self._decomp[key]
+        self._vis.pop(aoi_id, None)
+        self.cell_index = {t: c for t, c in self.cell_index.items() if c[0] != aoi_id}
+
+    def _rings(self, aoi_id: str, along_x: bool) -> List[Ring]:
+        rings = self.aois[aoi_id]
+        return rings if along_x else [r[:, ::-1] for r in rings]
+
+    def decomposition(self, aoi_id: str, step: float, along_x: bool = True):
+        """(levels, intervals, cells) AOI для шага step — из кэша или построение."""
+        key = (aoi_id, float(step), bool(along_x))
+        if key not in self._decomp:
+            rings = self._rings(aoi_id, along_x)
+            v = rings[0][:, 1]
+            levels = np.arange(v.min() + step / 2.0, v.max(), step)
+            intervals = scan_intervals(rings, levels)
+            self._decomp[key] = (levels, intervals, decompose(levels, intervals))
+        return self._decomp[key]
+
+    def _visibility(self, aoi_id: str) -> Tuple[np.ndarray, np.ndarray]:
+        if aoi_id not in self._vis:
+            holes = self.aois[aoi_id][1:]
+            V = _offset_vertices(holes, self.margin_m)
+            V = V[~in_holes(holes, V[:, 0], V[:, 1])]
+            i, j = np.triu_indices(len(V), 1)
+            D = np.full((len(V), len(V)), np.inf)
+            free = ~crosses_holes(holes, V[i, 0], V[i, 1], V[j, 0], V[j, 1])
+            D[i[free], j[free]] = D[j[free], i[free]] = np.hypot(*(V[j[free]] - V[i[free]]).T)
+            self._vis[aoi_id] = (V, D)
+        return self._vis[aoi_id]
+
+    def detour(self, aoi_id: str, x: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Маршрут (x, y) с обходом дыр AOI: в переходы, задевающие дыру, вставляются
+        вершины кратчайшего пути по графу видимости. Возвращает (x, y, src): src — индекс
+        исходной WP для каждой WP результата (вставленные относятся к WP, в которую ведут).
+        ValueError — переход не обойти (конец в кармане, замкнутом дырами): прямой отрезок
+        через запретную зону не возвращаем.
+        """
+        x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+        src = np.arange(len(x))
+        holes = self.aois.get(aoi_id, [])[1:]
+        if not holes or len(x) < 2:
+            return x, y, src
+        bad = np.flatnonzero(crosses_holes(holes, x[:-1], y[:-1], x[1:], y[1:]))
+        if len(bad) == 0:
+            return x, y, src
+        V, D = self._visibility(aoi_id)
+        N = len(V)
+        W = np.full((N + 2, N + 2), np.inf)
+        W[:N, :N] = D
+        px, py, ps = [x[:bad[0] + 1]], [y[:bad[0] + 1]], [src[:bad[0] + 1]]
+        for n, i in enumerate(bad.tolist()):
+            # концы перехода — в граф видимости, путь — Дейкстрой
+            for k, (u, v) in ((N, (x[i], y[i])), (N + 1, (x[i+1], y[i+1]))):
+                free = ~crosses_holes(holes, np.full(N, u), np.full(N, v), V[:, 0], V[:, 1])
+                W[k, :N] = W[:N, k] = np.where(free, np.hypot(V[:, 0] - u, V[:, 1] - v), np.inf)
+            path = _shortest(W, N, N + 1)
+            if not path:
+                raise ValueError(f"AOI {aoi_id}: no path around holes from ({x[i]:.1f}, {y[i]:.1f}) "
+                                 f"to ({x[i+1]:.1f}, {y[i+1]:.1f})")
+            path = path[1:-1]
+            px.append(V[path, 0])
+            py.append(V[path, 1])
+            ps.append(np.full(len(path), i + 1))
+            end = bad[n + 1] + 1 if n + 1 < len(bad) else len(x)
+            px.append(x[i+1:end])
+            py.append(y[i+1:end])
+            ps.append(src[i+1:end])
+        return np.concatenate(px), np.concatenate(py), np.concatenate(ps)
+
+    def cell_tasks(self, aoi_id: str, step: float, priority: float = 0.5,
+                   along_x: bool = True) -> List[Task]:
+        """Задачи по ячейкам декомпозиции AOI (target — центр масс полос ячейки)."""
+        _, _, cells = self.decomposition(aoi_id, step, along_x)
+        out = []
+        for k, S in enumerate(cells):
+            w = S[:, 2] - S[:, 1]
+            u = float(np.sum(w * (S[:, 1] + S[:, 2]) / 2.0) / max(w.sum(), 1e-9))
+            v = float(np.sum(w * S[:, 0]) / max(w.sum(), 1e-9))
+            x, y = (u, v) if along_x else (v, u)
+            t = Task(id=f"{aoi_id}#{k}", priority=priority, target=Point(x, y), aoi_id=aoi_id)
+            self.cell_index[t.id] = (aoi_id, float(step), bool(along_x), k)
+            out.append(t)
+        return out
+
+    def route(self, cells: List[np.ndarray], along_x: bool) -> Tuple[np.ndarray, np.ndarray]:
+        """Змейки ячеек (s, 3), сшитые в один маршрут (порядок и ориентации — TourSequencer) → (x, y)."""
+        cells = [S for S in cells if len(S)]
+        if not cells:
+            return np.zeros(0), np.zeros(0)
+        paths = [cell_path(S) for S in cells]
+        u = np.concatenate([p[0] for p in paths])
+        v = np.concatenate([p[1] for p in paths])
+        if len(cells) > 1:
+            cnt = np.array([len(p[0]) for p in paths])
+            start = np.cumsum(cnt) - cnt
+            entries, exits = block_ends(u, v, start, cnt)
+            order, orient = self.sequencer.sequence(tuple(entries[0, 0]), entries[:, 0], entries, exits)
+            idx = np.concatenate([oriented(np.arange(start[k], start[k] + cnt[k]), o)
+                                  for k, o in zip(order.tolist(), orient.tolist())])
+            u, v = u[idx], v[idx]
+        return (u, v) if along_x else (v, u)
+
+    def cell_route(self, task_id: str) -> Tuple[np.ndarray, np.ndarray]:
+        """WP (x, y) ячейки декомпозиции, созданной cell_tasks()."""
+        aoi_id, step, along_x, k = self.cell_index[task_id]
+        _, _, cells = self.decomposition(aoi_id, step, along_x)
+        return self.route([cells[k]], along_x)
+
+    def square_intervals(self, aoi_id: str, center: Point, size: float, step: float,
+                         along_x: bool = True, levels: Optional[np.ndarray] = None) -> Tuple[np.ndarray, List[np.ndarray]]:
+        """
+        Полосы квадратной ячейки задачи по свободной области AOI: уровни кэшированной
+        декомпозиции AOI внутри квадрата (или заданные levels — сечения строятся заново),
+        интервалы обрезаны по его краям.
+        """
+        half = size / 2.0
+        cu, cv = (center.x, center.y) if along_x else (center.y, center.x)
+        if levels is None:
+            levels, intervals, _ = self.decomposition(aoi_id, step, along_x)
+        else:
+            intervals = scan_intervals(self._rings(aoi_id, along_x), levels)
+        sel = np.flatnonzero((levels >= cv - half) & (levels < cv + half))
+        clipped = []
+        for i in sel.tolist():
+            iv = np.clip(intervals[i], cu - half, cu + half)
+            clipped.append(iv[iv[:, 1] > iv[:, 0]])
+        return levels[sel], clipped
+
+    def clip_square(self, aoi_id: str, center: Point, size: float, step: float,
+                    along_x: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+        """WP квадратной ячейки задачи, обрезанной по свободной области AOI."""
+        return self.route(decompose(*self.square_intervals(aoi_id, center, size, step, along_x)), along_x)
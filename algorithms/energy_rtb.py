@@ -1,7 +1,9 @@
 
-from dataclasses import dataclass
+from dataclasses import dataclass, astuple
 from typing import Dict, List, Optional, Tuple
+import numpy as np
 from schemas import Point, Waypoint, DroneState
+from plan_buffer import PlanBuffer
 
 @dataclass
 class LinkStats:
@@ -15,6 +17,11 @@ class EnergyModel:
     p_hover_W: float  = 70.0      # мощность в висении
     p_maneuver_W: float = 80.0    # на манёврах/разворотах
     v_cruise_mps: float = 3.0
+    # посегментная модель плана (segment_energy)
+    wind_mps: Tuple[float, float] = (0.0, 0.0)   # вектор ветра (куда дует), м/с
+    drag_frac: float = 0.1        # прирост мощности на (v_air² / v_cruise² − 1)
+    turn_rate_rps: float = 1.0    # скорость разворота, рад/с (время манёвра = угол / скорость)
+    accel_mps2: float = 1.5       # ускорение при смене скорости между сегментами
 
 @dataclass
 class EnergyPolicy:
@@ -24,6 +31,10 @@ class EnergyPolicy:
     q_ok: float = 0.7                # допустимое качество связи
     q_crit: float = 0.4              # критическое качество связи
 
+# коды режимов decide_batch(): MODES[code] — строковый режим RTBDecision
+CONTINUE, SIMPLIFY, RTB, LAND_LZ = 0, 1, 2, 3
+MODES = ("continue", "simplify", "rtb", "land_lz")
+
 @dataclass
 class RTBDecision:
     mode: str                        # "continue" | "simplify" | "handoff" | "rtb" | "land_lz"
@@ -38,6 +49,13 @@ def _link_quality(ls: LinkStats) -> float:
     loss_q = 1.0 - max(0.0, min(1.0, ls.loss_rate))       # 0 потерь → 1.0
     return 0.5*rssi_q + 0.3*snr_q + 0.2*loss_q
 
+def link_quality(rssi, snr, loss_rate) -> np.ndarray:
+    """Векторный _link_quality по массивам RSSI/SNR/потерь."""
+    rssi_q = np.clip((np.asarray(rssi, dtype=float) + 90.0) / 40.0, 0.0, 1.0)
+    snr_q = np.clip(np.asarray(snr, dtype=float) / 30.0, 0.0, 1.0)
+    loss_q = 1.0 - np.clip(np.asarray(loss_rate, dtype=float), 0.0, 1.0)
+    return 0.5*rssi_q + 0.3*snr_q + 0.2*loss_q
+
 def _dist(a: Point, b: Point) -> float:
     import math
     return math.hypot(a.x - b.x, a.y - b.y)
@@ -68,14 +86,136 @@ class EnergyRTBManager:
         self.policy = policy
 
     def _estimate_rtb_energy(self, cur: Point) -> float:
-        D = _dist(cur, self.home)
-        t = D / max(self.model.v_cruise_mps, 0.1)
-        return self.model.p_cruise_W * t + self._reserve_energy(t)
+        # Вт·с → Вт·ч (в тех же единицах, что battery_rem_Wh)
+        return float(self.rtb_energy(cur.x, cur.y))
 
     def _reserve_energy(self, t_sec: float) -> float:
         # Резерв: фиксированный минимум + манёвры
         return self.model.p_hover_W * 120.0 + self.model.p_maneuver_W * 10.0
 
+    # --- векторные оценки для планирования (те же формулы, что в decide) ---
+
+    def mission_energy(self, length_m):
+        """E_mission из decide() для маршрута длиной length_m (м, скаляр или массив), Вт·ч."""
+        t = np.asarray(length_m, dtype=float) / max(self.model.v_cruise_mps, 0.1)
+        return (self.model.p_cruise_W * t + self.model.p_maneuver_W * 5.0) / 3600.0
+
+    def rtb_energy(self, x, y):
+        """Энергия на прямой перелёт домой из точек x, y (крейсер с учётом ветра + резерв), Вт·ч."""
+        dx = self.home.x - np.asarray(x, dtype=float)
+        dy = self.home.y - np.asarray(y, dtype=float)
+        D = np.hypot(dx, dy)
+        v = max(self.model.v_cruise_mps, 0.1)
+        ux, uy = np.divide(dx, D, out=np.zeros_like(D), where=D > 0), np.divide(dy, D, out=np.zeros_like(D), where=D > 0)
+        t = D / v
+        return (self._air_power(ux, uy, v) * t + self._reserve_energy(t)) / 3600.0
+
+    # --- энергия по плану: префиксный индекс PlanBuffer (ключ "Wh", метка — параметры модели) ---
+
+    def _air_power(self, ux, uy, v):
+        # мощность при путевой скорости v по направлению (ux, uy): растёт с воздушной скоростью
+        m = self.model
+        ax = v*ux - m.wind_mps[0]
+        ay = v*uy - m.wind_mps[1]
+        return m.p_cruise_W * (1.0 + m.drag_frac*((ax*ax + ay*ay) / max(m.v_cruise_mps, 0.1)**2 - 1.0))
+
+    def segment_energy(self, data: np.ndarray, j0: int, j1: int) -> np.ndarray:
+        """
+        Энергия сегментов плана, ведущих в WP j0..j1-1, Вт·ч, одним векторным проходом:
+        полёт со скоростью WP (мощность по воздушной скорости с учётом ветра), разворот
+        в начале сегмента (угол / turn_rate_rps на p_maneuver_W), смена скорости
+        (|Δv| / accel_mps2 на p_maneuver_W) и висение hold на WP.
+        """
+        if j1 <= j0:
+            return np.zeros(0)
+        m = self.model
+        a = max(j0 - 2, 0)                      # разворот в начале сегмента требует две WP до него
+        D = data[:, a:j1]
+        dx, dy = np.diff(D[0]), np.diff(D[1])   # сегменты в WP a+1 .. j1-1
+        L = np.hypot(dx, dy)
+        v = np.maximum(D[4, 1:], 0.1)
+        ux = np.divide(dx, L, out=np.zeros_like(L), where=L > 0)
+        uy = np.divide(dy, L, out=np.zeros_like(L), where=L > 0)
+        e = self._air_power(ux, uy, v) * L / v
+        turn = np.where((L[1:] > 0) & (L[:-1] > 0),
+                        np.arccos(np.clip(ux[1:]*ux[:-1] + uy[1:]*uy[:-1], -1.0, 1.0)), 0.0)
+        e[1:] += m.p_maneuver_W * turn / max(m.turn_rate_rps, 1e-3)
+        e += m.p_maneuver_W * np.abs(np.diff(D[4])) / max(m.accel_mps2, 1e-3)
+        e += m.p_hover_W * D[3, 1:]
+        if j0 == 0:
+            e = np.concatenate([[m.p_hover_W * D[3, 0]], e])
+        return e[len(e) - (j1 - j0):] / 3600.0
+
+
+    def _lead_Wh(self, plan: PlanBuffer, x: float, y: float) -> float:
+        # перелёт от позиции до текущей WP плана и висение на ней
+        dx, dy = float(plan.x[0] - x), float(plan.y[0] - y)
+        d = float(np.hypot(dx, dy))
+        v = max(self.model.v_cruise_mps, 0.1)
+        p = self._air_power(dx / d, dy / d, v) if d > 0 else self.model.p_cruise_W
+        hold = float(plan.data[3, plan.cursor])
+        return (p * d / v + self.model.p_hover_W * hold) / 3600.0
+
+    def plan_energy(self, plan: PlanBuffer, x: float, y: float) -> float:
+        """Энергия на остаток плана от позиции (x, y), Вт·ч — O(1) по префиксному индексу."""
+        if not plan:
+            return 0.0
+        # индекс пересчитывается при новой версии плана или смене параметров модели (ветер)
+        return plan.remaining("Wh", self.segment_energy, lead=self._lead_Wh(plan, x, y), tag=astuple(self.model))
+
+    def work_length(self, plan: PlanBuffer) -> float:
+        """
+        Длина работы на сегменте plan для ставок CBBALite (task_len_m), м: крейсерский путь,
+        на который mission_energy() тратит столько же, сколько plan_energy() на сегмент от его
+        первой WP (полосы, развороты, ветер). Постоянная манёвров mission_energy не входит.
+        """
+        if not plan:
+            return 0.0
+        Wh = self.plan_energy(plan, float(plan.x[0]), float(plan.y[0]))
+        return Wh * 3600.0 / self.model.p_cruise_W * max(self.model.v_cruise_mps, 0.1)
+
+    def plan_reach(self, plan: PlanBuffer, budget_Wh: float, x: float, y: float) -> int:
+        """Сколько WP плана (от текущей) можно пройти на budget_Wh — бинарный поиск по индексу."""
+        if not plan:
+            return 0
+        return plan.reach(budget_Wh, "Wh", self.segment_energy, lead=self._lead_Wh(plan, x, y), tag=astuple(self.model))
+
+    def reach_mask(self, battery_Wh, dist_m, targets: np.ndarray, extra_m: float = 0.0) -> np.ndarray:
+        """
+        Грубая достижимость (…, T): хватает ли battery_Wh долететь на dist_m до целей
+        targets (T, 2), пройти там extra_m и вернуться на базу с резервом.
+        """
+        need = self.mission_energy(np.asarray(dist_m) + extra_m) + self.rtb_energy(targets[:, 0], targets[:, 1])
+        return np.asarray(battery_Wh) >= need
+
+    def decide_batch(self, x, y, battery_rem_Wh, rssi, snr, loss_rate, remaining_plan_m,
+                     mission_Wh=None) -> np.ndarray:
+        """
+        Решения decide() для всего флота одним векторным вычислением: массивы позиций,
+        заряда, статистики связи и остатка плана → коды режимов (CONTINUE/SIMPLIFY/RTB/LAND_LZ).
+        mission_Wh — энергия на остаток плана по посегментной модели (plan_energy); без
+        неё — грубая оценка по remaining_plan_m, как в decide().
+        Маршрут RTB/LZ для красной зоны — recovery().
+        """
+        q = link_quality(rssi, snr, loss_rate)
+        E_mission = self.mission_energy(remaining_plan_m) if mission_Wh is None else np.asarray(mission_Wh, dtype=float)
+        E_rtb = self.rtb_energy(x, y)
+        battery = np.asarray(battery_rem_Wh, dtype=float)
+        delta_E = battery - (E_mission + E_rtb)
+        ok = (delta_E >= self.policy.ok_margin * E_rtb) & (q >= self.policy.q_ok)
+        yellow = (delta_E >= self.policy.min_margin * E_rtb) & (q >= self.policy.q_crit)
+        red = np.where(battery >= E_rtb, RTB, LAND_LZ)
+        return np.where(ok, CONTINUE, np.where(yellow, SIMPLIFY, red)).astype(np.int8)
+
+    def recovery(self, drone: DroneState, code: int) -> RTBDecision:
+        """RTBDecision по коду decide_batch(); для RTB/LAND_LZ — с маршрутом до базы/ЛЗ."""
+        if code == RTB:
+            return RTBDecision(mode="rtb", rtb_plan=_straight_path(drone.pos, self.home, altitude=self.alt))
+        if code == LAND_LZ:
+            lz = self._pick_lz(drone.pos)
+            return RTBDecision(mode="land_lz", rtb_plan=_straight_path(drone.pos, lz, altitude=self.alt), target_lz=lz)
+        return RTBDecision(mode=MODES[code])
+
     def _pick_lz(self, cur: Point) -> Point:
         # выбираем ближайшую LZ
         return min(self.lz_list, key=lambda p: _dist(cur, p)) if self.lz_list else self.home
@@ -92,7 +232,7 @@ class EnergyRTBManager:
         q = _link_quality(link)
         # энергозатраты на остаток плана (крейсер)
         t_plan = remaining_plan_m / max(self.model.v_cruise_mps, 0.1)
-        E_mission = self.model.p_cruise_W * t_plan + self.model.p_maneuver_W * 5.0
+        E_mission = (self.model.p_cruise_W * t_plan + self.model.p_maneuver_W * 5.0) / 3600.0
         E_rtb = self._estimate_rtb_energy(drone.pos)
 
         # "резерв по безопасности" — сколько останется после миссии и RTB
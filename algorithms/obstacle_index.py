@@ -0,0 +1,53 @@
+
+import math
+from typing import List, Optional
+import numpy as np
+from avoidance_types import Obstacle
+import avoidance_batch as ab
+
+class ObstacleIndex:
+    """
+    Индекс препятствий одного такта (ЛСК дрона), перестраивается каждый такт:
+    1) отсечение по кругу досягаемости (vmax + |v_o|) * horizon_s + pad_m;
+    2) сортировка оставшихся по пеленгу — выборка сектора курса бинарным поиском.
+    Стоимость запросов определяется локальной плотностью, а не общим числом детекций.
+    """
+    def __init__(self, obstacles: Optional[List[Obstacle]], vmax: float,
+                 horizon_s: float, pad_m: float):
+        obstacles = obstacles or []
+        O = ab.obstacle_arrays(obstacles)
+        keep = np.flatnonzero(ab.reach_mask(O, vmax, horizon_s, pad_m))
+        O = O[:, keep]
+        bearing = np.arctan2(O[1], O[0])
+        order = np.argsort(bearing, kind="stable")
+        self.obstacles = [obstacles[i] for i in keep[order]]
+        self.bearing = bearing[order]
+        d = np.maximum(np.hypot(O[0], O[1]), 1e-6)[order]
+        self.alpha = np.arcsin(np.clip((O[4][order] + pad_m) / d, 0.0, 1.0))
+        self.alpha_max = float(self.alpha.max()) if len(self.alpha) else 0.0
+        self.moving = np.flatnonzero(np.hypot(O[2], O[3])[order] > 1e-3)
+
+    def __len__(self) -> int:
+        return len(self.obstacles)
+
+    def for_heading(self, vx: float, vy: float) -> List[Obstacle]:
+        """Препятствия, значимые для кандидата (vx, vy): передняя полуплоскость курса + движущиеся."""
+        if math.hypot(vx, vy) < 1e-6 or not self.obstacles:
+            return self.obstacles
+        phi = math.atan2(vy, vx)
+        hw = math.pi/2 + self.alpha_max
+        if hw >= math.pi:
+            sel = np.arange(len(self.obstacles))
+        else:
+            # окно [phi - hw, phi + hw] с учётом перехода через ±pi
+            lo, hi = phi - hw, phi + hw
+            parts = []
+            for a, b in ((lo, hi), (lo + 2*math.pi, hi + 2*math.pi), (lo - 2*math.pi, hi - 2*math.pi)):
+                i0, i1 = np.searchsorted(self.bearing, [a, b])
+                if i1 > i0:
+                    parts.append(np.arange(i0, i1))
+            sel = np.concatenate(parts) if parts else np.zeros(0, dtype=int)
+        dif = np.abs((self.bearing[sel] - phi + math.pi) % (2*math.pi) - math.pi)
+        sel = sel[dif <= math.pi/2 + self.alpha[sel]]
+        sel = np.union1d(sel, self.moving)
+        return [self.obstacles[i] for i in sel]
@@ -0,0 +1,240 @@
+
+"""
+Компактное хранение плана полёта: непрерывные массивы float64 (x, y, z, hold, speed)
+и метки задач (int32, индекс в names; -1 — без задачи) вместо списка Waypoint.
+Курсор отмечает текущую WP: advance() — O(1), срезы и прореживание — представления
+NumPy без копирования, to_bytes()/from_bytes() — сериализация одним буфером.
+Индексы и длина — относительно курсора, как у списка после pop(0).
+Префиксные индексы (длина пути, энергия) по WP буфера дают остаток плана за O(1)
+и «докуда хватит» бинарным поиском; при дозаписи в конец они дополняются, при прочих
+изменениях (version) строятся заново одним векторным проходом.
+"""
+import json
+import math
+import struct
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+from schemas import Point, Waypoint
+
+FIELDS = ("x", "y", "z", "hold", "speed")
+
+# стоимость сегментов: seg(data, j0, j1) → (j1 - j0,) — стоимость перехода в WP j0..j1-1
+# из предыдущей WP (для WP 0 — без перехода); зависит только от data и не более чем
+# от SEG_LOOKBACK WP до сегмента (разворот в его начале)
+SegmentCost = Callable[[np.ndarray, int, int], np.ndarray]
+SEG_LOOKBACK = 2
+
+def segment_lengths(data: np.ndarray, j0: int, j1: int) -> np.ndarray:
+    """Длины сегментов по XY, ведущих в WP j0..j1-1, м."""
+    a = max(j0 - 1, 0)
+    d = np.hypot(np.diff(data[0, a:j1]), np.diff(data[1, a:j1]))
+    return np.concatenate([[0.0], d]) if j0 == 0 and j1 > 0 else d
+
+class PlanBuffer:
+    def __init__(self, data: Optional[np.ndarray] = None, tags: Optional[np.ndarray] = None,
+                 names: Optional[List[str]] = None):
+        # data: (5, n) — строки FIELDS; tags: (n,) int32
+        self.data = np.zeros((5, 0)) if data is None else data
+        n = self.data.shape[1]
+        self.tags = np.full(n, -1, dtype=np.int32) if tags is None else tags
+        self.names: List[str] = [] if names is None else names
+        self.cursor = 0
+        self.version = 0          # растёт при изменении WP; курсор версию не меняет
+        self._prefix: Dict[str, Tuple[SegmentCost, object, np.ndarray]] = {}
+
+    # --- построение ---
+
+    @classmethod
+    def from_arrays(cls, x, y, z=0.0, hold=0.0, speed=3.0, task_id: Optional[str] = None) -> "PlanBuffer":
+        """План из массивов координат (скаляры z/hold/speed растягиваются); task_id — метка всех WP."""
+        x = np.asarray(x, dtype=float)
+        data = np.empty((5, len(x)))
+        data[0], data[1], data[2], data[3], data[4] = x, y, z, hold, speed
+        if task_id is None:
+            return cls(data)
+        return cls(data, np.zeros(len(x), dtype=np.int32), [task_id])
+
+    @classmethod
+    def from_waypoints(cls, wps: Iterable[Waypoint]) -> "PlanBuffer":
+        wps = list(wps)
+        names: List[str] = []
+        index = {}
+        tags = np.full(len(wps), -1, dtype=np.int32)
+        for i, w in enumerate(wps):
+            if w.task_id is not None:
+                tags[i] = index.setdefault(w.task_id, len(index))
+                if tags[i] == len(names):
+                    names.append(w.task_id)
+        data = np.array([(w.p.x, w.p.y, w.p.z, w.hold_sec, w.speed_mps) for w in wps], dtype=float).reshape(-1, 5).T
+        return cls(np.ascontiguousarray(data), tags, names)
+
+    @classmethod
+    def concat(cls, parts: Sequence["PlanBuffer"]) -> "PlanBuffer":
+        """Склейка оставшихся частей планов в один буфер."""
+        out = cls()
+        for p in parts:
+            out.extend(p)
+        return out
+
+    # --- доступ ---
+
+    def __len__(self) -> int:
+        return self.data.shape[1] - self.cursor
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    @property
+    def x(self) -> np.ndarray:
+        return self.data[0, self.cursor:]
+
+    @property
+    def y(self) -> np.ndarray:
+        return self.data[1, self.cursor:]
+
+    def _waypoint(self, j: int) -> Waypoint:
+        x, y, z, hold, speed = self.data[:, j].tolist()
+        t = int(self.tags[j])
+        return Waypoint(Point(x, y, z), hold_sec=hold, speed_mps=speed,
+                        task_id=self.names[t] if t >= 0 else None)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            # представление: общие массивы, копирования нет
+            return PlanBuffer(self.data[:, self.cursor:][:, i], self.tags[self.cursor:][i], self.names)
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError("plan index out of range")
+        return self._waypoint(self.cursor + i)
+
+    def __iter__(self) -> Iterator[Waypoint]:
+        for j in range(self.cursor, self.data.shape[1]):
+            yield self._waypoint(j)
+
+    def to_waypoints(self) -> List[Waypoint]:
+        return list(self)
+
+    # --- исполнение ---
+
+    def advance(self, k: int = 1):
+        """Сдвиг курсора на k WP (аналог pop(0)), O(1)."""
+        self.cursor = min(self.cursor + k, self.data.shape[1])
+
+    def thin(self, step: int = 2) -> "PlanBuffer":
+        """Прореживание оставшихся WP через step (представление)."""
+        return self[::step]
+
+    # --- метки задач ---
+
+    def task_ids(self) -> List[str]:
+        """Задачи оставшейся части плана в порядке следования."""
+        t = self.tags[self.cursor:]
+        t = t[t >= 0]
+        if len(t) == 0:
+            return []
+        _, first = np.unique(t, return_index=True)
+        return [self.names[int(t[j])] for j in np.sort(first)]
+
+    def first_index(self, task_id: str) -> int:
+        """Индекс (от курсора) первой WP задачи task_id; -1 — нет в плане."""
+        if task_id not in self.names:
+            return -1
+        hit = np.flatnonzero(self.tags[self.cursor:] == self.names.index(task_id))
+        return int(hit[0]) if len(hit) else -1
+
+    # --- изменение ---
+
+    def _remap(self, other: "PlanBuffer") -> np.ndarray:
+        # метки other → индексы в self.names
+        if not other.names:
+            return other.tags[other.cursor:].copy()
+        lut = np.empty(len(other.names), dtype=np.int32)
+        for k, name in enumerate(other.names):
+            if name not in self.names:
+                self.names.append(name)
+            lut[k] = self.names.index(name)
+        t = other.tags[other.cursor:]
+        return np.where(t >= 0, lut[np.maximum(t, 0)], -1).astype(np.int32)
+
+    def insert(self, i: int, other: "PlanBuffer"):
+        """Вставка оставшихся WP other перед позицией i (от курсора), на месте."""
+        j = self.cursor + max(0, min(i, len(self)))
+        c0 = self.cursor
+        # дозапись в конец: префиксные индексы сдвигаются и дополняются, иначе — сброс
+        kept = self._prefix if j == self.data.shape[1] and len(self) > 0 else {}
+        tags = self._remap(other)
+        self.data = np.concatenate([self.data[:, self.cursor:j], other.data[:, other.cursor:],
+                                    self.data[:, j:]], axis=1)
+        self.tags = np.concatenate([self.tags[self.cursor:j], tags, self.tags[j:]])
+        self.cursor = 0
+        self.version += 1
+        self._prefix = {}
+        for key, (seg, tag, P) in kept.items():
+            # первые WP после обрезки потеряли предшественников: их сегменты пересчитываем,
+            # остальные сдвигаем
+            h = min(len(P) - c0, SEG_LOOKBACK + 1)
+            head = np.cumsum(seg(self.data, 0, h))
+            P = np.concatenate([head, P[c0 + h:] - P[c0 + h - 1] + head[-1]])
+            tail = np.cumsum(seg(self.data, len(P), self.data.shape[1])) + P[-1]
+            self._prefix[key] = (seg, tag, np.concatenate([P, tail]))
+
+    def extend(self, other: "PlanBuffer"):
+        self.insert(len(self), other)
+
+    # --- префиксные индексы ---
+
+    def prefix(self, key: str = "m", seg: SegmentCost = segment_lengths, tag=None) -> np.ndarray:
+        """
+        Префиксная сумма стоимостей сегментов по всем WP буфера (индексы абсолютные):
+        P[j] — стоимость пути от data[:, 0] до WP j. key — имя индекса в кэше ("m" —
+        длина по умолчанию); seg задаёт стоимость, tag — параметры seg: при другом tag
+        индекс строится заново.
+        """
+        hit = self._prefix.get(key)
+        if hit is None or hit[1] != tag:
+            hit = (seg, tag, np.cumsum(seg(self.data, 0, self.data.shape[1])))
+            self._prefix[key] = hit
+        return hit[2]
+
+    def remaining(self, key: str = "m", seg: SegmentCost = segment_lengths, lead: float = 0.0, tag=None) -> float:
+        """Стоимость оставшейся части плана от текущей WP до конца (+ lead до неё), O(1)."""
+        if not self:
+            return 0.0
+        P = self.prefix(key, seg, tag)
+        return lead + float(P[-1] - P[self.cursor])
+
+    def remaining_m(self, x: float, y: float) -> float:
+        """Длина оставшегося маршрута от точки (x, y) через все WP плана, м."""
+        if not self:
+            return 0.0
+        return self.remaining("m", lead=math.hypot(self.data[0, self.cursor] - x, self.data[1, self.cursor] - y))
+
+    def reach(self, budget: float, key: str = "m", seg: SegmentCost = segment_lengths, lead: float = 0.0,
+              tag=None) -> int:
+        """Сколько WP (от курсора) укладывается в budget по индексу key (с lead до текущей WP), O(log n)."""
+        if not self or budget < lead:
+            return 0
+        P = self.prefix(key, seg, tag)
+        return int(np.searchsorted(P, P[self.cursor] + budget - lead, side="right")) - self.cursor
+
+    # --- сериализация ---
+
+    def to_bytes(self) -> bytes:
+        """Оставшаяся часть плана: заголовок (n, длина имён) + JSON имён + float64 (5, n) + int32 (n,)."""
+        names = json.dumps(self.names).encode("utf-8")
+        data = np.ascontiguousarray(self.data[:, self.cursor:], dtype="<f8")
+        tags = np.ascontiguousarray(self.tags[self.cursor:], dtype="<i4")
+        return struct.pack("<II", data.shape[1], len(names)) + names + data.tobytes() + tags.tobytes()
+
+    @classmethod
+    def from_bytes(cls, buf: bytes) -> "PlanBuffer":
+        n, ln = struct.unpack_from("<II", buf, 0)
+        off = 8
+        names = json.loads(buf[off:off + ln].decode("utf-8"))
+        off += ln
+        data = np.frombuffer(buf, dtype="<f8", count=5*n, offset=off).reshape(5, n).copy()
+        off += 40*n
+        tags = np.frombuffer(buf, dtype="<i4", count=n, offset=off).copy()
+        return cls(data, tags, names)
@@ -0,0 +1,59 @@
+
+"""
+Растровая карта приоритета (вероятности обнаружения) w(x, y) ∈ [0, 1] — вход для
+переменного шага полос d(x, y) = d0 / (1 + κ·w(x, y)) внутри ячейки покрытия.
+Вне растра значение не определено (NaN) — вызывающий подставляет priority задачи.
+"""
+import math
+from typing import Tuple
+import numpy as np
+
+class PriorityMap:
+    """
+    values[row, col] — приоритет клетки: row — по Y, col — по X;
+    origin — (x0, y0) угла растра, res_m — размер клетки.
+    """
+    def __init__(self, values: np.ndarray, origin: Tuple[float, float] = (0.0, 0.0), res_m: float = 5.0):
+        self.values = np.clip(np.asarray(values, dtype=float), 0.0, 1.0)
+        self.x0, self.y0 = float(origin[0]), float(origin[1])
+        self.res = float(res_m)
+
+    @classmethod
+    def from_gaussians(cls, bounds: Tuple[float, float, float, float], res_m: float,
+                       centers, sigmas, weights=1.0) -> "PriorityMap":
+        """Карта как максимум гауссовых «пятен» вероятности (центры (k, 2), σ и веса (k,))."""
+        x0, y0, x1, y1 = bounds
+        nx = max(1, int(math.ceil((x1 - x0) / res_m)))
+        ny = max(1, int(math.ceil((y1 - y0) / res_m)))
+        cx = x0 + (np.arange(nx) + 0.5)*res_m
+        cy = y0 + (np.arange(ny) + 0.5)*res_m
+        C = np.asarray(centers, dtype=float).reshape(-1, 2)
+        s = np.broadcast_to(np.asarray(sigmas, dtype=float), (len(C),))
+        w = np.broadcast_to(np.asarray(weights, dtype=float), (len(C),))
+        g = np.exp(-((cx[None, None, :] - C[:, 0, None, None])**2 + (cy[None, :, None] - C[:, 1, None, None])**2)
+                   / (2.0*s[:, None, None]**2))
+        return cls((w[:, None, None]*g).max(axis=0), (x0, y0), res_m)
+
+    def sample(self, x, y) -> np.ndarray:
+        """Значения в точках (x, y) (массивы), NaN вне растра."""
+        c = np.floor((np.asarray(x, dtype=float) - self.x0) / self.res).astype(int)
+        r = np.floor((np.asarray(y, dtype=float) - self.y0) / self.res).astype(int)
+        ny, nx = self.values.shape
+        ok = (r >= 0) & (r < ny) & (c >= 0) & (c < nx)
+        return np.where(ok, self.values[np.clip(r, 0, ny - 1), np.clip(c, 0, nx - 1)], np.nan)
+
+    def row_max(self, v: np.ndarray, u_lo: float, u_hi: float, along_x: bool = True) -> np.ndarray:
+        """
+        Максимум приоритета вдоль полос на уровнях v (в координатах развёртки: along_x —
+        полосы вдоль X, v = y) на отрезке [u_lo, u_hi]. NaN, если полоса вне растра.
+        """
+        G = self.values if along_x else self.values.T
+        u0, v0 = (self.x0, self.y0) if along_x else (self.y0, self.x0)
+        nv, nu = G.shape
+        r = np.floor((np.asarray(v, dtype=float) - v0) / self.res).astype(int)
+        c0 = max(0, int(math.floor((u_lo - u0) / self.res)))
+        c1 = min(nu - 1, int(math.floor((u_hi - u0) / self.res)))
+        ok = (r >= 0) & (r < nv)
+        if c0 > c1:
+            return np.full(len(r), np.nan)
+        return np.where(ok, G[np.clip(r, 0, nv - 1), c0:c1 + 1].max(axis=1), np.nan)
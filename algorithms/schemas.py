@@ -14,6 +14,7 @@ class Waypoint:
     p: Point
     hold_sec: float = 0.0
     speed_mps: float = 3.0
+    task_id: Optional[str] = None   # задача, к сегменту покрытия которой относится WP
 
 @dataclass(frozen=True)
 class Task:
@@ -0,0 +1,106 @@
+
+"""
+Предварительная кластеризация задач для больших AOI: тысячи ячеек покрытия
+группируются взвешенным по priority k-means в секторы, аукцион идёт сначала между
+кластерами (супер-задачи в центрах масс), затем — внутри кластеров дрона.
+Стоимость межкластерного аукциона зависит от числа кластеров, а не ячеек.
+"""
+import math
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from schemas import Task, DroneState, Point
+from cbba_lite import CBBALite
+
+def weighted_kmeans(P: np.ndarray, w: np.ndarray, k: int, iters: int = 25,
+                    seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Взвешенный k-means (инициализация k-means++) по точкам P (n, 2) с весами w (n,).
+    Возвращает (labels (n,), centers (k, 2)); пустые кластеры сохраняют прежний центр.
+    """
+    n = len(P)
+    k = max(1, min(k, n))
+    rng = np.random.default_rng(seed)
+    w = np.maximum(np.asarray(w, dtype=float), 1e-6)
+    C = np.empty((k, 2))
+    C[0] = P[rng.choice(n, p=w / w.sum())]
+    d2 = np.sum((P - C[0])**2, axis=1)
+    for j in range(1, k):
+        p = w*d2
+        i = rng.choice(n, p=p / p.sum()) if p.sum() > 0 else rng.integers(n)
+        C[j] = P[i]
+        d2 = np.minimum(d2, np.sum((P - C[j])**2, axis=1))
+    labels = np.zeros(n, dtype=int)
+    for _ in range(iters):
+        D2 = (P[:, None, 0] - C[None, :, 0])**2 + (P[:, None, 1] - C[None, :, 1])**2   # (n, k)
+        labels = np.argmin(D2, axis=1)
+        W = np.bincount(labels, w, k)
+        nz = W > 0
+        newC = C.copy()
+        newC[nz, 0] = np.bincount(labels, w*P[:, 0], k)[nz] / W[nz]
+        newC[nz, 1] = np.bincount(labels, w*P[:, 1], k)[nz] / W[nz]
+        if np.allclose(newC, C):
+            break
+        C = newC
+    return labels, C
+
+class ClusteredAllocator:
+    """
+    Двухуровневое распределение: кластеры задач → дроны (ленивый аукцион CBBA-lite
+    с равномерным лимитом кластеров на дрон), затем порядок задач внутри кластеров
+    каждого дрона (тот же аукцион на одного дрона). Параметры полезности
+    (alpha/beta/gamma, max_tasks_per_agent) и энергомодель (energy, task_len_m) берутся
+    из cbba; на уровне кластеров работой супер-задачи считается суммарная работа её ячеек,
+    поэтому недостижимые по энергии кластеры дрону не достаются.
+    clusters_per_drone — сколько секторов приходится на дрон.
+    """
+    def __init__(self, cbba: Optional[CBBALite] = None, clusters_per_drone: int = 2,
+                 iters: int = 25, seed: int = 0):
+        self.cbba = cbba or CBBALite()
+        self.clusters_per_drone = clusters_per_drone
+        self.iters = iters
+        self.seed = seed
+
+    def _sub(self, max_tasks: int, task_len_m=None) -> CBBALite:
+        c = self.cbba
+        return CBBALite(alpha=c.alpha, beta=c.beta, gamma=c.gamma, rounds=c.rounds,
+                        max_tasks_per_agent=max_tasks, dense_limit=c.dense_limit, strategy="lazy",
+                        energy=c.energy, task_len_m=c.task_len_m if task_len_m is None else task_len_m)
+
+    def clusters(self, tasks: List[Task], k: int) -> Tuple[np.ndarray, List[Task]]:
+        """Метки кластеров задач и супер-задачи кластеров (центр масс, нормированный вес)."""
+        P = np.array([(t.target.x, t.target.y) for t in tasks], dtype=float)
+        w = np.array([t.priority for t in tasks], dtype=float)
+        labels, C = weighted_kmeans(P, w, k, self.iters, self.seed)
+        W = np.bincount(labels, np.maximum(w, 1e-6), len(C))
+        prio = W / max(W.max(), 1e-12)
+        supers = [Task(id=f"cluster{j}", priority=float(prio[j]), target=Point(float(C[j, 0]), float(C[j, 1])))
+                  for j in range(len(C))]
+        return labels, supers
+
+    def assign(self, tasks: List[Task], drones: List[DroneState]) -> Dict[str, List[Task]]:
+        """Как CBBALite.assign: {drone_id: [Task,...]}."""
+        routes: Dict[str, List[Task]] = {d.drone_id: [] for d in drones}
+        if not tasks or not drones:
+            return routes
+        k = self.clusters_per_drone*len(drones)
+        labels, supers = self.clusters(tasks, k)
+        # межкластерный аукцион: не больше ceil(k/D) кластеров на дрон
+        per_drone = math.ceil(len(supers) / len(drones))
+        members: Dict[str, List[Task]] = {}
+        for t, j in zip(tasks, labels.tolist()):
+            members.setdefault(supers[j].id, []).append(t)
+        work = {s.id: sum(self.cbba._task_len(t) for t in members.get(s.id, [])) for s in supers}
+        sectors = self._sub(per_drone, work).assign(supers, drones)
+        # внутри секторов дрона — порядок обхода тем же аукционом на одного дрона
+        inner = self._sub(self.cbba.max_tasks_per_agent)
+        for d in drones:
+            own = [t for s in sectors[d.drone_id] for t in members.get(s.id, [])]
+            if own:
+                routes[d.drone_id] = inner.assign(own, [d])[d.drone_id]
+        # ячейки кластеров, не доставшихся никому целиком (не хватает энергии), —
+        # поштучно довставляем в маршруты тех, кому они по силам
+        taken = {s.id for ss in sectors.values() for s in ss}
+        rest = [t for s in supers if s.id not in taken for t in members.get(s.id, [])]
+        if rest:
+            routes = inner.assign_incremental(rest, drones, routes, frozen=0)
+        return routes
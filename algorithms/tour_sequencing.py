@@ -0,0 +1,190 @@
+
+"""
+Порядок обхода ячеек покрытия одним дроном.
+
+Каждая ячейка проходится бустрофедоном в одной из 4 ориентаций (с какого угла
+войти): 0 — как сгенерирована, 1 — обратный проход, 2 — каждая полоса в обратную
+сторону, 3 — 2 и 1 вместе. Вход/выход ориентации — углы ячейки; длина внутри
+ячейки от ориентации не зависит, поэтому минимизируем только переходы.
+
+1) начальный тур — ближайший сосед по равномерной сетке центров ячеек;
+2) улучшение не больше max_passes проходов: 2-opt (разворот участка меняет ориентацию
+   его ячеек на обратную) и Or-opt (перенос ячейки с выбором ориентации);
+   результат детерминирован, лимит времени — только страховка от очень больших туров;
+3) ДП по ориентациям при фиксированном порядке (Витерби, 4 состояния на ячейку).
+Тур открытый: начинается в позиции дрона, возврат не учитывается.
+"""
+import math
+import time
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+def _grid_nn(start: Tuple[float, float], C: np.ndarray, exits: np.ndarray) -> List[int]:
+    """Ближайший сосед по центрам C (K, 2) с поиском по кольцам сетки; выход ячейки — exits[k]."""
+    K = len(C)
+    lo = C.min(axis=0)
+    span = np.maximum(C.max(axis=0) - lo, 1e-9)
+    h = max(float(np.sqrt(span[0]*span[1] / K)), float(span.max()) / K, 1e-6)
+    gi = np.floor((C - lo) / h).astype(int)
+    grid: Dict[Tuple[int, int], List[int]] = {}
+    for k, (a, b) in enumerate(gi.tolist()):
+        grid.setdefault((a, b), []).append(k)
+    gmax = gi.max(axis=0)
+    order: List[int] = []
+    cx, cy = start
+    for _ in range(K):
+        a0 = int(math.floor((cx - lo[0]) / h))
+        b0 = int(math.floor((cy - lo[1]) / h))
+        best, best_d = -1, math.inf
+        # с кольца, на котором начинается сетка; кольцо r гарантирует все точки ближе r*h
+        ring = max(0, -a0, -b0, a0 - gmax[0], b0 - gmax[1])
+        while True:
+            for a in range(max(a0 - ring, 0), min(a0 + ring, gmax[0]) + 1):
+                edge = abs(a - a0) == ring
+                bs = range(max(b0 - ring, 0), min(b0 + ring, gmax[1]) + 1) if edge else \
+                    [b for b in (b0 - ring, b0 + ring) if 0 <= b <= gmax[1]]
+                for b in bs:
+                    for k in grid.get((a, b), ()):
+                        d = (C[k, 0] - cx)**2 + (C[k, 1] - cy)**2
+                        if d < best_d:
+                            best, best_d = k, d
+            covers = (a0 - ring <= 0 and b0 - ring <= 0 and a0 + ring >= gmax[0] and b0 + ring >= gmax[1])
+            if (best >= 0 and math.sqrt(best_d) <= ring*h) or covers:
+                break
+            ring += 1
+        grid[tuple(gi[best])].remove(best)
+        order.append(best)
+        cx, cy = exits[best, 0]
+    return order
+
+def block_ends(xs: np.ndarray, ys: np.ndarray, start: np.ndarray, cnt: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Точки входа/выхода (K, 4, 2) блоков WP [start, start + cnt) по 4 ориентациям:
+    b0→b-1, b-1→b0, b1→b-2, b-2→b1 (cnt чётное, WP парами — полосами).
+    """
+    last = start + cnt - 1
+    ent_i = np.stack([start, last, start + 1, last - 1], axis=1)
+    ext_i = np.stack([last, start, last - 1, start + 1], axis=1)
+    return np.stack([xs[ent_i], ys[ent_i]], axis=-1), np.stack([xs[ext_i], ys[ext_i]], axis=-1)
+
+def oriented(b: np.ndarray, o: int) -> np.ndarray:
+    """Индексы блока WP b в ориентации o (2, 3 — полосы в обратную сторону; 1, 3 — обратный проход)."""
+    if o >= 2:
+        b = b.reshape(-1, 2)[:, ::-1].ravel()
+    return b[::-1] if o % 2 else b
+
+class TourSequencer:
+    """
+    entries/exits: (K, 4, 2) — точки входа/выхода каждой ячейки по ориентациям.
+    max_passes — число проходов улучшения (2-opt/Or-opt + ДП); time_budget_s — страховочный
+    лимит времени на всю фазу улучшений (None — без лимита). Пока лимит не достигнут,
+    результат зависит только от входа.
+    """
+    def __init__(self, max_passes: int = 8, time_budget_s: Optional[float] = 1.0, or_opt: bool = True):
+        self.max_passes = max_passes
+        self.time_budget_s = time_budget_s
+        self.or_opt = or_opt
+
+    @staticmethod
+    def cost(start, entries, exits, order, orient) -> float:
+        """Сумма переходов тура (без длины внутри ячеек)."""
+        if len(order) == 0:
+            return 0.0
+        E = entries[order, orient]
+        X = np.vstack([np.asarray(start, dtype=float)[None, :], exits[order, orient][:-1]])
+        return float(np.hypot(*(E - X).T).sum())
+
+    @staticmethod
+    def _orient_dp(start, entries, exits, order) -> np.ndarray:
+        # Витерби: cost[o] — лучший тур до текущей ячейки, выходящий в ориентации o
+        E, X = entries[order], exits[order]                    # (K, 4, 2)
+        K = len(order)
+        back = np.zeros((K, 4), dtype=int)
+        cost = np.hypot(*(E[0] - np.asarray(start, dtype=float)).T)
+        for k in range(1, K):
+            d = np.hypot(E[k][None, :, 0] - X[k-1][:, None, 0], E[k][None, :, 1] - X[k-1][:, None, 1])
+            tot = cost[:, None] + d                              # (o_prev, o)
+            back[k] = np.argmin(tot, axis=0)
+            cost = tot[back[k], np.arange(4)]
+        orient = np.zeros(K, dtype=int)
+        orient[-1] = int(np.argmin(cost))
+        for k in range(K - 1, 0, -1):
+            orient[k-1] = back[k, orient[k]]
+        return orient
+
+    def _two_opt(self, start, entries, exits, order, orient, deadline) -> bool:
+        K = len(order)
+        improved = False
+        for i in range(K - 1):
+            if time.perf_counter() > deadline:
+                break
+            E = entries[order, orient]
+            X = exits[order, orient]
+            P = np.asarray(start, dtype=float) if i == 0 else X[i-1]
+            j = np.arange(i + 1, K)
+            nxt = np.minimum(j + 1, K - 1)
+            has_next = j + 1 < K
+            # разворот [i..j]: (P→E_i) + (X_j→E_{j+1})  →  (P→X_j) + (E_i→E_{j+1})
+            old = np.hypot(*(E[i] - P)) + np.where(has_next, np.hypot(*(E[nxt] - X[j]).T), 0.0)
+            new = np.hypot(*(X[j] - P).T) + np.where(has_next, np.hypot(*(E[nxt] - E[i]).T), 0.0)
+            delta = new - old
+            b = int(np.argmin(delta))
+            if delta[b] < -1e-9:
+                jj = int(j[b])
+                order[i:jj+1] = order[i:jj+1][::-1].copy()
+                orient[i:jj+1] = orient[i:jj+1][::-1] ^ 1
+                improved = True
+        return improved
+
+    def _or_opt(self, start, entries, exits, order, orient, deadline) -> bool:
+        K = len(order)
+        improved = False
+        s = np.asarray(start, dtype=float)
+        p = 0
+        while p < K and K > 2:
+            if time.perf_counter() > deadline:
+                break
+            E = entries[order, orient]
+            X = exits[order, orient]
+            prev = s if p == 0 else X[p-1]
+            gain = np.hypot(*(E[p] - prev))
+            if p + 1 < K:
+                gain += np.hypot(*(E[p+1] - X[p])) - np.hypot(*(E[p+1] - prev))
+            c = order[p]
+            rest = np.delete(np.arange(K), p)
+            Er, Xr = E[rest], X[rest]
+            # вставка перед позицией q оставшегося тура (q = K-1 — в конец), 4 ориентации
+            Pq = np.vstack([s[None, :], Xr])                           # (K, 2) предшественник
+            Nq = np.vstack([Er, np.full((1, 2), np.nan)])              # (K, 2) последователь
+            en, ex = entries[c], exits[c]                              # (4, 2)
+            add = np.hypot(en[None, :, 0] - Pq[:, None, 0], en[None, :, 1] - Pq[:, None, 1])
+            tail = np.hypot(Nq[:, None, 0] - ex[None, :, 0], Nq[:, None, 1] - ex[None, :, 1])
+            base = np.hypot(*(Nq - Pq).T)
+            cost = add + np.nan_to_num(tail - base[:, None], nan=0.0)
+            q, o = np.unravel_index(int(np.argmin(cost)), cost.shape)
+            if cost[q, o] < gain - 1e-9:
+                order[:] = np.insert(order[rest], q, c)
+                orient[:] = np.insert(orient[rest], q, o)
+                improved = True
+            p += 1
+        return improved
+
+    def sequence(self, start: Tuple[float, float], centers: np.ndarray,
+                 entries: np.ndarray, exits: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Возвращает (order, orient): порядок ячеек и ориентация каждой в этом порядке."""
+        K = len(centers)
+        if K == 0:
+            return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+        order = np.array(_grid_nn(start, np.asarray(centers, dtype=float), exits), dtype=int)
+        orient = self._orient_dp(start, entries, exits, order)
+        deadline = math.inf if self.time_budget_s is None else time.perf_counter() + self.time_budget_s
+        for _ in range(self.max_passes):
+            if time.perf_counter() > deadline:
+                break
+            improved = self._two_opt(start, entries, exits, order, orient, deadline)
+            if self.or_opt:
+                improved |= self._or_opt(start, entries, exits, order, orient, deadline)
+            orient = self._orient_dp(start, entries, exits, order)
+            if not improved:
+                break
+        return order, orient
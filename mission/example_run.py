@@ -1,6 +1,8 @@
 
+import math
 from schemas import Task, DroneState, Point
 from mission_runner import MissionRunner
+from sim_backend import KinematicFleetSim, random_obstacles
 
 # Задаём парк и базу
 drones = [
@@ -18,8 +20,30 @@ tasks = [
     Task(id="A4", priority=0.6, target=Point(90, 90, 0), aoi_id="A"),
 ]
 
-runner = MissionRunner(drones=drones, home=home, lz_list=lz_list)
+# Безголовый кинематический симулятор вместо реальной телеметрии/полётного контроллера
+sim = KinematicFleetSim(drones, home=home, obstacles=random_obstacles(60, moving_frac=0.2, seed=1))
+runner = MissionRunner(drones=drones, home=home, lz_list=lz_list, backend=sim)
 runner.prepare(tasks)
 
-# Далее цикл step(dt) должен вызываться существующей системой с предоставлением телеметрии
-# (здесь опущено, т.к. интеграция идёт без изменения ваших исходников).
+dt = 0.1
+steps = 0
+while not runner.all_finished() and steps < 200000:
+    runner.step(dt)
+    sim.advance(dt)
+    steps += 1
+
+print(f"t={sim.t:.1f}s steps={steps} finished={runner.finished}")
+for d in drones:
+    print(d.drone_id, d.pos, f"battery={d.battery_rem_Wh:.1f}Wh")
+
+# миссия должна завершиться: планы отработаны до конца, все дроны вернулись на базу
+# или сели на LZ и стоят там (после завершения команда скорости снимается)
+assert runner.all_finished(), "миссия не завершилась за отведённое число шагов"
+for _ in range(50):
+    sim.advance(dt)
+for d in drones:
+    d.pos = sim.position(d.drone_id)
+    assert not runner.active_plans[d.drone_id], f"{d.drone_id}: план не отработан"
+    assert d.battery_rem_Wh > 0.0, f"{d.drone_id}: батарея разряжена"
+    gap = min(math.hypot(d.pos.x - p.x, d.pos.y - p.y) for p in [home] + lz_list)
+    assert gap < 3.0, f"{d.drone_id} остановился в {gap:.1f} м от базы/LZ"
@@ -1,38 +1,92 @@
 
-from typing import List, Dict
-from schemas import Task, DroneState, Waypoint
+import math
+from typing import List, Dict, Optional
+from schemas import Task, DroneState
+from plan_buffer import PlanBuffer
 from cbba_lite import CBBALite
+from task_clustering import ClusteredAllocator
 from coverage_hybrid import HybridCoverage
+from energy_rtb import EnergyRTBManager
+from priority_map import PriorityMap
+
+def mission_coverage(priority_map: Optional[PriorityMap] = None) -> HybridCoverage:
+    """
+    Генератор покрытия с геометрией миссии (FOV, перекрытие, κ, высота). Планы и карта
+    покрытия, по которой решается, что ячейка пройдена, должны строиться одним экземпляром.
+    """
+    return HybridCoverage(fov_m=22.0, overlap_perp=0.25, kappa=0.6,
+                          cruise_speed_mps=3.0, altitude_m=22.0, priority_map=priority_map)
+
+def task_work_m(coverage: HybridCoverage, energy: EnergyRTBManager, tasks: List[Task],
+                cell_size_m: float = 60.0) -> Dict[str, float]:
+    """
+    Длины работы на задачах для ставок CBBALite {task.id: м}: по сегменту, который для задачи
+    построит coverage (непокрытые части ячейки, обход запретных зон), в энергомодели плана.
+    Ставки считают переходы между задачами по центрам ячеек, поэтому к работе добавлены
+    отрезки «центр → первая WP» и «последняя WP → центр»: по неравенству треугольника
+    оценка маршрута не меньше фактических переходов при любой ориентации сегмента.
+    """
+    work = {}
+    for t in tasks:
+        seg = coverage.build_segment(t, cell_size_m=cell_size_m)
+        if not seg:
+            work[t.id] = 0.0
+            continue
+        cx, cy = t.target.x, t.target.y
+        work[t.id] = (energy.work_length(seg) + math.hypot(seg.x[0] - cx, seg.y[0] - cy)
+                      + math.hypot(seg.x[-1] - cx, seg.y[-1] - cy))
+    return work
 
 class MissionOrchestrator:
     """
     Лёгкий оркестратор для этапа распределения и генерации маршрутов покрытия.
     Реализует только ту часть цикла, которая нужна в этой главе: CBBA + Coverage.
     """
-    def __init__(self, drones: List[DroneState]):
+    def __init__(self, drones: List[DroneState], cluster_above: int = 500,
+                 energy: Optional[EnergyRTBManager] = None,
+                 priority_map: Optional[PriorityMap] = None, workers: int = 1,
+                 coverage: Optional[HybridCoverage] = None):
         self.drones = drones
-        self.cbba = CBBALite(alpha=1.0, beta=0.03, gamma=0.1, rounds=5)
-        self.coverage = HybridCoverage(fov_m=22.0, overlap_perp=0.25, kappa=0.6,
-                                       cruise_speed_mps=3.0, altitude_m=22.0)
+        # workers > 1 — планы дронов строятся параллельно в пуле процессов
+        self.workers = workers
+        # priority_map — растр вероятности обнаружения: шаг полос меняется внутри ячеек;
+        # coverage — готовый генератор (например, общий с MissionRunner), priority_map тогда — его
+        self.coverage = coverage or mission_coverage(priority_map)
+        # energy — учёт батареи в ставках: недостижимые задачи не торгуются;
+        # работа на задачах (task_work_m) считается по их сегментам в plan_from_tasks
+        self.cbba = CBBALite(alpha=1.0, beta=0.03, gamma=0.1, rounds=5, energy=energy)
+        # для больших AOI (> cluster_above ячеек) — аукцион по секторам (k-means)
+        self.cluster_above = cluster_above
+        self.clustered = ClusteredAllocator(self.cbba)
 
-    def plan_from_tasks(self, tasks: List[Task]) -> Dict[str, List[Waypoint]]:
+    def plan_from_tasks(self, tasks: List[Task]) -> Dict[str, PlanBuffer]:
         """
         1) распределяет задачи между дронами,
         2) строит покрытие для каждой закреплённой задачи,
-        3) возвращает набор путевых точек на каждого дрона.
+        3) возвращает план (PlanBuffer) на каждого дрона.
         """
-        assignment = self.cbba.assign(tasks, self.drones)
+        if self.cbba.energy is not None:
+            self.cbba.task_len_m = task_work_m(self.coverage, self.cbba.energy, tasks, 60.0)
+        if len(tasks) > self.cluster_above:
+            assignment = self.clustered.assign(tasks, self.drones)
+        else:
+            assignment = self.cbba.assign(tasks, self.drones)
         plans = self.coverage.build_plans(assignment, self.drones,
-                                          cell_size_m=60.0, along_x=True)
+                                          cell_size_m=60.0, along_x=True, workers=self.workers)
         return plans
 
 # --- Пример использования (встраивание без изменения существующих модулей) ---
 
-def build_mission_plans(drone_states: List[DroneState], task_list: List[Task]) -> Dict[str, List[Waypoint]]:
+def build_mission_plans(drone_states: List[DroneState], task_list: List[Task],
+                        energy: Optional[EnergyRTBManager] = None,
+                        priority_map: Optional[PriorityMap] = None,
+                        workers: int = 1,
+                        coverage: Optional[HybridCoverage] = None) -> Dict[str, PlanBuffer]:
     """
     Функция-обёртка: может вызываться из существующей логики запуска миссии.
     На вход: актуальная телеметрия дронов и список задач (ячейки покрытия).
-    На выход: готовые waypoint-последовательности для каждого дрона.
+    На выход: готовые планы (PlanBuffer) для каждого дрона.
     """
-    orch = MissionOrchestrator(drone_states)
+    orch = MissionOrchestrator(drone_states, energy=energy, priority_map=priority_map, workers=workers,
+                               coverage=coverage)
     return orch.plan_from_tasks(task_list)
@@ -1,11 +1,13 @@
 
-from typing import Dict, List
+import math
+from typing import Dict, List, Optional, Set, Tuple
 from schemas import Task, Waypoint, DroneState, Point
-from mission_orchestrator import build_mission_plans
+from mission_orchestrator import build_mission_plans, mission_coverage, task_work_m
 from cbba_lite import CBBALite
-from coverage_hybrid import HybridCoverage
 from avoidance_bindings import AvoidanceManager
-from energy_rtb import EnergyRTBManager, LinkStats, RTBDecision
+from plan_buffer import PlanBuffer
+from energy_rtb import EnergyRTBManager, RTBDecision, CONTINUE, SIMPLIFY, RTB
+from priority_map import PriorityMap
 
 class MissionRunner:
     """
@@ -14,16 +16,34 @@ class MissionRunner:
     - локальная безопасность (Avoidance),
     - контроль энергии/связи (EnergyRTB),
     - перераспределение задач и RTB по мере необходимости.
+
+    backend — необязательный источник телеметрии/исполнитель команд (например,
+    sim_backend.KinematicFleetSim); без него методы _telemetry/_flight_cmd_set_velocity
+    должны быть предоставлены существующей системой.
     """
-    def __init__(self, drones: List[DroneState], home: Point, lz_list: List[Point]):
+    def __init__(self, drones: List[DroneState], home: Point, lz_list: List[Point],
+                 backend=None, priority_map: Optional[PriorityMap] = None):
         self.drones = {d.drone_id: d for d in drones}
+        self.backend = backend
         self.home = home
-        self.cbba = CBBALite()
-        self.coverage = HybridCoverage()
+        self.priority_map = priority_map
+        # тот же генератор покрытия строит планы в build_mission_plans: геометрия полос
+        # плана и карты покрытия совпадает
+        self.coverage = mission_coverage(priority_map)
         self.avoid = AvoidanceManager(drone_ids=list(self.drones.keys()))
         self.energy = EnergyRTBManager(home=home, lz_list=lz_list, altitude_m=22.0)
-        self.active_plans: Dict[str, List[Waypoint]] = {d: [] for d in self.drones.keys()}
+        self.cell_size_m = 60.0
+        # работа на задачах в ставках — по их сегментам покрытия (task_work_m)
+        self.cbba = CBBALite(energy=self.energy)
+        self.active_plans: Dict[str, PlanBuffer] = {d: PlanBuffer() for d in self.drones.keys()}
         self.finished: Dict[str, bool] = {d: False for d in self.drones.keys()}
+        self.returning: Set[str] = set()       # дроны на RTB/LZ — задач не получают
+        self.tasks: Dict[str, Task] = {}       # task_id -> Task (WP плана помечены task_id)
+        # карта покрытия: прошлые позиции дронов для отметки пролетённых отрезков;
+        # задача считается выполненной, если непокрытой осталась доля ≤ min_uncovered
+        self.last_xy: Dict[str, Tuple[float, float]] = {}
+        self.mark_step_m = 1.0                 # отрезки короче не отмечаем — копим до следующего такта
+        self.min_uncovered = 0.05
 
     # --- внешние зависимости: должны предоставляться существующей системой ---
     def _telemetry(self, drone_id: str):
@@ -35,11 +55,19 @@ class MissionRunner:
         - vmax, прогресс, front_blocked_ratio, препятствия
         - текущую позицию (обновление self.drones[drone_id].pos)
         """
-        raise NotImplementedError
+        if self.backend is None:
+            raise NotImplementedError
+        tel = self.backend.telemetry(drone_id, self.active_plans[drone_id])
+        dstate = self.drones[drone_id]
+        dstate.pos = self.backend.position(drone_id)
+        dstate.battery_rem_Wh = tel.battery_rem_Wh
+        return tel
 
     def _flight_cmd_set_velocity(self, drone_id: str, vx: float, vy: float, vz: float=0.0):
         """Выдаёт команду скорости в существующий полётный контроллер."""
-        raise NotImplementedError
+        if self.backend is None:
+            raise NotImplementedError
+        self.backend.set_velocity(drone_id, vx, vy, vz)
 
     def _flight_cmd_execute_waypoint(self, drone_id: str, wp: Waypoint):
         """Опционально: отправка WP в существующий исполнитель."""
@@ -48,22 +76,78 @@ class MissionRunner:
     def prepare(self, tasks: List[Task]):
         # 1) начальное распределение и построение маршрутов
         drone_list = list(self.drones.values())
-        plans = build_mission_plans(drone_list, tasks)  # CBBA + Coverage
+        self.tasks.update({t.id: t for t in tasks})
+        self.coverage.track_coverage(tasks, cell_size_m=self.cell_size_m)
+        plans = build_mission_plans(drone_list, tasks, energy=self.energy,
+                                    coverage=self.coverage)  # CBBA + Coverage
         self.active_plans.update(plans)
 
+    def _bundle(self, drone_id: str) -> List[Task]:
+        """Невыполненные задачи дрона в порядке плана (по task_id сегментов покрытия)."""
+        return [self.tasks[t] for t in self.active_plans[drone_id].task_ids() if t in self.tasks]
+
+    def _leftover(self, drone_id: str) -> List[Task]:
+        """Задачи пакета дрона, у которых по карте покрытия осталась непокрытая часть."""
+        return [t for t in self._bundle(drone_id)
+                if self.coverage.uncovered_frac(t, self.cell_size_m) > self.min_uncovered]
+
+    def _mark_coverage(self, active: List[str]):
+        # отрезки «прошлая → текущая позиция» дронов на покрытии — в карты покрытия
+        ids, prev, cur = [], [], []
+        for d in active:
+            p = self.drones[d].pos
+            last = self.last_xy.setdefault(d, (p.x, p.y))
+            if d not in self.returning and math.hypot(p.x - last[0], p.y - last[1]) >= self.mark_step_m:
+                ids.append(d)
+                prev.append(last)
+                cur.append((p.x, p.y))
+        if not ids:
+            return
+        (x0, y0), (x1, y1) = zip(*prev), zip(*cur)
+        self.coverage.mark_flown(x0, y0, x1, y1)
+        self.last_xy.update(zip(ids, cur))
+
+    def _go_home(self, drone_id: str, code: int = RTB):
+        """Заменить план дрона маршрутом RTB/LZ (energy.recovery); задач он больше не получает."""
+        decision: RTBDecision = self.energy.recovery(self.drones[drone_id], code)
+        self.active_plans[drone_id] = PlanBuffer.from_waypoints(decision.rtb_plan or [])
+        self.returning.add(drone_id)
+
+    def _finish(self, drone_id: str):
+        # дрон на базе/LZ: снимаем команду скорости, иначе исполнитель продолжит последнюю
+        self.finished[drone_id] = True
+        self._flight_cmd_set_velocity(drone_id, 0.0, 0.0, 0.0)
+
     def _rebalance_leftover(self, giver_id: str, tasks_left: List[Task]):
         """
         При уходе дрона в RTB или посадку: возвращаем его невыполненные задачи в пул и
-        перераспределяем среди оставшихся (CBBA-lite).
+        довставляем их в текущие пакеты оставшихся (CBBALite.assign_incremental).
+        Планы получателей не перестраиваются: строятся только сегменты новых задач
+        и вставляются перед сегментом следующей задачи пакета.
         """
-        alive = [self.drones[k] for k, v in self.finished.items() if not v and k != giver_id]
+        alive = [self.drones[k] for k, v in self.finished.items()
+                 if not v and k != giver_id and k not in self.returning]
         if not alive or not tasks_left:
             return
-        assignment = self.cbba.assign(tasks_left, alive)
-        # обновляем планы для получателей
-        for rid, tlist in assignment.items():
-            add_plan = self.coverage.build_plans({rid: tlist}, alive, cell_size_m=60.0)[rid]
-            self.active_plans[rid].extend(add_plan)
+        bundles = {d.drone_id: self._bundle(d.drone_id) for d in alive}
+        # работа на задачах — по их непокрытым частям на момент передачи
+        self.cbba.task_len_m = task_work_m(self.coverage, self.energy,
+                                           tasks_left + [t for b in bundles.values() for t in b],
+                                           self.cell_size_m)
+        # первая задача пакета — в работе, её сегмент не разрываем
+        new = self.cbba.assign_incremental(tasks_left, alive, bundles, frozen=1)
+        for rid, bundle in new.items():
+            have = {t.id for t in bundles[rid]}
+            if len(bundle) == len(have):
+                continue
+            plan = self.active_plans[rid]
+            # идём с конца пакета: вставки не сдвигают индексы ещё не обработанных сегментов
+            pos = len(plan)
+            for t in reversed(bundle):
+                if t.id in have:
+                    pos = plan.first_index(t.id)
+                else:
+                    plan.insert(pos, self.coverage.build_segment(t, cell_size_m=self.cell_size_m))
 
     def step(self, dt: float = 0.1):
         """
@@ -72,71 +156,91 @@ class MissionRunner:
         - проверяем энергетику/связь,
         - при необходимости — RTB/посадка и перераспределение.
         """
-        for drone_id, dstate in self.drones.items():
+        active: List[str] = []
+        for drone_id in self.drones.keys():
             if self.finished[drone_id]:
                 continue
 
-            # нет планов — значит дрон закончил свою часть
+            # план исчерпан: после покрытия — домой, после RTB/посадки — завершили
             if not self.active_plans[drone_id]:
-                self.finished[drone_id] = True
-                continue
+                if drone_id in self.returning:
+                    self._finish(drone_id)
+                    continue
+                self._go_home(drone_id)
+            active.append(drone_id)
+        if not active:
+            return
 
-            # референсное движение к следующей точке
+        # --- получить телеметрию из существующей системы ---
+        tels = [self._telemetry(drone_id) for drone_id in active]
+        # ожидаем поля:
+        # tel.battery_rem_Wh, tel.link (rssi/snr/loss), tel.remaining_m,
+        # tel.vmax, tel.progress_ds, tel.front_blocked_ratio, tel.obstacles
+        self._mark_coverage(active)
+
+        # --- локальная безопасность (Reactive Avoidance): один пакетный вызов на флот ---
+        ref_vx, ref_vy = [], []
+        for drone_id, tel in zip(active, tels):
+            dstate = self.drones[drone_id]
+            next_wp = self.active_plans[drone_id][0]
+            # примитивная проекция "референса" в скорость по XY, нормируем к vmax
+            dx, dy = next_wp.p.x - dstate.pos.x, next_wp.p.y - dstate.pos.y
+            norm = max(1e-3, math.hypot(dx, dy))
+            v = min(tel.vmax, next_wp.speed_mps)
+            ref_vx.append(dx / norm * v)
+            ref_vy.append(dy / norm * v)
+
+        outs = self.avoid.compute_batch(active, ref_vx, ref_vy, dt=dt,
+                                        progress_ds=[t.progress_ds for t in tels],
+                                        front_blocked_ratio=[t.front_blocked_ratio for t in tels],
+                                        obstacles=[t.obstacles for t in tels],
+                                        vmax=[t.vmax for t in tels])
+
+        # --- энергетика/связь: решения по всему флоту одним векторным вызовом ---
+        # энергия на остаток плана — по посегментной модели (индекс плана строится раз на версию)
+        pos = [self.drones[d].pos for d in active]
+        codes = self.energy.decide_batch(
+            x=[p.x for p in pos], y=[p.y for p in pos],
+            battery_rem_Wh=[t.battery_rem_Wh for t in tels],
+            rssi=[t.link.rssi for t in tels], snr=[t.link.snr for t in tels],
+            loss_rate=[t.link.loss_rate for t in tels],
+            remaining_plan_m=[t.remaining_m for t in tels],
+            mission_Wh=[self.energy.plan_energy(self.active_plans[d], p.x, p.y)
+                        for d, p in zip(active, pos)]).tolist()
+
+        for drone_id, code, out in zip(active, codes, outs):
+            dstate = self.drones[drone_id]
+            if not self.active_plans[drone_id]:
+                continue
             next_wp = self.active_plans[drone_id][0]
-
-            # --- получить телеметрию из существующей системы ---
-            tel = self._telemetry(drone_id)
-            # ожидаем поля:
-            # tel.battery_rem_Wh, tel.link (rssi/snr/loss), tel.remaining_m,
-            # tel.vmax, tel.progress_ds, tel.front_blocked_ratio, tel.obstacles
-
-            # --- локальная безопасность (Reactive Avoidance) ---
-            # примитивная проекция "референса" в скорость по XY:
-            ref_vx = (next_wp.p.x - dstate.pos.x)
-            ref_vy = (next_wp.p.y - dstate.pos.y)
-            # нормируем к vmax
-            import math
-            norm = max(1e-3, math.hypot(ref_vx, ref_vy))
-            ref_vx = ref_vx / norm * min(tel.vmax, next_wp.speed_mps)
-            ref_vy = ref_vy / norm * min(tel.vmax, next_wp.speed_mps)
-
-            out = self.avoid.compute(drone_id, ref_vx, ref_vy, dt=dt,
-                                     progress_ds=tel.progress_ds,
-                                     front_blocked_ratio=tel.front_blocked_ratio,
-                                     obstacles=tel.obstacles, vmax=tel.vmax)
             self._flight_cmd_set_velocity(drone_id, out.vx, out.vy, 0.0)
 
             # --- проверка достижения WP ---
             reached = (math.hypot(next_wp.p.x - dstate.pos.x, next_wp.p.y - dstate.pos.y) < 1.0)
             if reached:
-                self.active_plans[drone_id].pop(0)
-
-            # --- энергетика/связь и решение RTB ---
-            link = LinkStats(rssi=tel.link.rssi, snr=tel.link.snr, loss_rate=tel.link.loss_rate)
-            decision: RTBDecision = self.energy.decide(
-                drone=dstate,
-                battery_rem_Wh=tel.battery_rem_Wh,
-                link=link,
-                remaining_plan_m=tel.remaining_m
-            )
-
-            if decision.mode == "continue":
+                self.active_plans[drone_id].advance()
+
+            # --- решение RTB ---
+            # дрон уже возвращается: маршрут RTB/LZ доводим до конца, не перестраивая
+            # его каждый такт, — по прибытии план исчерпается и дрон завершит миссию
+            if code == CONTINUE or drone_id in self.returning:
                 continue
-            elif decision.mode == "simplify":
+            elif code == SIMPLIFY:
                 # упрощаем план: увеличим шаг покрытия → оставшиеся WP прореживаем через один
                 if len(self.active_plans[drone_id]) > 2:
-                    self.active_plans[drone_id] = self.active_plans[drone_id][::2]
-            elif decision.mode in ("rtb", "land_lz"):
-                # собираем невыполненные задачи дрона (для примера: группируем по центрам WP)
-                # в реальной системе здесь у нас есть список Task; используем приблизительную реконструкцию
-                leftover_tasks: List[Task] = []  # заготовка под интеграцию с хранилищем задач
+                    self.active_plans[drone_id] = self.active_plans[drone_id].thin(2)
+            else:
+                # красная зона: маршрут до базы/ЛЗ строится только для этих дронов;
+                # невыполненные задачи дрона — оставшиеся в плане и не покрытые по карте,
+                # их сегменты у получателей строятся только по непокрытым частям
+                leftover_tasks = self._leftover(drone_id)
                 # заменяем текущий план на RTB/LZ
-                self.active_plans[drone_id] = decision.rtb_plan or []
+                self._go_home(drone_id, code)
                 # инициируем перераспределение
                 self._rebalance_leftover(giver_id=drone_id, tasks_left=leftover_tasks)
                 # если путь пуст или прибыл домой — считаем завершённым
                 if not self.active_plans[drone_id]:
-                    self.finished[drone_id] = True
+                    self._finish(drone_id)
 
     def all_finished(self) -> bool:
         return all(self.finished.values())
@@ -0,0 +1,166 @@
+
+import math
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+import numpy as np
+from schemas import Point, Waypoint, DroneState
+from avoidance_types import Obstacle
+from energy_rtb import EnergyModel, LinkStats
+from plan_buffer import PlanBuffer
+
+@dataclass
+class Telemetry:
+    # срез телеметрии на такт — поля, которых ждёт MissionRunner.step
+    battery_rem_Wh: float
+    link: LinkStats
+    remaining_m: float
+    vmax: float
+    progress_ds: float
+    front_blocked_ratio: float
+    obstacles: List[Obstacle]
+
+def random_obstacles(n: int, x_range=(-50.0, 150.0), y_range=(-50.0, 150.0),
+                     radius=(0.3, 1.2), moving_frac: float = 0.0, speed_mps: float = 1.0,
+                     seed: int = 0) -> np.ndarray:
+    """Синтетические препятствия в мировой СК: массив (n, 5) — x, y, vx, vy, radius."""
+    rng = np.random.default_rng(seed)
+    F = np.zeros((n, 5))
+    F[:, 0] = rng.uniform(*x_range, n)
+    F[:, 1] = rng.uniform(*y_range, n)
+    F[:, 4] = rng.uniform(*radius, n)
+    moving = rng.random(n) < moving_frac
+    ang = rng.uniform(-math.pi, math.pi, n)
+    F[moving, 2] = speed_mps*np.cos(ang[moving])
+    F[moving, 3] = speed_mps*np.sin(ang[moving])
+    return F
+
+class KinematicFleetSim:
+    """
+    Безголовый кинематический симулятор флота для MissionRunner (быстрее реального времени).
+    Состояние всех дронов — в массивах; advance(dt) интегрирует весь флот одним
+    векторным шагом: разгон к заданной скорости с ограничением ускорения, расход
+    батареи по EnergyModel (висение/крейсер/манёвр), движение препятствий.
+    telemetry() собирает для дрона препятствия в ЛСК (в радиусе датчика), качество
+    связи по удалению от базы, долю перекрытия фронтального сектора и остаток плана.
+    """
+    def __init__(self, drones: List[DroneState], home: Point,
+                 model: EnergyModel = EnergyModel(),
+                 obstacles: Optional[np.ndarray] = None,
+                 vmax_mps: float = 4.0, accel_max: float = 3.0,
+                 sensor_range_m: float = 15.0,
+                 link_ref_m: float = 100.0, link_range_m: float = 2000.0,
+                 seed: int = 0):
+        self.ids = [d.drone_id for d in drones]
+        self.index = {d: i for i, d in enumerate(self.ids)}
+        self.home = home
+        self.model = model
+        self.vmax = vmax_mps
+        self.accel_max = accel_max
+        self.sensor_range = sensor_range_m
+        self.link_ref = link_ref_m
+        self.link_range = link_range_m
+        self.rng = np.random.default_rng(seed)
+        self.pos = np.array([(d.pos.x, d.pos.y) for d in drones], dtype=float).reshape(-1, 2)
+        self.alt = np.array([d.pos.z for d in drones], dtype=float)
+        self.vel = np.zeros_like(self.pos)
+        self.cmd = np.zeros_like(self.pos)
+        self.battery = np.array([d.battery_rem_Wh for d in drones], dtype=float)
+        self.moved = np.zeros(len(self.ids))
+        self.obstacles = np.zeros((0, 5)) if obstacles is None else np.asarray(obstacles, dtype=float)
+        self.t = 0.0
+
+    # --- команды ---
+
+    def set_velocity(self, drone_id: str, vx: float, vy: float, vz: float = 0.0):
+        self.cmd[self.index[drone_id]] = (vx, vy)
+
+    # --- интегрирование ---
+
+    def advance(self, dt: float):
+        """Один шаг модели для всего флота."""
+        dv = self.cmd - self.vel
+        dv_n = np.hypot(dv[:, 0], dv[:, 1])
+        lim = np.minimum(1.0, self.accel_max*dt / np.maximum(dv_n, 1e-9))
+        self.vel += dv * lim[:, None]
+        step = self.vel * dt
+        self.pos += step
+        self.moved = np.hypot(step[:, 0], step[:, 1])
+
+        # мощность: от висения к крейсеру по скорости + доля манёвра по ускорению
+        m = self.model
+        spd = np.hypot(self.vel[:, 0], self.vel[:, 1])
+        frac = np.minimum(1.0, spd / max(m.v_cruise_mps, 0.1))
+        acc = np.minimum(1.0, dv_n*lim / max(self.accel_max*dt, 1e-9))
+        P = m.p_hover_W + (m.p_cruise_W - m.p_hover_W)*frac + (m.p_maneuver_W - m.p_cruise_W)*acc*frac
+        self.battery = np.maximum(0.0, self.battery - P*dt / 3600.0)
+
+        if len(self.obstacles):
+            self.obstacles[:, :2] += self.obstacles[:, 2:4]*dt
+        self.t += dt
+
+    # --- телеметрия ---
+
+    def position(self, drone_id: str) -> Point:
+        i = self.index[drone_id]
+        return Point(float(self.pos[i, 0]), float(self.pos[i, 1]), float(self.alt[i]))
+
+    def _link(self, i: int) -> LinkStats:
+        d = math.hypot(self.pos[i, 0] - self.home.x, self.pos[i, 1] - self.home.y)
+        att = 20.0*math.log10(1.0 + d / self.link_ref)
+        noise = self.rng.normal(0.0, 1.0)
+        return LinkStats(rssi=-40.0 - att + noise, snr=35.0 - att + noise,
+                         loss_rate=min(1.0, 0.3*(d / self.link_range)**2))
+
+    def _local_obstacles(self, i: int) -> np.ndarray:
+        if not len(self.obstacles):
+            return self.obstacles
+        L = self.obstacles.copy()
+        L[:, :2] -= self.pos[i]
+        d = np.hypot(L[:, 0], L[:, 1]) - L[:, 4]
+        return L[d <= self.sensor_range]
+
+    def _front_blocked(self, i: int, L: np.ndarray, plan_dir=(0.0, 0.0), rng_m: float = 4.0,
+                       rays: int = 12) -> float:
+        # доля лучей в секторе ±30° по курсу, упирающихся в препятствие ближе rng_m;
+        # курс — команда, иначе скорость, а у стоящего дрона — направление на следующую WP
+        h = self.cmd[i]
+        if np.hypot(*h) < 1e-6:
+            h = self.vel[i]
+        if np.hypot(*h) < 1e-6:
+            h = np.asarray(plan_dir, dtype=float)
+        if len(L) == 0 or np.hypot(*h) < 1e-6:
+            return 0.0
+        a = math.atan2(h[1], h[0]) + np.linspace(-math.pi/6, math.pi/6, rays)
+        ux, uy = np.cos(a)[:, None], np.sin(a)[:, None]
+        along = L[None, :, 0]*ux + L[None, :, 1]*uy
+        perp = np.abs(L[None, :, 0]*uy - L[None, :, 1]*ux)
+        hit = (along > 0.0) & (along < rng_m) & (perp < L[None, :, 4])
+        return float(hit.any(axis=1).mean())
+
+    def remaining_m(self, drone_id: str, plan: Sequence[Waypoint]) -> float:
+        """Длина оставшегося маршрута: от текущей позиции через все WP плана."""
+        i = self.index[drone_id]
+        if isinstance(plan, PlanBuffer):
+            # префиксный индекс длины плана — O(1) на такт
+            return plan.remaining_m(float(self.pos[i, 0]), float(self.pos[i, 1]))
+        x, y = self.pos[i]
+        total = 0.0
+        for wp in plan:
+            total += math.hypot(wp.p.x - x, wp.p.y - y)
+            x, y = wp.p.x, wp.p.y
+        return total
+
+    def telemetry(self, drone_id: str, plan: Sequence[Waypoint] = ()) -> Telemetry:
+        i = self.index[drone_id]
+        L = self._local_obstacles(i)
+        plan_dir = (0.0, 0.0)
+        if len(plan):
+            wp = plan[0]
+            plan_dir = (wp.p.x - self.pos[i, 0], wp.p.y - self.pos[i, 1])
+        return Telemetry(battery_rem_Wh=float(self.battery[i]),
+                         link=self._link(i),
+                         remaining_m=self.remaining_m(drone_id, plan),
+                         vmax=self.vmax,
+                         progress_ds=float(self.moved[i]),
+                         front_blocked_ratio=self._front_blocked(i, L, plan_dir),
+                         obstacles=[Obstacle(*row) for row in L.tolist()])
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# модули лежат плоско в algorithms/ и mission/ (импорты вида `from schemas import ...`)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for sub in ("algorithms", "mission"):
+    sys.path.insert(0, os.path.join(ROOT, sub))
@@ -0,0 +1,14 @@
+from avoidance_bench import run
+
+def test_dense_fields_time_selection_not_recovery():
+    # при 10k препятствий поле расширяется: такты уходят в выбор скорости, а не в Look-and-Turn
+    for scenario in ("sparse", "crowd"):
+        r = run(scenario, 10000, "numpy", ticks=10)
+        assert r.recovery_frac <= 0.1
+        assert r.select_ticks >= 9
+
+def test_deadwall_enters_recovery():
+    # U-ловушка задумана для recovery: вход есть, латентность — только по тактам выбора
+    r = run("deadwall", 100, "numpy", ticks=60)
+    assert r.recovery_rate > 0.0
+    assert r.select_ticks < r.ticks
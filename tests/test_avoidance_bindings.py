@@ -0,0 +1,21 @@
+import pytest
+from avoidance_types import Obstacle
+from avoidance_reactive import ReactiveAvoidanceAgent
+from avoidance_bindings import AvoidanceManager
+
+def test_no_obstacles_never_locks_in_stop():
+    # после вынужденной остановки в открытом пространстве дрон снова движется к цели
+    m = AvoidanceManager(["a"])
+    wall = [Obstacle(1.5, dy, radius=0.6) for dy in (-3.0, -1.5, 0.0, 1.5, 3.0)] + \
+           [Obstacle(dx, dy, radius=0.6) for dx in (-1.5, 0.0) for dy in (-1.5, 1.5)]
+    out = m.compute("a", 3.0, 0.0, 0.1, 0.0, 0.0, wall)
+    assert (out.vx, out.vy) == (0.0, 0.0)
+    for _ in range(5):
+        out = m.compute("a", 3.0, 0.0, 0.1, 0.3, 0.0, [])
+        assert out.vx > 1.0
+
+@pytest.mark.parametrize("kw", [dict(engine="python"), dict(engine="numpy", mode="vo"),
+                                dict(engine="numpy", warm_start=True)])
+def test_unsupported_agent_options_raise(kw):
+    with pytest.raises(ValueError):
+        AvoidanceManager(["a"], ReactiveAvoidanceAgent(**kw))
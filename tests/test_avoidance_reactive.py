@@ -0,0 +1,125 @@
+import math
+from avoidance_types import Obstacle
+from avoidance_reactive import ReactiveAvoidanceAgent
+
+def test_ttc_head_on_obstacle_ahead():
+    # дрон летит на +X со скоростью 2 м/с, неподвижное препятствие в 10 м впереди, радиус 1
+    agent = ReactiveAvoidanceAgent()
+    ttc = agent._ttc_of(2.0, 0.0, Obstacle(10.0, 0.0, radius=1.0))
+    assert math.isclose(ttc, 4.5)
+
+def test_ttc_head_on_moving_obstacle():
+    # встречное движение: скорость сближения 3 м/с
+    agent = ReactiveAvoidanceAgent()
+    ttc = agent._ttc_of(2.0, 0.0, Obstacle(10.0, 0.0, vx=-1.0, radius=1.0))
+    assert math.isclose(ttc, 3.0)
+
+def test_ttc_obstacle_behind_is_inf():
+    agent = ReactiveAvoidanceAgent()
+    assert math.isinf(agent._ttc_of(2.0, 0.0, Obstacle(-10.0, 0.0, radius=1.0)))
+
+def test_numpy_engine_matches_python():
+    import numpy as np
+    from avoidance_types import AvoidanceInput
+    rng = np.random.default_rng(0)
+    obs = [Obstacle(float(x), float(y), float(vx), float(vy), float(r))
+           for x, y, vx, vy, r in zip(rng.uniform(-8, 8, 20), rng.uniform(-8, 8, 20),
+                                      rng.uniform(-1, 1, 20), rng.uniform(-1, 1, 20), rng.uniform(0.3, 1.0, 20))]
+    ain = AvoidanceInput(ref_vx=2.0, ref_vy=0.5, dt=0.1, progress_ds=0.2, front_blocked_ratio=0.0,
+                         v_prev_x=1.5, v_prev_y=0.0, vmax=4.0, obstacles=obs)
+    a = ReactiveAvoidanceAgent(engine="python")._pick(ain)
+    b = ReactiveAvoidanceAgent(engine="numpy")._pick(ain)
+    assert np.allclose(a, b)
+
+def _random_inputs(seed, cases=150):
+    import numpy as np
+    from avoidance_types import AvoidanceInput
+    rng = np.random.default_rng(seed)
+    for _ in range(cases):
+        n = int(rng.integers(1, 40))
+        obs = [Obstacle(float(x), float(y), float(vx), float(vy), float(r))
+               for x, y, vx, vy, r in zip(rng.uniform(-10, 10, n), rng.uniform(-10, 10, n),
+                                          rng.uniform(-1, 1, n) * (rng.random(n) < 0.5),
+                                          rng.uniform(-1, 1, n) * (rng.random(n) < 0.5),
+                                          rng.uniform(0.2, 1.0, n))]
+        a, s = rng.uniform(-math.pi, math.pi), rng.uniform(0.5, 3.0)
+        p, sp = a + rng.normal(0.0, 0.5), rng.uniform(0.0, 3.0)
+        yield AvoidanceInput(ref_vx=s*math.cos(a), ref_vy=s*math.sin(a), dt=0.1, progress_ds=0.2,
+                             front_blocked_ratio=0.0, v_prev_x=sp*math.cos(p), v_prev_y=sp*math.sin(p),
+                             vmax=4.0, obstacles=obs)
+
+def _cost(agent, ain, pick):
+    # J(v) выбранной скорости по TTC/клиренсу, которые вернул сам _pick
+    vx, vy, ttc, clr = pick
+    dang = abs(math.remainder(math.atan2(vy, vx) - math.atan2(ain.ref_vy, ain.ref_vx), 2*math.pi))
+    return (agent.w_goal*dang + agent.w_clr*(0.7 / (clr + 1e-3)) + agent.w_ttc*(0.7 / (ttc + 1e-3))
+            + agent.w_sm*math.hypot(vx - ain.v_prev_x, vy - ain.v_prev_y))
+
+def test_vo_heading_is_safe_and_no_worse_than_sampling():
+    import numpy as np
+    import avoidance_batch as ab
+    for cull in (None, 3.0):
+        vo = ReactiveAvoidanceAgent(mode="vo", cull_horizon_s=cull)
+        fan = ReactiveAvoidanceAgent(engine="numpy", cull_horizon_s=cull)
+        for ain in _random_inputs(1):
+            a, b = vo._pick(ain), fan._pick(ain)
+            if (b[0], b[1]) != (0.0, 0.0):
+                # веер нашёл допустимый курс — VO тоже, и не дороже по J
+                assert (a[0], a[1]) != (0.0, 0.0)
+                assert _cost(vo, ain, a) <= _cost(fan, ain, b) + 1e-9
+            if (a[0], a[1]) == (0.0, 0.0):
+                continue
+            # жёсткий порог TTC — по полному набору препятствий, клиренс — без отсечения
+            O = ab.obstacle_arrays(ain.obstacles)
+            cx, cy = np.array([a[0]]), np.array([a[1]])
+            assert ab.ttc_matrix(cx, cy, O).min(initial=np.inf) >= vo.tau_min - 1e-9
+            if cull is None:
+                assert ab.clearance_matrix(cx, cy, O).min(initial=np.inf) >= vo.clr_min - 1e-9
+
+def test_obstacle_index_never_admits_ttc_violation():
+    # курс, опасный по TTC против полного набора, опасен и против отобранных for_heading
+    import numpy as np
+    from obstacle_index import ObstacleIndex
+    agent = ReactiveAvoidanceAgent(cull_horizon_s=2.0)
+    rng = np.random.default_rng(2)
+    checked = 0
+    for _ in range(60):
+        # быстрые препятствия в т.ч. сзади и у границы круга досягаемости
+        n = 30
+        obs = [Obstacle(float(x), float(y), float(vx), float(vy), float(r))
+               for x, y, vx, vy, r in zip(rng.uniform(-20, 20, n), rng.uniform(-20, 20, n),
+                                          rng.uniform(-4, 4, n), rng.uniform(-4, 4, n), rng.uniform(0.2, 1.5, n))]
+        index = ObstacleIndex(obs, 4.0, agent._cull_horizon(), agent.clr_min)
+        for a, s in zip(rng.uniform(-math.pi, math.pi, 40), rng.uniform(0.0, 4.0, 40)):
+            vx, vy = s*math.cos(a), s*math.sin(a)
+            if agent._min_ttc(vx, vy, obs) < agent.tau_min:
+                assert agent._min_ttc(vx, vy, index.for_heading(vx, vy)) < agent.tau_min
+                checked += 1
+    assert checked > 100
+
+def test_warm_start_with_zero_tolerance_matches_cold_pick():
+    # при нулевых допусках кэш пересчитывает любое смещение — выбор как у холодного numpy
+    import numpy as np
+    from avoidance_types import AvoidanceInput
+    for cull in (None, 3.0):
+        warm = ReactiveAvoidanceAgent(warm_start=True, warm_tol_m=0.0, warm_tol_v=0.0, cull_horizon_s=cull)
+        cold = ReactiveAvoidanceAgent(engine="numpy", cull_horizon_s=cull)
+        rng = np.random.default_rng(4)
+        n = 25
+        O = np.vstack([rng.uniform(-10, 10, (2, n)),
+                       rng.uniform(-1, 1, (2, n)) * (rng.random(n) < 0.5),   # половина неподвижна
+                       rng.uniform(0.2, 1.0, (1, n))])
+        ref, prev = (2.0, 0.5), (0.0, 0.0)
+        for tick in range(40):
+            if tick == 20:
+                ref = (1.0, -1.5)          # смена ref_v — новый набор кандидатов
+            if tick == 30:
+                O = O[:, :-3]              # часть препятствий пропала из детекций
+            obs = [Obstacle(*map(float, col)) for col in O.T]
+            ain = AvoidanceInput(ref_vx=ref[0], ref_vy=ref[1], dt=0.1, progress_ds=0.2,
+                                 front_blocked_ratio=0.0, v_prev_x=prev[0], v_prev_y=prev[1],
+                                 vmax=4.0, obstacles=obs)
+            a, b = warm._pick(ain), cold._pick(ain)
+            assert np.allclose(a, b)
+            prev = a[:2]
+            O[:2] += O[2:4] * 0.1
@@ -0,0 +1,10 @@
+import pytest
+from cbba_lite import CBBALite
+from cbba_distributed import DistributedCBBA
+
+def test_lazy_strategy_rejected():
+    with pytest.raises(ValueError):
+        DistributedCBBA(CBBALite(strategy="lazy"))
+
+def test_rounds_strategy_accepted():
+    assert DistributedCBBA(CBBALite(strategy="rounds")).cbba.strategy == "rounds"
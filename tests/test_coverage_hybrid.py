@@ -0,0 +1,82 @@
+import numpy as np
+from schemas import Task, DroneState, Point
+from tour_sequencing import TourSequencer
+from coverage_hybrid import HybridCoverage
+
+def _tasks(n=120, seed=1):
+    rng = np.random.default_rng(seed)
+    return [Task(id=f"t{i}", priority=float(rng.random()), target=Point(*rng.uniform(0, 2000, 2), 0))
+            for i in range(n)]
+
+def test_pool_plans_equal_serial():
+    tasks = _tasks()
+    drones = [DroneState(drone_id=f"d{i}", pos=Point(100*i, 0, 0), battery_rem_Wh=100.0) for i in range(2)]
+    assignment = {"d0": tasks[:60], "d1": tasks[60:]}
+    # лимит времени с запасом: улучшение тура сходится, планы детерминированы
+    cov = HybridCoverage(sequencer=TourSequencer(time_budget_s=10.0))
+    serial = cov.build_plans(assignment, drones)
+    pooled = cov.build_plans(assignment, drones, workers=2)
+    for d in drones:
+        assert np.array_equal(serial[d.drone_id].data, pooled[d.drone_id].data)
+        assert serial[d.drone_id].task_ids() == pooled[d.drone_id].task_ids()
+
+def test_batched_cells_equal_per_task():
+    # квадратные ячейки — одним stripe_arrays, вперемешку с обрезанными по AOI
+    cov = HybridCoverage()
+    cov.register_aoi("A", [(0, 0), (200, 0), (200, 200), (0, 200)], [[(80, 80), (120, 80), (120, 120), (80, 120)]])
+    tasks = _tasks(40)
+    tasks[3:6] = [Task(id=f"a{i}", priority=0.5, target=Point(x, 100, 0), aoi_id="A")
+                  for i, x in enumerate((40, 100, 160))]
+    for along_x in (True, False):
+        xs, ys, cnt = cov._cells(tasks, 60.0, along_x)
+        xy = [cov._cell_xy(t, 60.0, along_x) for t in tasks]
+        assert cnt.tolist() == [len(x) for x, _ in xy]
+        assert np.array_equal(xs, np.concatenate([x for x, _ in xy]))
+        assert np.array_equal(ys, np.concatenate([y for _, y in xy]))
+
+def test_template_lru_evicts_least_recent():
+    cov = HybridCoverage(template_cache_size=3)
+    for step in (10.0, 12.0, 14.0):
+        cov._template(60.0, step, True)
+    assert cov.cache_info() == {"hits": 0, "misses": 3, "size": 3, "maxsize": 3}
+    dx, _ = cov._template(60.0, 10.0, True)        # 10 — теперь самый свежий
+    assert not dx.flags.writeable
+    cov._template(60.0, 16.0, True)                # переполнение: вытесняется 12
+    assert cov.cache_info() == {"hits": 1, "misses": 4, "size": 3, "maxsize": 3}
+    for step in (10.0, 14.0, 16.0):
+        cov._template(60.0, step, True)
+    assert cov.cache_info()["hits"] == 4
+    cov._template(60.0, 12.0, True)
+    cov._template(60.0, 12.0, False)               # ориентация — часть ключа
+    assert cov.cache_info() == {"hits": 4, "misses": 6, "size": 3, "maxsize": 3}
+
+def test_flown_stripes_lower_uncovered_frac():
+    cov = HybridCoverage()
+    t = Task(id="t", priority=0.0, target=Point(100, 100, 0))
+    cov.track_coverage([t])
+    assert cov.uncovered_frac(t) == 1.0
+    x, y = cov._cell_xy(t, 60.0, True)
+    # одна пролетённая полоса из пяти, затем весь маршрут ячейки
+    cov.mark_flown(x[0], y[0], x[1], y[1])
+    assert np.isclose(cov.uncovered_frac(t), 0.8)
+    cov.mark_flown(x[:-1], y[:-1], x[1:], y[1:])
+    assert cov.uncovered_frac(t) == 0.0
+    assert len(cov._cell_xy(t, 60.0, True)[0]) == 0
+
+def test_variable_levels_narrow_in_high_priority_rows():
+    from priority_map import PriorityMap
+    # верхняя половина растра (y ≥ 100) — приоритет 1, нижняя — 0
+    values = np.vstack([np.zeros((20, 40)), np.ones((20, 40))])
+    cov = HybridCoverage(priority_map=PriorityMap(values, (0, 0), 5.0))
+    t = Task(id="t", priority=0.0, target=Point(100, 100, 0))
+    levels, steps = cov._variable_levels(t, 100.0, 100.0, 30.0, True)
+    d0 = cov._base_step()
+    assert np.allclose(steps[levels < 100], d0) and np.allclose(steps[levels > 100], d0 / (1.0 + cov.kappa))
+    gaps = np.diff(levels)
+    assert gaps[levels[:-1] > 100].max() < gaps[levels[1:] < 100].min()
+    # полос больше, чем при постоянном шаге по priority задачи
+    assert len(levels) > int(np.ceil(60.0 / cov._adaptive_step(t.priority)))
+    # поперёк (полосы вдоль Y) на транспонированной карте — те же уровни
+    cov_t = HybridCoverage(priority_map=PriorityMap(values.T, (0, 0), 5.0))
+    lt, st = cov_t._variable_levels(t, 100.0, 100.0, 30.0, False)
+    assert np.allclose(lt, levels) and np.allclose(st, steps)
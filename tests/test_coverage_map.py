@@ -0,0 +1,53 @@
+import numpy as np
+from coverage_map import CoverageMap
+
+def _brute(m, segs):
+    # клетки, центр которых ближе fov/2 - res/2 к одному из отрезков
+    ny, nx = m.covered.shape
+    cx, cy = np.meshgrid(m.x0 + (np.arange(nx) + 0.5)*m.res, m.y0 + (np.arange(ny) + 0.5)*m.res)
+    r = m.fov_m / 2.0 - m.res / 2.0
+    out = np.zeros((ny, nx), dtype=bool)
+    for x0, y0, x1, y1 in segs:
+        dx, dy = x1 - x0, y1 - y0
+        t = np.clip(((cx - x0)*dx + (cy - y0)*dy) / max(dx*dx + dy*dy, 1e-12), 0.0, 1.0)
+        out |= np.hypot(cx - x0 - t*dx, cy - y0 - t*dy) <= r + 1e-9
+    return out
+
+def test_mark_matches_brute_force():
+    # отрезки по дронам массивами, в т.ч. длинные (дробятся на куски) и выходящие за растр
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        m = CoverageMap((-20, 10, 120, 90), res_m=2.0, fov_m=20.0)
+        segs = rng.uniform(-40, 140, (5, 4))
+        m.mark(*segs.T)
+        assert m.touched
+        assert np.array_equal(m.covered, _brute(m, segs))
+        assert m.covered_frac() == m.covered.mean()
+
+def test_covered_frac_grows_with_marks():
+    m = CoverageMap((0, 0, 100, 40), res_m=2.0, fov_m=20.0)
+    assert m.covered_frac() == 0.0 and not m.touched
+    m.mark(20, 10, 60, 10)
+    a = m.covered_frac()
+    m.mark(20, 30, 60, 30)
+    assert 0.0 < a < m.covered_frac() < 1.0
+
+def test_free_intervals_cut_covered_part():
+    m = CoverageMap((0, 0, 100, 40), res_m=2.0, fov_m=20.0)
+    m.mark(20, 10, 60, 10)
+    iv = [np.array([[0.0, 100.0]])]*4
+    # y=10: покрыты клетки с центрами x ∈ [13, 67]; y=60 — вне растра, полоса нужна целиком;
+    # y=18 с полосой 6 м задевает непокрытый ряд y=21 — тоже нужна целиком, с полосой 2 м —
+    # только вне x ∈ [20, 60] (ряд y=19 на краю обзора покрыт лишь над самим отрезком)
+    free = m.free_intervals([10.0, 35.0, 60.0, 18.0], iv, True, band=[2.0, 2.0, 2.0, 6.0])
+    assert np.allclose(free[0], [[0.0, 12.0], [68.0, 100.0]])
+    assert np.allclose(free[1], [[0.0, 100.0]])
+    assert np.allclose(free[2], [[0.0, 100.0]])
+    assert np.allclose(free[3], [[0.0, 100.0]])
+    assert np.allclose(m.free_intervals([18.0], iv[:1], True, band=2.0)[0], [[0.0, 20.0], [60.0, 100.0]])
+    # та же геометрия поперёк: полосы вдоль Y на транспонированной карте
+    mt = CoverageMap((0, 0, 40, 100), res_m=2.0, fov_m=20.0)
+    mt.mark(10, 20, 10, 60)
+    assert np.array_equal(mt.covered, m.covered.T)
+    freet = mt.free_intervals([10.0, 35.0, 60.0, 18.0], iv, False, band=[2.0, 2.0, 2.0, 6.0])
+    assert all(np.allclose(a, b) for a, b in zip(freet, free))
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from schemas import Task, DroneState, Point
+from coverage_hybrid import HybridCoverage
+from coverage_polygon import crosses_holes
+
+HOLE = [(60, 60), (140, 60), (140, 140), (60, 140)]
+
+def _coverage():
+    cov = HybridCoverage()
+    cov.register_aoi("A", [(0, 0), (200, 0), (200, 200), (0, 200)], [HOLE])
+    return cov
+
+def _crossings(cov, plan):
+    x, y = np.asarray(plan.x), np.asarray(plan.y)
+    return int(crosses_holes(cov.polygons.aois["A"][1:], x[:-1], y[:-1], x[1:], y[1:]).sum())
+
+def test_crosses_holes_ignores_boundary():
+    holes = [np.array(HOLE, dtype=float)]
+    hit = crosses_holes(holes, [60, 0, 60, 59], [129.6, 100, 60, 50], [140, 200, 140, 141], [67.4, 100, 60, 50])
+    assert hit.tolist() == [True, True, False, False]
+
+@pytest.mark.parametrize("square", [False, True])
+def test_plan_segments_avoid_holes(square):
+    cov = _coverage()
+    drones = [DroneState(drone_id="d", pos=Point(-10, -10, 0), battery_rem_Wh=100.0)]
+    if square:
+        tasks = [Task(id="S", priority=0.5, target=Point(100, 100, 0), aoi_id="A")]
+        plan = cov.build_plans({"d": tasks}, drones, cell_size_m=120.0)["d"]
+    else:
+        tasks = cov.aoi_tasks("A")
+        plan = cov.build_plans({"d": tasks}, drones)["d"]
+    assert len(plan) > 0
+    assert sorted(plan.task_ids()) == sorted(t.id for t in tasks)
+    assert _crossings(cov, plan) == 0
+
+def test_inserted_segment_avoids_holes():
+    cov = _coverage()
+    seg = cov.build_segment(Task(id="S", priority=0.5, target=Point(100, 100, 0), aoi_id="A"), cell_size_m=120.0)
+    assert len(seg) > 0 and seg.task_ids() == ["S"]
+    assert _crossings(cov, seg) == 0
+
+def test_detour_without_path_raises():
+    # карман внутри U-образной дыры, закрытый сверху второй дырой: выхода нет
+    cov = HybridCoverage()
+    u = [(40, 40), (160, 40), (160, 160), (140, 160), (140, 60), (60, 60), (60, 160), (40, 160)]
+    bar = [(40, 160), (160, 160), (160, 180), (40, 180)]
+    cov.register_aoi("P", [(0, 0), (200, 0), (200, 200), (0, 200)], [u, bar])
+    with pytest.raises(ValueError):
+        cov.polygons.detour("P", np.array([100.0, 10.0]), np.array([100.0, 10.0]))
+    x, y, src = cov.polygons.detour("P", np.array([10.0, 190.0]), np.array([10.0, 10.0]))
+    assert src.tolist() == [0, 1] and len(x) == 2
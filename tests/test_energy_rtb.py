@@ -0,0 +1,40 @@
+import numpy as np
+from schemas import DroneState, Point
+from energy_rtb import EnergyRTBManager, LinkStats, MODES, link_quality
+
+def _near(rng, levels, n, eps=1e-6):
+    # значения у порогов levels: ровно на пороге, чуть ниже/выше и случайные вокруг
+    lv = rng.choice(levels, n)
+    jitter = rng.choice([0.0, -eps, eps, 0.0], n) + np.where(rng.random(n) < 0.3, rng.normal(0.0, 0.2, n), 0.0)
+    return lv + jitter
+
+def test_decide_batch_matches_scalar_decide():
+    rng = np.random.default_rng(0)
+    e = EnergyRTBManager(home=Point(0, -50, 0), lz_list=[Point(30, -10, 0)])
+    pol, n = e.policy, 3000
+    x, y = rng.uniform(-300, 300, n), rng.uniform(-300, 300, n)
+    rem = rng.uniform(0, 3000, n)
+    E_rtb, E_mission = e.rtb_energy(x, y), e.mission_energy(rem)
+    # заряд у порогов ok_margin/min_margin по ΔE и у границы RTB/LZ (battery = E_rtb)
+    m = _near(rng, [pol.ok_margin, pol.min_margin, 0.0], n)
+    battery = np.where(rng.random(n) < 0.8, E_mission + E_rtb*(1.0 + m), E_rtb*(1.0 + 0.01*m))
+    # качество связи у порогов q_ok/q_crit: подбираем RSSI под целевое q при случайных SNR/потерях
+    snr, loss = rng.uniform(0, 30, n), rng.uniform(0, 1, n)
+    q = np.clip(_near(rng, [pol.q_ok, pol.q_crit], n, eps=1e-9), 0.0, 1.0)
+    rssi = 40.0*(q - 0.3*snr / 30.0 - 0.2*(1.0 - loss)) / 0.5 - 90.0
+    rssi = np.where(rng.random(n) < 0.2, rng.uniform(-100, -40, n), rssi)
+    # ровно на порогах: (-50, 0, 0) → q = q_ok, (-58, 0, 1) → q = q_crit
+    exact = rng.random(n) < 0.2
+    pick = rng.random(n) < 0.5
+    rssi = np.where(exact, np.where(pick, -50.0, -58.0), rssi)
+    snr = np.where(exact, 0.0, snr)
+    loss = np.where(exact, np.where(pick, 0.0, 1.0), loss)
+    assert link_quality(-50.0, 0.0, 0.0) == pol.q_ok and link_quality(-58.0, 0.0, 1.0) == pol.q_crit
+
+    codes = e.decide_batch(x, y, battery, rssi, snr, loss, rem)
+    for k in range(n):
+        d = DroneState(drone_id="d", pos=Point(float(x[k]), float(y[k]), 0.0), battery_rem_Wh=float(battery[k]))
+        want = e.decide(d, float(battery[k]), LinkStats(float(rssi[k]), float(snr[k]), float(loss[k])), float(rem[k]))
+        assert MODES[codes[k]] == want.mode, k
+    # выборка задевает все четыре режима
+    assert set(codes.tolist()) == {0, 1, 2, 3}
@@ -0,0 +1,96 @@
+import random
+import numpy as np
+from schemas import Task, DroneState, Point
+from mission_runner import MissionRunner
+from energy_rtb import CONTINUE, SIMPLIFY
+
+def test_flown_plans_leave_no_uncovered_cells():
+    # планы и карта покрытия строятся одним генератором: пролетённые ячейки покрыты
+    drones = [DroneState(drone_id="d0", pos=Point(0, 0, 0), battery_rem_Wh=200.0),
+              DroneState(drone_id="d1", pos=Point(10, 0, 0), battery_rem_Wh=200.0)]
+    tasks = [Task(id=f"A{i}", priority=p, target=Point(x, y, 0), aoi_id="A")
+             for i, (x, y, p) in enumerate([(40, 40, 0.9), (100, 40, 0.2), (40, 100, 0.5), (100, 100, 0.6)])]
+    runner = MissionRunner(drones, home=Point(0, -50, 0), lz_list=[])
+    runner.prepare(tasks)
+    for plan in runner.active_plans.values():
+        x, y = np.asarray(plan.x), np.asarray(plan.y)
+        runner.coverage.mark_flown(x[:-1], y[:-1], x[1:], y[1:])
+    assert sum(len(p) for p in runner.active_plans.values()) > 0
+    for t in tasks:
+        assert runner.coverage.uncovered_frac(t, runner.cell_size_m) <= runner.min_uncovered
+
+def _codes(runner, ids):
+    # решения decide_batch для планов дронов ids на месте, при хорошей связи
+    ds = [runner.drones[i] for i in ids if runner.active_plans[i]]
+    return runner.energy.decide_batch(
+        [d.pos.x for d in ds], [d.pos.y for d in ds], [d.battery_rem_Wh for d in ds],
+        [-60.0]*len(ds), [25.0]*len(ds), [0.0]*len(ds), [0.0]*len(ds),
+        mission_Wh=[runner.energy.plan_energy(runner.active_plans[d.drone_id], d.pos.x, d.pos.y)
+                    for d in ds]).tolist()
+
+def test_bids_match_plan_energy_after_prepare_and_rebalance():
+    # ставки считают работу по сегментам задач в энергомодели плана: ни один выданный
+    # или довставленный план не уходит в RTB на первом же решении
+    for seed in range(8):
+        rng = random.Random(seed)
+        drones = [DroneState(drone_id=f"d{i}", pos=Point(rng.uniform(-20, 20), rng.uniform(-20, 20), 0),
+                             battery_rem_Wh=rng.uniform(15.0, 60.0)) for i in range(3)]
+        tasks = [Task(id=f"T{k}", priority=rng.uniform(0.1, 1.0), aoi_id="A",
+                      target=Point(rng.uniform(0, 300), rng.uniform(0, 300), 0)) for k in range(12)]
+        runner = MissionRunner(drones, home=Point(0, -50, 0), lz_list=[])
+        runner.prepare(tasks)
+        assert set(_codes(runner, runner.drones)) <= {CONTINUE, SIMPLIFY}
+        left = runner._leftover("d0")
+        runner.returning.add("d0")
+        runner._rebalance_leftover("d0", left)
+        assert set(_codes(runner, ["d1", "d2"])) <= {CONTINUE, SIMPLIFY}
+
+def test_finished_drones_return_home_and_hold():
+    from sim_backend import KinematicFleetSim
+    drones = [DroneState(drone_id="d0", pos=Point(0, 0, 0), battery_rem_Wh=60.0),
+              DroneState(drone_id="d1", pos=Point(10, 0, 0), battery_rem_Wh=60.0)]
+    home = Point(0, -30, 0)
+    sim = KinematicFleetSim(drones, home=home)
+    runner = MissionRunner(drones, home=home, lz_list=[], backend=sim)
+    runner.prepare([Task(id="A0", priority=0.5, target=Point(40, 40, 0), aoi_id="A")])
+    for _ in range(20000):
+        if runner.all_finished():
+            break
+        runner.step(0.1)
+        sim.advance(0.1)
+    assert runner.all_finished()
+    for _ in range(20):          # торможение с ограничением ускорения
+        sim.advance(0.1)
+    before = sim.pos.copy()
+    for _ in range(100):
+        sim.advance(0.1)
+    # команда скорости снята: дроны стоят на базе
+    assert np.allclose(sim.pos, before)
+    assert np.all(np.hypot(sim.pos[:, 0] - home.x, sim.pos[:, 1] - home.y) < 3.0)
+
+def test_mission_completes_after_mid_mission_rtb():
+    # d0 уходит на RTB посреди миссии: его задачи довставляются d1, маршрут RTB
+    # не перестраивается каждый такт — миссия завершается с полным покрытием
+    from sim_backend import KinematicFleetSim
+    drones = [DroneState(drone_id="d0", pos=Point(0, 0, 0), battery_rem_Wh=60.0),
+              DroneState(drone_id="d1", pos=Point(200, 0, 0), battery_rem_Wh=60.0)]
+    home = Point(0, -30, 0)
+    tasks = [Task(id=f"A{i}", priority=p, target=Point(x, y, 0), aoi_id="A")
+             for i, (x, y, p) in enumerate([(0, 40, 0.9), (0, 100, 0.7), (200, 40, 0.5), (200, 100, 0.6)])]
+    sim = KinematicFleetSim(drones, home=home)
+    runner = MissionRunner(drones, home=home, lz_list=[], backend=sim)
+    runner.prepare(tasks)
+    assert runner.active_plans["d0"] and runner.active_plans["d1"]
+    for step in range(20000):
+        if runner.all_finished():
+            break
+        if step == 1500:
+            sim.battery[sim.index["d0"]] = 4.0
+        runner.step(0.1)
+        sim.advance(0.1)
+    assert "d0" in runner.returning
+    assert runner.all_finished()
+    for t in tasks:
+        assert runner.coverage.uncovered_frac(t, runner.cell_size_m) <= runner.min_uncovered
+    d0 = runner.drones["d0"].pos
+    assert np.hypot(d0.x - home.x, d0.y - home.y) < 3.0
@@ -0,0 +1,127 @@
+import math
+from dataclasses import astuple
+import numpy as np
+from schemas import Point, Waypoint
+from energy_rtb import EnergyRTBManager
+from plan_buffer import PlanBuffer
+
+def _plan(n=40, seed=0):
+    rng = np.random.default_rng(seed)
+    return PlanBuffer.from_arrays(rng.uniform(0, 200, n), rng.uniform(0, 200, n), 22.0, 0.0, 3.0)
+
+def _legs(plan):
+    # длины сегментов оставшейся части плана прямым перебором
+    x, y = plan.x.tolist(), plan.y.tolist()
+    return [math.hypot(x[k+1] - x[k], y[k+1] - y[k]) for k in range(len(x) - 1)]
+
+def test_prefix_is_cumulative_length():
+    plan = _plan()
+    legs = [0.0] + _legs(plan)
+    assert np.allclose(plan.prefix(), np.cumsum(legs))
+
+def test_remaining_after_advance_and_thin():
+    plan = _plan()
+    for k in (0, 1, 5, 13):
+        plan.advance(k)
+        assert math.isclose(plan.remaining(), sum(_legs(plan)), abs_tol=1e-9)
+        lead = math.hypot(plan.x[0] - 3.0, plan.y[0] + 4.0)
+        assert math.isclose(plan.remaining_m(3.0, -4.0), lead + sum(_legs(plan)), abs_tol=1e-9)
+        thin = plan.thin(3)
+        assert math.isclose(thin.remaining(), sum(_legs(thin)), abs_tol=1e-9)
+
+def test_reach_matches_brute_force():
+    plan = _plan()
+    plan.advance(7)
+    cum = np.concatenate([[0.0], np.cumsum(_legs(plan))])
+    rng = np.random.default_rng(1)
+    for budget, lead in zip(rng.uniform(0, cum[-1] + 50, 50), rng.uniform(0, 30, 50)):
+        want = 0 if budget < lead else int(np.sum(cum <= budget - lead))
+        assert plan.reach(budget, lead=lead) == want
+    thin = plan.thin(2)
+    cum = np.concatenate([[0.0], np.cumsum(_legs(thin))])
+    assert thin.reach(cum[4] + 1e-9) == 5
+
+def _random_plan(rng, n):
+    return PlanBuffer.from_arrays(rng.uniform(0, 300, n), rng.uniform(0, 300, n), 22.0,
+                                  rng.choice([0.0, 2.0], n), rng.choice([2.0, 3.0, 5.0], n))
+
+def test_incremental_prefix_matches_rebuild():
+    # после сдвига курсора и дозаписи префиксные индексы совпадают с построенными заново
+    rng = np.random.default_rng(0)
+    e = EnergyRTBManager(home=Point(0, 0, 0), lz_list=[])
+    tag = astuple(e.model)
+    plan = _random_plan(rng, 20)
+    for _ in range(300):
+        plan.prefix("m")
+        plan.prefix("Wh", e.segment_energy, tag)
+        if rng.random() < 0.5:
+            plan.advance(int(rng.integers(0, 4)))
+        else:
+            plan.extend(_random_plan(rng, int(rng.integers(1, 6))))
+        fresh = PlanBuffer(plan.data, plan.tags, plan.names)
+        assert np.allclose(plan.prefix("m"), fresh.prefix("m"))
+        assert np.allclose(plan.prefix("Wh", e.segment_energy, tag), fresh.prefix("Wh", e.segment_energy, tag))
+
+def _waypoints(n=30, seed=2):
+    # список WP с метками трёх задач вперемешку с WP без задачи
+    rng = np.random.default_rng(seed)
+    ids = [None, "a", "b", "c"]
+    return [Waypoint(Point(*rng.uniform(0, 100, 2).tolist(), 22.0), hold_sec=float(rng.choice([0.0, 2.0])),
+                     speed_mps=3.0, task_id=ids[int(rng.integers(0, 4))]) for _ in range(n)]
+
+def _waypoint_list_named(*ids):
+    return [Waypoint(Point(float(k), float(-k), 22.0), task_id=t) for k, t in enumerate(ids*3)]
+
+def test_advance_matches_list_pop():
+    wps = _waypoints()
+    plan = PlanBuffer.from_waypoints(wps)
+    ref = list(wps)
+    for k in (0, 1, 3, 7, 100):
+        plan.advance(k)
+        del ref[:k]
+        assert len(plan) == len(ref) and bool(plan) == bool(ref)
+        assert plan.to_waypoints() == ref
+        if ref:
+            assert plan[0] == ref[0] and plan[-1] == ref[-1]
+    try:
+        plan[0]
+        assert False, "пустой план должен бросать IndexError"
+    except IndexError:
+        pass
+
+def test_slices_and_thin_are_views():
+    wps = _waypoints()
+    plan = PlanBuffer.from_waypoints(wps)
+    plan.advance(4)
+    view, thin = plan[2:11], plan.thin(3)
+    assert view.to_waypoints() == wps[6:15]
+    assert thin.to_waypoints() == wps[4::3]
+    # копирования нет: изменение исходного буфера видно в срезах
+    assert np.shares_memory(view.data, plan.data) and np.shares_memory(thin.data, plan.data)
+    plan.data[0, 6] = -1.0
+    assert view[0].p.x == -1.0 and thin[0].p.x != -1.0
+    plan.data[0, 7] = -2.0
+    assert thin[1].p.x == -2.0
+
+def test_concat_and_insert_remap_task_ids():
+    a, b = _waypoints(12, seed=3), _waypoint_list_named("b", "d")
+    pa, pb = PlanBuffer.from_waypoints(a), PlanBuffer.from_waypoints(b)
+    pa.advance(2)
+    joined = PlanBuffer.concat([pa, pb])
+    assert joined.to_waypoints() == a[2:] + b
+    assert joined.task_ids() == list(dict.fromkeys(w.task_id for w in a[2:] + b if w.task_id))
+    pa.insert(3, pb)
+    assert pa.to_waypoints() == a[2:5] + b + a[5:]
+    assert pa.first_index("d") == 3 + [w.task_id for w in b].index("d")
+
+def test_bytes_round_trip():
+    wps = _waypoints()
+    plan = PlanBuffer.from_waypoints(wps)
+    plan.advance(5)
+    back = PlanBuffer.from_bytes(plan.to_bytes())
+    assert back.to_waypoints() == wps[5:]
+    assert back.task_ids() == plan.task_ids()
+    # восстановленный буфер — своя изменяемая копия
+    back.data[0, 0] = 1e6
+    assert plan[0].p.x != 1e6
+    assert PlanBuffer.from_bytes(PlanBuffer().to_bytes()).to_waypoints() == []
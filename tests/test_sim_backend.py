@@ -0,0 +1,19 @@
+import numpy as np
+from schemas import DroneState, Point, Waypoint
+from sim_backend import KinematicFleetSim
+
+def _sim():
+    d = DroneState(drone_id="d", pos=Point(0, 0, 0), battery_rem_Wh=50.0, speed_cruise_mps=3.0)
+    # стена из препятствий в 2 м впереди по +X
+    wall = np.array([[2.0, y, 0.0, 0.0, 0.5] for y in np.linspace(-2.0, 2.0, 9)])
+    return KinematicFleetSim([d], home=Point(0, 0, 0), obstacles=wall)
+
+def test_stationary_drone_sees_wall_along_plan():
+    sim = _sim()
+    plan = [Waypoint(p=Point(20, 0, 22), speed_mps=3.0)]
+    assert sim.telemetry("d", plan).front_blocked_ratio > 0.5
+
+def test_stationary_drone_plan_away_from_wall():
+    sim = _sim()
+    plan = [Waypoint(p=Point(-20, 0, 22), speed_mps=3.0)]
+    assert sim.telemetry("d", plan).front_blocked_ratio == 0.0
@@ -0,0 +1,31 @@
+import numpy as np
+from schemas import Task, DroneState, Point
+from cbba_lite import CBBALite
+from energy_rtb import EnergyRTBManager
+from task_clustering import ClusteredAllocator
+
+def _tasks(n=600, seed=0):
+    rng = np.random.default_rng(seed)
+    return [Task(id=f"t{i}", priority=float(rng.random()), target=Point(*rng.uniform(0, 400, 2), 0))
+            for i in range(n)]
+
+def _drones(battery_Wh):
+    return [DroneState(drone_id=f"d{i}", pos=Point(10*i, 0, 0), battery_rem_Wh=battery_Wh) for i in range(3)]
+
+def _route_len(d, route, task_len_m):
+    pts = [(d.pos.x, d.pos.y)] + [(t.target.x, t.target.y) for t in route]
+    return sum(np.hypot(b[0] - a[0], b[1] - a[1]) for a, b in zip(pts, pts[1:])) + task_len_m*len(route)
+
+def test_clustered_respects_energy():
+    # маленькая батарея: кластерный путь не должен раздавать сотни задач
+    cbba = CBBALite(energy=EnergyRTBManager(home=Point(0, 0, 0), lz_list=[]), task_len_m=300.0)
+    drones = _drones(10.0)
+    routes = ClusteredAllocator(cbba).assign(_tasks(), drones)
+    assert 0 < sum(len(r) for r in routes.values()) <= 12
+    for d in drones:
+        assert np.isfinite(cbba._energy_over(d, _route_len(d, routes[d.drone_id], 300.0)))
+
+def test_clustered_assigns_all_without_energy_limit():
+    tasks = _tasks()
+    routes = ClusteredAllocator(CBBALite()).assign(tasks, _drones(10.0))
+    assert sorted(t.id for r in routes.values() for t in r) == sorted(t.id for t in tasks)
@@ -0,0 +1,22 @@
+import numpy as np
+from tour_sequencing import TourSequencer
+
+def _cells(K=300, seed=0):
+    rng = np.random.default_rng(seed)
+    C = rng.uniform(0, 1000, (K, 2))
+    off = np.array([[-10, -10], [10, 10], [10, -10], [-10, 10]], dtype=float)
+    return C, C[:, None, :] + off[None], C[:, None, :] - off[None]
+
+def test_sequence_is_deterministic():
+    C, E, X = _cells()
+    seq = TourSequencer(max_passes=4, time_budget_s=None)
+    o1, r1 = seq.sequence((0.0, 0.0), C, E, X)
+    o2, r2 = seq.sequence((0.0, 0.0), C, E, X)
+    assert sorted(o1.tolist()) == list(range(len(C)))
+    assert o1.tolist() == o2.tolist() and r1.tolist() == r2.tolist()
+
+def test_passes_do_not_worsen_tour():
+    C, E, X = _cells()
+    o0, r0 = TourSequencer(max_passes=0, time_budget_s=None).sequence((0.0, 0.0), C, E, X)
+    o1, r1 = TourSequencer(max_passes=4, time_budget_s=None).sequence((0.0, 0.0), C, E, X)
+    assert TourSequencer.cost((0.0, 0.0), E, X, o1, r1) <= TourSequencer.cost((0.0, 0.0), E, X, o0, r0) + 1e-9